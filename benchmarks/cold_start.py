@@ -0,0 +1,69 @@
+"""
+cold start regression benchmark of the lake CLI.
+
+runs `lake --help` in fresh interpreters and measures the import time of every command,
+exits with status 1 when the median `--help` wall time or a command's imports exceed their threshold.
+
+    python benchmarks/cold_start.py --runs 7 --max-help-seconds 0.5 --max-import-seconds 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# runnable from anywhere without installing the package or setting PYTHONPATH, the measured interpreters
+# (`-m`/`-c`) import it from the working directory and resources/ paths are relative to it as well
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from lake.cmd import COMMAND_MODULES
+from lake.util.startup import import_times
+
+
+def help_wall_time(runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "lake.cmd", "--help"], capture_output=True, check=True)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def command_import_time(modules: list[str], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        times = import_times(modules)
+        samples.append(sum(cumulative_us for module, _, cumulative_us in times if not module.startswith(" ")) / 1_000_000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-help-seconds", type=float, default=0.5)
+    parser.add_argument("--max-import-seconds", type=float, default=1.5, help="threshold of every command's imports")
+    args = parser.parse_args()
+
+    result = {"help_seconds": help_wall_time(args.runs), "imports_seconds": {}}
+    failures = []
+    if result["help_seconds"] > args.max_help_seconds:
+        failures.append(f"lake --help took {result['help_seconds']:.3f}s (> {args.max_help_seconds}s)")
+    for command, modules in COMMAND_MODULES.items():
+        try:
+            seconds = result["imports_seconds"][command] = command_import_time(modules, args.runs)
+        except subprocess.CalledProcessError as fail:
+            failures.append(f"imports of `{command}` failed: {fail.stderr.strip().splitlines()[-1]}")
+            continue
+        if seconds > args.max_import_seconds:
+            failures.append(f"imports of `{command}` took {seconds:.3f}s (> {args.max_import_seconds}s)")
+    result["failures"] = failures
+    print(json.dumps(result, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
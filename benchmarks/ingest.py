@@ -0,0 +1,355 @@
+"""
+end to end ingest benchmark of the kafka connector, runs on one machine without a network.
+
+a fake Consumer replays a synthetic (or recorded) message stream into a local ducklake catalog
+with a local data path, every scenario runs in a fresh interpreter and reports msgs/sec,
+p50/p99 batch latency, peak RSS and the files/snapshots it created as json.
+
+    python benchmarks/ingest.py --messages 200000 --output bench.json
+    python benchmarks/ingest.py --scenario attach --replay recorded.jsonl --decode arrow
+    python benchmarks/ingest.py --compare bench.json --max-regression 0.2   # exit 1 when msgs/sec dropped
+
+scenarios: consume_batch (poll + decode only), attach (poll, decode and insert), single_message (row appender).
+recorded streams are json lines, either raw payloads or {"topic", "partition", "key", "value"} objects.
+without a cached ducklake extension `--catalog duckdb` writes to a plain duckdb file instead (no files/snapshots).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import ClassVar, Optional
+
+import yaml
+
+# runnable from anywhere without installing the package or setting PYTHONPATH,
+# scenarios run in the repository root where the package and its resources/ paths resolve
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ["consume_batch", "attach", "single_message"]
+TOPIC = "bench_topic"
+TABLE = "bench_events"
+
+
+def synthetic_messages(count: int, partitions: int, seed: int = 7) -> list[tuple[str, int, Optional[bytes], bytes]]:
+    """(topic, partition, key, value) of flat json events with a few types and a varying payload size"""
+    generator = random.Random(seed)
+    tenants = [f"tenant-{index}" for index in range(50)]
+    messages = []
+    for index in range(count):
+        tenant = generator.choice(tenants)
+        event = {
+            "id": index,
+            "tenant": tenant,
+            "event_time": f"2024-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}",
+            "value": generator.random() * 1000,
+            "count": generator.randint(0, 10_000),
+            "ok": generator.random() > 0.1,
+            "payload": "x" * generator.randint(16, 256),
+        }
+        messages.append((TOPIC, index % partitions, tenant.encode(), json.dumps(event).encode()))
+    return messages
+
+
+def recorded_messages(path: str, partitions: int) -> list[tuple[str, int, Optional[bytes], bytes]]:
+    messages = []
+    with open(path) as recording:
+        for index, line in enumerate(filter(str.strip, recording)):
+            record = json.loads(line)
+            if isinstance(record, dict) and "value" in record:
+                value = record["value"] if isinstance(record["value"], str) else json.dumps(record["value"])
+                key = record.get("key")
+                messages.append((TOPIC, record.get("partition", index % partitions), key.encode() if key else None, value.encode()))
+            else:
+                messages.append((TOPIC, index % partitions, None, json.dumps(record).encode()))
+    return messages
+
+
+class FakeMessage:
+    __slots__ = ("_topic", "_partition", "_offset", "_key", "_value")
+
+    def __init__(self, topic: str, partition: int, offset: int, key: Optional[bytes], value: bytes):
+        self._topic, self._partition, self._offset, self._key, self._value = topic, partition, offset, key, value
+
+    def topic(self) -> str:
+        return self._topic
+
+    def partition(self) -> int:
+        return self._partition
+
+    def offset(self) -> int:
+        return self._offset
+
+    def key(self) -> Optional[bytes]:
+        return self._key
+
+    def value(self) -> bytes:
+        return self._value
+
+    def error(self):
+        return None
+
+
+class FakeConsumer:
+    """replays a message list through the confluent_kafka Consumer calls the connector makes, `on_exhausted` ends the run"""
+    def __init__(self, messages: list[tuple[str, int, Optional[bytes], bytes]], on_exhausted):
+        offsets: dict[int, int] = {}
+        self.messages = []
+        for topic, partition, key, value in messages:
+            offset = offsets[partition] = offsets.get(partition, -1) + 1
+            self.messages.append(FakeMessage(topic, partition, offset, key, value))
+        self.position = 0
+        self.on_exhausted = on_exhausted
+
+    def subscribe(self, topics: list[str], on_assign=None) -> None:
+        from confluent_kafka import TopicPartition
+
+        if on_assign is not None:
+            partitions = sorted({message.partition() for message in self.messages})
+            on_assign(self, [TopicPartition(TOPIC, partition) for partition in partitions])
+
+    def assign(self, partitions) -> None:
+        pass
+
+    def consume(self, num_messages: int = 1, timeout: float = -1):
+        batch = self.messages[self.position:self.position + num_messages]
+        self.position += len(batch)
+        if not batch:
+            self.on_exhausted()
+        return batch
+
+    def poll(self, timeout: float = -1):
+        batch = self.consume(1, timeout)
+        return batch[0] if batch else None
+
+    def seek(self, partition) -> None:
+        pass
+
+    def commit(self, *args, **kwargs) -> None:
+        pass
+
+    def unsubscribe(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def local_connector(directory: str, catalog: str):
+    from lake.connector.extensions import ensure_extensions
+    from lake.connector.kafka import Connector
+
+    class LocalConnector(Connector):
+        """kafka Connector on a local catalog and data path, consuming from a FakeConsumer"""
+        messages: ClassVar[list] = []
+        latencies: ClassVar[list] = []
+
+        def _attach(self):
+            alias = self.Lake.DEST.catalog.lake_alias
+            if catalog == "ducklake":
+                inlining = f", DATA_INLINING_ROW_LIMIT {self.Lake.inlining.row_limit}" if self.Lake.inlining.row_limit is not None else ""
+                os.makedirs(os.path.join(directory, "data"), exist_ok=True)
+                self.duckdb_connection.execute(
+                    f"ATTACH 'ducklake:{directory}/catalog.ducklake' AS {alias} (DATA_PATH '{directory}/data/'{inlining});"
+                )
+            else:
+                self.duckdb_connection.execute(f"ATTACH '{directory}/lake.duckdb' AS {alias};")
+
+        def _install_duckdb_extensions(self, extensions=None):
+            # nothing is read from s3/postgres, only the catalog extension is needed
+            return ensure_extensions(self.duckdb_connection, ["ducklake"] if catalog == "ducklake" else [])
+
+        def _connectivity_assessment(self):
+            return None
+
+        def open_consumer(self, group: str, topics: list[str]):
+            consumer = FakeConsumer(self.messages, on_exhausted=self.stop)
+            self._consumers.append(consumer)
+            consumer.subscribe(topics, on_assign=self.on_assign_resume)
+            return consumer
+
+        def insert_frames(self, table, frames, offsets):
+            started = time.perf_counter()
+            super().insert_frames(table, frames, offsets)
+            self.latencies.append(time.perf_counter() - started)
+
+    return LocalConnector
+
+
+def write_config(directory: str, args) -> str:
+    config = {
+        "BrokerCnn": {
+            "ingest_topics": [TOPIC],
+            "ingest_table": TABLE,
+            "group_id": "bench",
+            "batch_size": args.batch_size,
+            "max_rows": args.batch_size,
+            "max_latency_ms": args.max_latency_ms,
+            "decode": args.decode,
+            "pipeline": {"enabled": args.pipeline},
+        },
+        "Lake": {
+            "SRC": {},
+            "DEST": {"catalog": {"lake_alias": "lake"}, "storage": {}},
+            "query_cache": {"enabled": False},
+            "inlining": {"row_limit": args.inlining_row_limit, "flush_interval_seconds": 0},
+        },
+    }
+    path = os.path.join(directory, "config.yml")
+    with open(path, "w") as config_file:
+        yaml.safe_dump(config, config_file)
+    return path
+
+
+def percentile(samples: list[float], q: int) -> Optional[float]:
+    if not samples:
+        return None
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def lake_counts(connection, directory: str, catalog: str) -> dict:
+    counts = {"rows": connection.execute(f"SELECT count(*) FROM lake.main.{TABLE};").fetchone()[0]}
+    data_files = sum(len(files) for _, _, files in os.walk(os.path.join(directory, "data")))
+    counts["files_on_disk"] = data_files if catalog == "ducklake" else None
+    if catalog == "ducklake":
+        counts["snapshots"] = connection.execute("SELECT count(*) FROM ducklake_snapshots('lake');").fetchone()[0]
+        counts["data_files"] = connection.execute("SELECT coalesce(sum(file_count), 0) FROM ducklake_table_info('lake');").fetchone()[0]
+    else:
+        counts["snapshots"] = counts["data_files"] = None
+    return counts
+
+
+def run_scenario(scenario: str, args) -> dict:
+    """one scenario in this process, meant to run in a fresh interpreter (see main)"""
+    import logging
+
+    # per batch info/warning logs would dominate the measurement, errors still show
+    logging.disable(logging.WARNING)
+    directory = tempfile.mkdtemp(prefix="lake-bench-")
+    try:
+        messages = recorded_messages(args.replay, args.partitions) if args.replay else synthetic_messages(args.messages, args.partitions)
+        connector_class = local_connector(directory, args.catalog)
+        connector_class.messages = messages
+        connector = connector_class(write_config(directory, args), decode_mode=args.decode)
+        started = time.perf_counter()
+        if scenario == "consume_batch":
+            connector.checkpoint.ensure_table()
+            consumer = connector.open_consumer(connector.BrokerCnn.group_id, connector.router.subscriptions)
+            rows, last = 0, time.perf_counter()
+            for messages_frame in connector.consume_batch(consumer, batch_size=args.batch_size):
+                rows += len(messages_frame)
+                now = time.perf_counter()
+                connector_class.latencies.append(now - last)
+                last = now
+        elif scenario == "attach":
+            connector.attach(pipelined=args.pipeline)
+        else:
+            connector.single_message(batch_size=args.batch_size, max_latency_ms=args.max_latency_ms)
+        seconds = time.perf_counter() - started
+        latencies = connector_class.latencies
+        result = {
+            "scenario": scenario,
+            "messages": len(messages),
+            "seconds": round(seconds, 3),
+            "msgs_per_sec": round(len(messages) / seconds, 1) if seconds else None,
+            "batches": len(latencies),
+            "batch_latency_ms": {
+                "p50": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+                "p99": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+                "max": round(max(latencies) * 1000, 3) if latencies else None,
+            },
+            # ru_maxrss is in KiB on linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+        if scenario == "consume_batch":
+            result["rows_decoded"] = rows
+        else:
+            result.update(lake_counts(connector.duckdb_connection, directory, args.catalog))
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def compare(results: list[dict], baseline_path: str, max_regression: float) -> list[str]:
+    with open(baseline_path) as baseline_file:
+        baseline = {result["scenario"]: result for result in json.load(baseline_file)["results"]}
+    failures = []
+    for result in results:
+        before = baseline.get(result["scenario"], {}).get("msgs_per_sec")
+        if before and result.get("msgs_per_sec") is not None and result["msgs_per_sec"] < before * (1 - max_regression):
+            failures.append(f"{result['scenario']}: {result['msgs_per_sec']} msgs/sec (baseline {before}, > {max_regression:.0%} slower)")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, default=None, help="repeatable, default: all")
+    parser.add_argument("--messages", type=int, default=100_000, help="synthetic messages per scenario")
+    parser.add_argument("--replay", type=str, default=None, help="json lines file replayed instead of synthetic messages")
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--max-latency-ms", type=int, default=1000)
+    parser.add_argument("--decode", choices=["pandas", "arrow"], default="arrow")
+    parser.add_argument("--pipeline", action="store_true", help="run attach with the pipelined poll/decode/insert stages")
+    parser.add_argument("--catalog", choices=["ducklake", "duckdb"], default="ducklake")
+    parser.add_argument("--inlining-row-limit", type=int, default=None)
+    parser.add_argument("--output", type=str, default=None, help="also write the json report to this file")
+    parser.add_argument("--compare", type=str, default=None, help="baseline json report, exit 1 on a msgs/sec regression")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--child", choices=SCENARIOS, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args)))
+        return 0
+
+    import duckdb
+
+    results = []
+    for scenario in args.scenario or SCENARIOS:
+        # a fresh interpreter per scenario, so peak RSS and caches are its own
+        replay = ["--replay", os.path.abspath(args.replay)] if args.replay else []
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *sys.argv[1:], *replay, "--child", scenario],
+            capture_output=True, text=True, cwd=ROOT,
+        )
+        if child.returncode != 0:
+            results.append({"scenario": scenario, "error": (child.stderr.strip().splitlines() or ["failed"])[-1]})
+            continue
+        results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=ROOT).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    report = {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "duckdb": duckdb.__version__,
+        "parameters": {
+            "messages": args.messages, "replay": args.replay, "partitions": args.partitions, "batch_size": args.batch_size,
+            "decode": args.decode, "pipeline": args.pipeline, "catalog": args.catalog, "inlining_row_limit": args.inlining_row_limit,
+        },
+        "results": results,
+    }
+    failures = [f"{result['scenario']}: {result['error']}" for result in results if "error" in result]
+    if args.compare:
+        failures += compare(results, args.compare, args.max_regression)
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,22 @@
 import argparse
 import os
-from lake.connector.core import DuckLakeManager
 from lake.util.logger import logger
 
+# modules each command imports (lazily, inside its branch below), profiled by --profile-startup
+COMMAND_MODULES = {
+    "help": ["lake.cmd"],
+    "attach": ["lake.cmd", "lake.connector.kafka"],
+    "maintain": ["lake.cmd", "lake.connector.core", "lake.connector.maintenance"],
+    "sync": ["lake.cmd", "lake.connector.core", "lake.connector.sync"],
+    "register": ["lake.cmd", "lake.connector.core", "lake.connector.register"],
+    "layout": ["lake.cmd", "lake.connector.core", "lake.connector.layout"],
+    "flush": ["lake.cmd", "lake.connector.core", "lake.connector.maintenance"],
+    "serve": ["lake.cmd", "lake.render"],
+    "test": ["lake.cmd", "lake.connector.core"],
+    "extensions": ["lake.cmd", "lake.connector.extensions"],
+    "health": ["lake.cmd", "lake.connector.health"],
+}
+
 
 def main():
     """
@@ -18,12 +32,20 @@ def main():
         version="%(prog)s 0.1.0", # Fetches version from prog
         help="Show program's version number and exit.",
     )
+    parser.add_argument(
+        "--profile-startup",
+        nargs="?",
+        const="help",
+        choices=sorted(COMMAND_MODULES),
+        metavar="COMMAND",
+        help="print the import time breakdown of a command (default: the bare CLI) and exit",
+    )
 
     subparsers = parser.add_subparsers(
         title="Commands",
         dest="command",
         help="Available sub-commands",
-        required=True, # Ensures a subcommand is always provided
+        required=False, # checked below, --profile-startup runs without a subcommand
     )
     parser_serve = subparsers.add_parser(
         "serve",
@@ -53,15 +75,294 @@ def main():
         default='resources/config.yml',
         help="path to config file included SRC/DEST"
     )
+    parser_attach.add_argument(
+        "--decode",
+        type=str,
+        choices=["pandas", "arrow"],
+        default=None,
+        help="decode path for message batches (overrides BrokerCnn.decode)"
+    )
+    parser_attach.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="number of ingest worker processes sharing the consumer group (one per partition at most)"
+    )
+    parser_attach.add_argument(
+        "--pipeline",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="overlap poll/decode/insert stages (overrides BrokerCnn.pipeline.enabled)"
+    )
+    parser_maintain = subparsers.add_parser(
+        "maintain",
+        help="compact small files, expire snapshots and delete unreferenced files of the lake",
+    )
+    parser_maintain.add_argument(
+        "--config",
+        "-c",
+        type=str,
+        required=True,
+        default='resources/config.yml',
+        help="path to config file included SRC/DEST"
+    )
+    parser_maintain.add_argument(
+        "--table",
+        "-t",
+        action="append",
+        default=None,
+        help="table to maintain (repeatable, default: every lake table)"
+    )
+    parser_maintain.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report files/bytes before and the estimated layout after maintenance"
+    )
+    parser_maintain.add_argument(
+        "--schedule",
+        action="store_true",
+        help="keep running and maintain each table every Lake.maintenance.<table>.interval_minutes"
+    )
+    parser_maintain.add_argument(
+        "--include-registered",
+        action="store_true",
+        help="also merge tables with files added by `lake register`, their original files are deleted afterwards"
+    )
+    parser_sync = subparsers.add_parser(
+        "sync",
+        help="copy the rows of the Lake.sync postgres tables changed since the last run into the lake",
+    )
+    parser_sync.add_argument(
+        "--config",
+        "-c",
+        type=str,
+        required=True,
+        default='resources/config.yml',
+        help="path to config file included SRC/DEST"
+    )
+    parser_sync.add_argument(
+        "--table",
+        "-t",
+        action="append",
+        default=None,
+        help="lake table to sync (repeatable, default: every Lake.sync table)"
+    )
+    parser_sync.add_argument(
+        "--full",
+        action="store_true",
+        help="drop the lake tables and copy every row again"
+    )
+    parser_register = subparsers.add_parser(
+        "register",
+        help="add existing parquet files to a lake table as metadata only (no rewrite)",
+    )
+    parser_register.add_argument(
+        "--config",
+        "-c",
+        type=str,
+        required=True,
+        default='resources/config.yml',
+        help="path to config file included SRC/DEST"
+    )
+    parser_register.add_argument(
+        "--table",
+        "-t",
+        type=str,
+        required=True,
+        help="lake table receiving the files (created from the first file when missing)"
+    )
+    parser_register.add_argument(
+        "paths",
+        nargs="+",
+        help="parquet files or globs, e.g. 's3://bucket/events/**/*.parquet'"
+    )
+    parser_register.add_argument(
+        "--mode",
+        choices=["reference", "copy", "auto"],
+        default="reference",
+        help="reference the files, copy them into the lake, or copy only the ones that cannot be referenced"
+    )
+    parser_register.add_argument(
+        "--allow-missing",
+        action="store_true",
+        help="accept files missing some table columns (read as NULL)"
+    )
+    parser_register.add_argument(
+        "--ignore-extra-columns",
+        action="store_true",
+        help="accept files with columns the table does not have"
+    )
+    parser_layout = subparsers.add_parser(
+        "layout",
+        help="apply the Lake.layout partitioning and parquet options to existing lake tables",
+    )
+    parser_layout.add_argument(
+        "--config",
+        "-c",
+        type=str,
+        required=True,
+        default='resources/config.yml',
+        help="path to config file included SRC/DEST"
+    )
+    parser_layout.add_argument(
+        "--table",
+        "-t",
+        action="append",
+        default=None,
+        help="table to apply the layout to (repeatable, default: every lake table)"
+    )
+    parser_flush = subparsers.add_parser(
+        "flush",
+        help="write the rows inlined in the catalog by small inserts to parquet files",
+    )
+    parser_flush.add_argument(
+        "--config",
+        "-c",
+        type=str,
+        required=True,
+        default='resources/config.yml',
+        help="path to config file included SRC/DEST"
+    )
+    parser_flush.add_argument(
+        "--table",
+        "-t",
+        action="append",
+        default=None,
+        help="table to flush (repeatable, default: every lake table)"
+    )
+    parser_flush.add_argument(
+        "--min-rows",
+        type=int,
+        default=0,
+        help="skip tables with fewer inlined rows"
+    )
+    parser_extensions = subparsers.add_parser(
+        "extensions",
+        help="install the duckdb extensions of a config into Lake.extensions.directory (run ahead of time for air-gapped hosts)",
+    )
+    parser_extensions.add_argument(
+        "--config",
+        "-c",
+        type=str,
+        required=True,
+        default='resources/config.yml',
+        help="path to config file included SRC/DEST"
+    )
+    parser_health = subparsers.add_parser(
+        "health",
+        help="probe DEST, SRC and broker endpoints concurrently and print a report (exit 1 when DEST is unreachable)",
+    )
+    parser_health.add_argument(
+        "--config",
+        "-c",
+        type=str,
+        required=True,
+        default='resources/config.yml',
+        help="path to config file included SRC/DEST"
+    )
+    parser_health.add_argument(
+        "--json",
+        action="store_true",
+        help="print the report as json"
+    )
+    start_group = parser_attach.add_mutually_exclusive_group()
+    start_group.add_argument(
+        "--from-beginning",
+        action="store_true",
+        help="ignore the lake checkpoints and re-read every assigned partition from its first offset"
+    )
+    start_group.add_argument(
+        "--from-timestamp",
+        type=str,
+        default=None,
+        help="start every assigned partition at the first message at/after this time (epoch ms or ISO-8601)"
+    )
+    start_group.add_argument(
+        "--from-offsets",
+        type=str,
+        default=None,
+        help="explicit start offsets as topic:partition:offset[,topic:partition:offset...]"
+    )
     args = parser.parse_args()
+    if args.profile_startup:
+        from lake.util.startup import profile_startup
+        profile_startup(COMMAND_MODULES[args.profile_startup])
+        return
+    if args.command is None:
+        parser.error("the following arguments are required: command")
     if args.command == 'attach':
-        cnn = load_lake("kafka",args.config)
-        cnn.attach()
+        from lake.connector.checkpoint import StartPosition
+        start_position = StartPosition(
+            beginning=args.from_beginning,
+            timestamp_ms=StartPosition.parse_timestamp(args.from_timestamp) if args.from_timestamp else None,
+            offsets=StartPosition.parse_offsets(args.from_offsets) if args.from_offsets else {},
+        )
+        if args.workers > 1:
+            from lake.connector.workers import IngestSupervisor
+            IngestSupervisor(args.config, args.workers, decode_mode=args.decode, pipelined=args.pipeline, start_position=start_position).run()
+        else:
+            from lake.connector import load_lake
+            cnn = load_lake("kafka",args.config,decode_mode=args.decode,start_position=start_position)
+            cnn.attach(pipelined=args.pipeline)
+    elif args.command == 'maintain':
+        from lake.connector.core import DuckLakeManager
+        lake = DuckLakeManager(args.config)
+        if args.schedule:
+            lake.lake_maintenance(args.include_registered).run_scheduled()
+        else:
+            report = lake.maintain(tables=args.table, dry_run=args.dry_run, include_registered=args.include_registered)
+            print(report.summary())
+    elif args.command == 'sync':
+        from lake.connector.core import DuckLakeManager
+        report = DuckLakeManager(args.config).sync(tables=args.table, full=args.full)
+        print(report.summary())
+        if report.failed:
+            raise SystemExit(1)
+    elif args.command == 'register':
+        from lake.connector.core import DuckLakeManager
+        report = DuckLakeManager(args.config).register(
+            args.table, args.paths, mode=args.mode, allow_missing=args.allow_missing, ignore_extra_columns=args.ignore_extra_columns
+        )
+        print(report.summary())
+        if report.errors:
+            raise SystemExit(1)
+    elif args.command == 'layout':
+        from lake.connector.core import DuckLakeManager
+        for table, statements in DuckLakeManager(args.config).apply_layout(tables=args.table).items():
+            print(f"{table}: {len(statements)} changes" + "".join(f"\n  {statement}" for statement in statements))
+    elif args.command == 'flush':
+        from lake.connector.core import DuckLakeManager
+        flushed = DuckLakeManager(args.config).flush_inlined_data(tables=args.table, min_rows=args.min_rows)
+        print(f"flushed {sum(flushed.values())} inlined rows of {len(flushed)} tables")
+        for table, rows in flushed.items():
+            print(f"  {table}: {rows}")
+    elif args.command == 'extensions':
+        import duckdb
+        from lake.connector.extensions import connection_config, ensure_extensions, required_extensions
+        from lake.util.conf_loader import Configs
+        config = Configs(args.config)
+        connection = duckdb.connect(config=connection_config(config.Lake.extensions))
+        if ensure_extensions(connection, required_extensions(config.Lake)) is not None:
+            raise SystemExit(1)
+        for name, version, install_path in connection.execute(
+            "SELECT extension_name, extension_version, install_path FROM duckdb_extensions() WHERE loaded AND install_path != '(BUILT-IN)'"
+        ).fetchall():
+            print(f"{name} {version} {install_path}")
+    elif args.command == 'health':
+        import json
+        from lake.connector.health import check_lake
+        from lake.util.conf_loader import Configs
+        # only the config is needed, the lake is not attached (nor its bucket/database created) for a health check
+        report = check_lake(Configs(args.config), create=False)
+        print(json.dumps(report.to_dict(), indent=2) if args.json else report.summary())
+        if not report.healthy:
+            raise SystemExit(1)
     elif args.command == 'serve':
-        from lake.connector import load_lake
         from lake.render import serve
         serve()
     elif args.command == 'test':
+        from lake.connector.core import DuckLakeManager
         lake = DuckLakeManager(args.config)
 
         # get_data = f"select * from lake.awesome_table;" 
@@ -0,0 +1,80 @@
+import time
+from collections.abc import Callable
+from typing import Optional
+
+import pyarrow as pa
+
+from lake.connector.decode import flatten_table
+
+
+class RowAppender:
+    """
+    low-latency row buffer of the single message mode.
+    rows are appended into columnar lists grouped by their key set (the fields a message carries),
+    every key set keeps its prepared insert statement (per batch schema), and the whole buffer is flushed
+    as one insert per key set once `max_rows` rows are buffered or the oldest row waited `max_latency_ms`.
+    """
+    def __init__(self, max_rows: int = 1000, max_latency_ms: int = 50):
+        self.max_rows = max_rows
+        self.max_latency = max_latency_ms / 1000
+        self.rows = 0
+        self.offsets: dict[tuple[str, int], int] = {}
+        self.first_at: Optional[float] = None
+        self._columns: dict[tuple, dict[str, list]] = {}
+        self._statements: dict[tuple[tuple, pa.Schema], str] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def append(self, row: dict, topic: str, partition: int, offset: int) -> None:
+        if self.first_at is None:
+            self.first_at = time.monotonic()
+        keys = tuple(row.keys())
+        columns = self._columns.get(keys)
+        if columns is None:
+            columns = self._columns[keys] = {key: [] for key in keys}
+        for key, value in row.items():
+            columns[key].append(value)
+        self.offsets[(topic, partition)] = offset
+        self.rows += 1
+
+    def remaining(self) -> Optional[float]:
+        """seconds left until the latency limit forces a flush (None while the buffer is empty)"""
+        if self.first_at is None:
+            return None
+        return max(self.first_at + self.max_latency - time.monotonic(), 0.0)
+
+    def should_flush(self) -> bool:
+        return self.rows > 0 and (self.rows >= self.max_rows or self.remaining() == 0.0)
+
+    @staticmethod
+    def _to_frame(columns: dict[str, list]):
+        try:
+            return flatten_table(pa.table(columns))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # mixed python types within a field, let duckdb analyze the objects instead
+            import pandas as pd
+            return pd.DataFrame(columns)
+
+    def statement(self, keys: tuple, messages_frame, prepare: Callable[[object], str]) -> str:
+        """
+        select list of a key set, prepared (schema checked) again whenever the arrow types of its batch change
+        so a wider value (1.7 into a BIGINT field) evolves the table instead of being cast to the old type.
+        """
+        schema = getattr(messages_frame, "schema", None)
+        if schema is None:
+            # object columns of a DataFrame (mixed python types) can hold anything, every batch is checked
+            return prepare(messages_frame)
+        if (keys, schema) not in self._statements:
+            self._statements[(keys, schema)] = prepare(messages_frame)
+        return self._statements[(keys, schema)]
+
+    def reset_statements(self) -> None:
+        self._statements.clear()
+
+    def drain(self) -> tuple[list[tuple[tuple, object]], dict[tuple[str, int], int]]:
+        """columnar frames of every key set plus the offsets they cover, the buffer is empty afterwards"""
+        frames = [(keys, self._to_frame(columns)) for keys, columns in self._columns.items()]
+        offsets = self.offsets
+        self._columns, self.offsets, self.rows, self.first_at = {}, {}, 0, None
+        return frames, offsets
@@ -0,0 +1,53 @@
+import time
+from typing import Optional
+
+from lake.connector.pipeline import MessageBatch
+
+
+class BatchBuffer:
+    """
+    gathers messages across polls and decides when they are flushed as one lake write.
+    a flush happens as soon as any of the limits is reached:
+    `max_rows` messages, `max_bytes` of raw payload or `max_latency_ms` since the first buffered message.
+    """
+    def __init__(self, max_rows: int, max_bytes: int, max_latency_ms: int, table: Optional[str] = None, key_column: Optional[str] = None):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency_ms / 1000
+        self.table = table
+        self.key_column = key_column
+        self.batch = MessageBatch(table=table, key_column=key_column)
+        self.first_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    def add(self, topic: str, partition: int, offset: int, payload: bytes, key: Optional[bytes] = None) -> None:
+        if self.first_at is None:
+            self.first_at = time.monotonic()
+        self.batch.add(topic, partition, offset, payload, key)
+
+    @property
+    def free_rows(self) -> int:
+        return max(self.max_rows - len(self.batch), 0)
+
+    def remaining(self) -> Optional[float]:
+        """seconds left until the latency limit forces a flush (None while the buffer is empty)"""
+        if self.first_at is None:
+            return None
+        return max(self.first_at + self.max_latency - time.monotonic(), 0.0)
+
+    def should_flush(self) -> bool:
+        if not self.batch:
+            return False
+        return (
+            len(self.batch) >= self.max_rows
+            or self.batch.nbytes >= self.max_bytes
+            or self.remaining() == 0.0
+        )
+
+    def flush(self, generation: int = 0) -> MessageBatch:
+        batch = self.batch
+        batch.started_at, batch.generation, self.first_at = self.first_at, generation, None
+        self.batch = MessageBatch(table=self.table, key_column=self.key_column)
+        return batch
@@ -0,0 +1,141 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from confluent_kafka import OFFSET_BEGINNING, OFFSET_END, OFFSET_STORED, TopicPartition
+from duckdb import DuckDBPyConnection
+
+from lake.util.logger import logger
+
+
+@dataclass
+class StartPosition:
+    """
+    explicit starting point of a bounded backfill (`--from-beginning`, `--from-timestamp`, `--from-offsets`).
+    it is applied to each partition once per run, partitions that already have a checkpoint
+    written after `issued_at` (e.g. by another worker of the same run) resume from it instead.
+    """
+    beginning: bool = False
+    timestamp_ms: Optional[int] = None
+    offsets: dict[tuple[str, int], int] = field(default_factory=dict)
+    issued_at: float = field(default_factory=time.time)
+
+    @property
+    def explicit(self) -> bool:
+        return self.beginning or self.timestamp_ms is not None or bool(self.offsets)
+
+    @staticmethod
+    def parse_timestamp(value: str) -> int:
+        """epoch milliseconds or an ISO-8601 datetime (naive values are taken as UTC)"""
+        if value.isdigit():
+            return int(value)
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp() * 1000)
+
+    @staticmethod
+    def parse_offsets(value: str) -> dict[tuple[str, int], int]:
+        """`topic:partition:offset[,topic:partition:offset...]`"""
+        offsets = {}
+        for item in filter(None, (part.strip() for part in value.split(","))):
+            topic, partition, offset = item.rsplit(":", 2)
+            offsets[(topic, int(partition))] = int(offset)
+        return offsets
+
+
+def prune_checkpoints(connection: DuckDBPyConnection, table: str, dry_run: bool = False) -> int:
+    """
+    delete the checkpoint rows superseded by a later checkpoint of the same group and partition (every group),
+    only the latest one (the resume point, also after a rewind to a lower offset) is kept.
+    returns the rows deleted (to be deleted on a dry-run).
+    """
+    superseded = f"""EXISTS (
+        SELECT 1 FROM {table} newer WHERE newer.group_id = checkpoint.group_id AND newer.topic = checkpoint.topic
+        AND newer."partition" = checkpoint."partition" AND newer.committed_at > checkpoint.committed_at
+    )"""
+    if dry_run:
+        return connection.execute(f"SELECT count(*) FROM {table} checkpoint WHERE {superseded};").fetchone()[0]
+    return connection.execute(f"DELETE FROM {table} checkpoint WHERE {superseded};").fetchone()[0]
+
+
+class OffsetCheckpoint:
+    """
+    consumed offsets stored inside the lake next to the ingested rows.
+    rows are append-only (one row per partition per batch) so concurrent workers never
+    conflict on updates, the resume point of a partition is the offset of its latest checkpoint
+    (not the highest one, a backfill rewinds it).
+    superseded rows are removed by `lake maintain` (prune_checkpoints).
+    """
+    def __init__(self, connection: DuckDBPyConnection, table: str, group_id: str):
+        self.connection = connection
+        self.table = table
+        self.group_id = group_id
+
+    def ensure_table(self) -> None:
+        self.connection.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                group_id VARCHAR,
+                topic VARCHAR,
+                "partition" INTEGER,
+                "offset" BIGINT,
+                committed_at TIMESTAMP WITH TIME ZONE
+            );"""
+        )
+
+    def load(self, topics: Optional[list[str]] = None) -> dict[tuple[str, int], tuple[int, float]]:
+        """offset of the latest checkpoint and its commit time (epoch seconds) for every partition of the group (of `topics`)"""
+        # a dedicated cursor, partition assignment runs on the poller thread while the writer owns the connection
+        cursor = self.connection.cursor()
+        try:
+            topic_filter = f" AND topic IN ({', '.join(['?'] * len(topics))})" if topics else ""
+            rows = cursor.execute(
+                f"""SELECT topic, "partition", arg_max("offset", committed_at), epoch(max(committed_at))
+                FROM {self.table} WHERE group_id = ?{topic_filter} GROUP BY topic, "partition";""",
+                [self.group_id, *(topics or [])],
+            ).fetchall()
+        finally:
+            cursor.close()
+        return {(topic, partition): (offset, committed_at) for topic, partition, offset, committed_at in rows}
+
+    def insert_statement(self, offsets: dict[tuple[str, int], int]) -> tuple[str, list]:
+        """statement (and parameters) recording a batch, meant to run in the same transaction as the batch insert"""
+        values = ", ".join(["(?, ?, ?, ?, now())"] * len(offsets))
+        parameters = []
+        for (topic, partition), offset in offsets.items():
+            parameters.extend([self.group_id, topic, partition, offset])
+        return f"INSERT INTO {self.table} VALUES {values};", parameters
+
+    def resolve(self, consumer, partitions: list[TopicPartition], start: Optional[StartPosition], positioned: set) -> list[TopicPartition]:
+        """set the offset of every newly assigned partition from the start position or the stored checkpoint"""
+        checkpoints = self.load(sorted({partition.topic for partition in partitions}))
+        by_timestamp = []
+        for partition in partitions:
+            key = (partition.topic, partition.partition)
+            checkpoint = checkpoints.get(key)
+            use_start = (
+                start is not None and start.explicit and key not in positioned
+                and (checkpoint is None or checkpoint[1] < start.issued_at)
+            )
+            if use_start and key in start.offsets:
+                partition.offset = start.offsets[key]
+            elif use_start and start.timestamp_ms is not None:
+                partition.offset = start.timestamp_ms
+                by_timestamp.append(partition)
+            elif use_start and start.beginning:
+                partition.offset = OFFSET_BEGINNING
+            elif checkpoint is not None:
+                partition.offset = checkpoint[0] + 1
+            else:
+                # nothing ingested yet, fall back to the committed kafka offset (auto.offset.reset=earliest)
+                partition.offset = OFFSET_STORED
+            positioned.add(key)
+        if by_timestamp:
+            for resolved in consumer.offsets_for_times(by_timestamp, timeout=10.0):
+                for partition in by_timestamp:
+                    if (partition.topic, partition.partition) == (resolved.topic, resolved.partition):
+                        partition.offset = resolved.offset if resolved.offset >= 0 else OFFSET_END
+        for partition in partitions:
+            logger.info(f"assigned {partition.topic}[{partition.partition}] starting at offset {partition.offset}")
+        return partitions
@@ -1,25 +1,44 @@
 import sys
-import boto3
+import time
 import duckdb
-import psycopg2
-from typing import List, Optional
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from botocore.exceptions import ClientError, ConnectTimeoutError
+from typing import TYPE_CHECKING, Any, List, Optional
 from lake.util.conf_loader import Configs,StorageCnn,PgCnn
-import time
 from lake.util.logger import logger
+from lake.util.metrics import metrics
 from duckdb import CatalogException
 from typing import Literal, cast,Union
 from duckdb import IOException
 
+if TYPE_CHECKING:
+    from lake.connector.query_cache import QueryCache
+
+QUERY_SECONDS = metrics.histogram("lake_query_seconds", "DuckLakeManager.query latency by cache outcome", ("cache",))
+QUERY_ROWS = metrics.counter("lake_query_rows_total", "rows returned by DuckLakeManager.query", ("cache",))
+
 class DuckLakeManager(Configs):
     pg_catalog:str = None
     s3_source_create_command: str = None
     healthy: bool = None
     duckdb_connection: duckdb.DuckDBPyConnection = None
-    def __init__(self,config_path):
+    query_cache: Any = None # QueryCache, imported on first use
+    def __init__(self,config_path,shared:bool=False,sources:Optional[List[str]]=None):
         super(DuckLakeManager,self).__init__(config_path)
-        self.duckdb_connection = duckdb.connect()
+        if shared:
+            # cursor on the process wide connection, secrets and ATTACHes are only done on its first checkout
+            from lake.connector.pool import manager_pool
+            self.duckdb_connection = manager_pool.cursor(config_path)
+            self.query_cache = manager_pool.query_cache(config_path)
+            if sources:
+                self.attach_sources(sources)
+            return
+        from lake.connector.extensions import connection_config
+        from lake.connector.sources import SourceConnection, SourceRegistry
+        # SRC sources are attached on first reference through this wrapper, python frames (messages_frame)
+        # are registered on the connection explicitly (see schema.registered), no replacement scan sees them
+        self.duckdb_connection = SourceConnection(duckdb.connect(config=connection_config(self.Lake.extensions)), SourceRegistry())
+        # already installed/loaded extensions are skipped, so this is cheap and works offline with a filled cache
+        if self._install_duckdb_extensions() is not None:
+            logger.warning("not every extension could be loaded upfront, relying on autoload while attaching")
         try:
             self._attach()
             result = self.duckdb_connection.execute(f"""
@@ -31,15 +50,27 @@ class DuckLakeManager(Configs):
             if len(result) == 0:
                raise CatalogException
             logger.info(f"attached existing ducklake {self.Lake.DEST.catalog.lake_alias} with {len(result)} tables")
+            if sources or self.Lake.SRC.preattach:
+                self.attach_sources(list(dict.fromkeys([*(sources or []), *self.Lake.SRC.preattach])))
         except CatalogException:
             logger.warning(f"catalog Not found! (Creating {self.Lake.DEST.catalog.lake_alias}...)")
             self._connectivity_assessment()
-            required_extentions = list(self.Lake.SRC.model_dump().keys())
-            installation_status = self.__install_duckdb_extensions(extensions=required_extentions)
+            installation_status = self._install_duckdb_extensions()
             if installation_status is not None:
                 sys.exit(1)
 
 
+    def attach_sources(self, aliases: List[str]) -> dict:
+        """
+        attach SRC sources that are known to be needed in parallel instead of on their first query,
+        a source that fails is logged and retried when a query references it.
+        """
+        errors = self.duckdb_connection.attach_sources(aliases)
+        failed = {alias: error for alias, error in errors.items() if error}
+        if failed:
+            logger.error(f"sources {list(failed)} could not be attached: {failed}")
+        return errors
+
     def _get_dest_storage_secret(self):
         try:
             return (
@@ -119,22 +150,18 @@ class DuckLakeManager(Configs):
         except Exception as fail:
             logger.error(f'ducklake (DataPath) storage has not been registered ! {fail}')
         
-        if self.Lake.SRC.storage:
-            
-            for lake_alias,storage_cfg in self.Lake.SRC.storage.items():
-                logger.info(f"register minio instance {lake_alias} on scope {storage_cfg.scope}")
-                try:
-                    self.duckdb_connection.execute(self._get_src_s3_secret(lake_alias,storage_cfg))
-                except Exception as fail:
-                    logger.error(f"Failed to register new s3 instance {lake_alias} on scope {storage_cfg.scope} ")
-        if self.Lake.SRC.postgres:
-            logger.info(f"registering postgres source {list(self.Lake.SRC.postgres.keys())}")
-            for lake_alias,pg_cfg in self.Lake.SRC.postgres.items():
-                self.duckdb_connection.execute(self._get_src_pg_secret(lake_alias,pg_cfg))
-                attach_src_pg_command = f"ATTACH 'dbname={pg_cfg.database}' AS {lake_alias} (TYPE postgres,SCHEMA '{pg_cfg.schema}',SECRET {lake_alias}_secret);"
-                self.duckdb_connection.execute(attach_src_pg_command)
+        # SRC sources are only registered here, each one is attached the first time a query references it
+        for lake_alias,storage_cfg in self.Lake.SRC.storage.items():
+            self.duckdb_connection.sources.add_storage(lake_alias, storage_cfg.scope, self._get_src_s3_secret(lake_alias,storage_cfg))
+        for lake_alias,pg_cfg in self.Lake.SRC.postgres.items():
+            attach_src_pg_command = f"ATTACH 'dbname={pg_cfg.database}' AS {lake_alias} (TYPE postgres,SCHEMA '{pg_cfg.schema}',SECRET {lake_alias}_secret);"
+            self.duckdb_connection.sources.add_postgres(lake_alias, self._get_src_pg_secret(lake_alias,pg_cfg), attach_src_pg_command)
+        if self.Lake.SRC.storage or self.Lake.SRC.postgres:
+            logger.info(f"registered sources {[*self.Lake.SRC.storage, *self.Lake.SRC.postgres]} (attached on first use)")
         logger.info(f"registering core 'DATA LAKE' as {self.Lake.DEST.catalog.lake_alias}")
-        attach_lake_command = f"ATTACH 'ducklake:{self._get_dest_catalog_definition()}' AS {self.Lake.DEST.catalog.lake_alias} (DATA_PATH 's3://{self.Lake.DEST.storage.scope}');"
+        # small inserts are kept in the catalog instead of a parquet file each (flushed by flush_inlined_data)
+        inlining = f", DATA_INLINING_ROW_LIMIT {self.Lake.inlining.row_limit}" if self.Lake.inlining.row_limit is not None else ""
+        attach_lake_command = f"ATTACH 'ducklake:{self._get_dest_catalog_definition()}' AS {self.Lake.DEST.catalog.lake_alias} (DATA_PATH 's3://{self.Lake.DEST.storage.scope}'{inlining});"
         try:
             register_lake = self.duckdb_connection.execute(attach_lake_command).fetchall()
             logger.info(register_lake)
@@ -144,99 +171,134 @@ class DuckLakeManager(Configs):
              
 
 
+    def health_check(self, sources: bool = True, broker: bool = True, create: bool = False):
+        """probe DEST, SRC and broker endpoints concurrently (see lake.connector.health.check_lake)"""
+        from lake.connector.health import check_lake
+        return check_lake(self, sources=sources, broker=broker, create=create)
+
     def _connectivity_assessment(self):
-        s3_object = self.Lake.DEST.storage
-        pg_object = self.Lake.DEST.catalog
-        try:
-            logger.info(f"checking connectivity for source s3")
-            s3_client = boto3.client(
-                "s3",
-                endpoint_url=s3_object.http_url,
-                aws_access_key_id=s3_object.access_key.get_secret_value(),
-                aws_secret_access_key=s3_object.secret.get_secret_value()
-            )
-        except ClientError as e:
-            logger.error(f'failed to assert connection to s3://{s3_object.scope}| {e}')
-            time.sleep(3)
-            self._connectivity_assessment()
-        try:
-            bucket_data = s3_client.head_bucket(Bucket=s3_object.scope)
-            assert bucket_data['ResponseMetadata']['HTTPStatusCode'] == 200
-            logger.debug(f'bucket {s3_object.scope} already exist (no action needed)')
-        except ClientError as e:
-            logger.error(f'cannot find bucket with name {s3_object.scope} (creating...)')
-            try:
-                s3_client.create_bucket(Bucket=s3_object.scope)
-            except ClientError as e:
-                logger.error(f'there is a problem with defined bucket name or \
-                             client doesnt seem to have right permissions to create new bucket\
-                                -> {s3_object.scope} {e}')
-                time.sleep(3)
-                self._connectivity_assessment()
-        logger.info("s3 connectivity test successfull")
-        pg_conn = None
-        try:
-            logger.info(f"checking connectivity for catalog data-store({pg_object})")
-            pg_conn = psycopg2.connect(
-                host=pg_object.host,
-                port=pg_object.port,
-                user=pg_object.username.get_secret_value(),
-                password=pg_object.password.get_secret_value(),
-                dbname='postgres', # attach to postgress to get admin priveleges
-            )
-            pg_conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-            with pg_conn.cursor() as cursor:
-                db_name = pg_object.database
-                cursor.execute(
-                    "SELECT 1 FROM pg_database WHERE datname = %s", (db_name,)
-                )
-                exists = cursor.fetchone()
-                if not exists:
-                    logger.info(f"database '{db_name}' not found. Creating it now...")
-                    cursor.execute(f'CREATE DATABASE "{db_name}"')
-                    logger.info(f"database '{db_name}' created successfully.")
-                else:
-                    logger.info(
-                        f"database '{db_name}' already exists. No action needed."
-                    )
-        except psycopg2.Error as e:
-            logger.error(f"postgreSQL error: {e}")
-            time.sleep(3)
-            self._connectivity_assessment()
-        finally:
-            if pg_conn:
-                pg_conn.close()
-        logger.info("catalog connectivity test successfull")
+        # the lake is being created, a missing DEST bucket or catalog database is created here
+        report = self.health_check(create=True)
+        if not report.healthy:
+            logger.critical(f"lake endpoints are unreachable, giving up:\n{report.summary()}")
+            sys.exit(1)
+        return report
 
-    def __install_duckdb_extensions(
-        self, extensions: List = ["ducklake", "postgres", "httpfs","excel"]
+    def _install_duckdb_extensions(
+        self, extensions: Optional[List[str]] = None
     ) -> Optional[Exception]:
-        extensions.append('ducklake')
-        extenstion_names ={
-            "ducklake":"ducklake",
-            "postgres": "postgres",
-            "storage":"httpfs",
-            "excel": "excel",
-            "avro": "avro",
-            "aws":"aws"
-        }
+        from lake.connector.extensions import ensure_extensions, required_extensions
+        return ensure_extensions(self.duckdb_connection, extensions or required_extensions(self.Lake))
+
+    def maintain(self, tables: Optional[List[str]] = None, dry_run: bool = False, include_registered: bool = False):
+        """
+        compact small files (up to each table's target_file_size), expire snapshots older than the
+        retention window and delete old/orphaned files, returns a MaintenanceReport of files/bytes before and after.
+        superseded rows of the offset checkpoint table are pruned as well. tables with files added by `register`
+        are only merged (and their originals deleted afterwards) with `include_registered`.
+        """
+        return self.lake_maintenance(include_registered).run(tables=tables, dry_run=dry_run)
+
+    def lake_maintenance(self, include_registered: bool = False):
+        """LakeMaintenance of the lake, including the offset checkpoint table of the ingest"""
+        from lake.connector.maintenance import LakeMaintenance
+        lake_alias = self.Lake.DEST.catalog.lake_alias
+        return LakeMaintenance(
+            self.duckdb_connection, lake_alias, self.Lake.maintenance, self.Lake.layout,
+            checkpoint_table=f"{lake_alias}.{self.BrokerCnn.checkpoint_table}", include_registered=include_registered,
+        )
+
+    def flush_inlined_data(self, tables: Optional[List[str]] = None, min_rows: int = 0) -> dict:
+        """
+        write the rows inlined in the catalog by small inserts of `tables` (default: all) to parquet files,
+        returns the rows flushed per table. `lake attach` does this in the background (Lake.inlining).
+        """
+        from lake.connector.maintenance import LakeMaintenance
+        return LakeMaintenance(
+            self.duckdb_connection, self.Lake.DEST.catalog.lake_alias, self.Lake.maintenance, self.Lake.layout
+        ).flush_inlined(tables, min_rows=min_rows)
+
+    def table_layout(self):
+        """TableLayout of the lake (Lake.layout)"""
+        from lake.connector.layout import TableLayout
+        return TableLayout(self.duckdb_connection, self.Lake.DEST.catalog.lake_alias, self.Lake.layout)
+
+    def apply_layout(self, tables: Optional[List[str]] = None) -> dict:
+        """
+        bring `tables` (default: every lake table) to their Lake.layout partitioning and parquet options,
+        returns the statements that ran per table. existing files keep their layout until they are rewritten.
+        """
+        return self.table_layout().apply_all(tables)
+
+    def sync(self, tables: Optional[List[str]] = None, full: bool = False):
+        """
+        copy the rows of the Lake.sync tables changed since the last run from SRC postgres into the lake,
+        `full` drops the lake tables and copies everything again. returns a SyncReport.
+        """
+        from lake.connector.sync import PostgresSync
+        return PostgresSync(
+            self.duckdb_connection, self.Lake.DEST.catalog.lake_alias, self.Lake.SRC.postgres, self.Lake.sync, self.table_layout()
+        ).run(tables=tables, full=full)
+
+    def register(self, table: str, paths: List[str], mode: str = "reference", allow_missing: bool = False, ignore_extra_columns: bool = False):
+        """
+        add existing parquet files (paths/globs, e.g. on a SRC storage bucket) to a lake table without rewriting them,
+        `copy` rewrites them into the lake, `auto` only copies the ones that cannot be referenced. returns a RegisterReport.
+        """
+        from lake.connector.register import ParquetRegistrar
+        return ParquetRegistrar(
+            self.duckdb_connection, self.Lake.DEST.catalog.lake_alias, self.Lake.registration, self.table_layout()
+        ).run(table, paths, mode=mode, allow_missing=allow_missing, ignore_extra_columns=ignore_extra_columns)
+
+    def result_cache(self) -> Optional["QueryCache"]:
+        """QueryCache of this manager, created on first use (None when Lake.query_cache is disabled)"""
+        if self.query_cache is None and self.Lake.query_cache.enabled:
+            from lake.connector.query_cache import QueryCache
+            self.query_cache = QueryCache(
+                self.Lake.query_cache.max_bytes, self.Lake.query_cache.directory, self.Lake.query_cache.disk_max_bytes
+            )
+        return self.query_cache
+
+    def query(self, sql: str, params: Optional[list] = None, cache: bool = True):
+        """
+        run a read query and return it as an arrow table. results of queries that only read lake tables
+        are cached until one of those tables gets a new snapshot (see Lake.query_cache).
+        """
+        started = time.perf_counter()
+        try:
+            result, cache_state = self._query(sql, params, cache)
+        except Exception:
+            QUERY_SECONDS.observe(time.perf_counter() - started, cache="error")
+            raise
+        QUERY_SECONDS.observe(time.perf_counter() - started, cache=cache_state)
+        QUERY_ROWS.inc(result.num_rows, cache=cache_state)
+        return result
 
-        for key_name in extensions:
-            extension_name = extenstion_names[key_name]
-            try:
-                self.duckdb_connection.sql(f"INSTALL {extension_name};")
-                self.duckdb_connection.sql(f"LOAD {extension_name};")
-                logger.info(f"{extension_name} installed and loaded successfully.")
-            except duckdb.HTTPException as e:
-                logger.error(
-                    f"extension {extension_name} not found or you might have connectivity issues:\n{e}"
-                )
-                return e
-            except Exception as e:
-                logger.error(
-                    f"during installation of {extension_name} an unexpected error has occoured: {e}"
-                )
-                return e
+    def _query(self, sql: str, params: Optional[list], cache: bool) -> tuple[Any, str]:
+        """the result and how the cache served it (off, hit or miss)"""
+        if not cache or self.result_cache() is None:
+            return self.duckdb_connection.execute(sql, params).fetch_arrow_table(), "off"
+        from lake.connector.query_cache import cacheable, referenced_tables, table_versions
+        # parsed only, table functions are never bound (no I/O) before the statement is known to be cacheable
+        current_database, current_schema, parsed = self.duckdb_connection.execute(
+            "SELECT current_database(), current_schema(), json_serialize_sql(?)", [sql]
+        ).fetchone()
+        lake_alias = self.Lake.DEST.catalog.lake_alias
+        tables = referenced_tables(sql, lake_alias, current_database, current_schema) if cacheable(parsed) else None
+        if not tables:
+            return self.duckdb_connection.execute(sql, params).fetch_arrow_table(), "off"
+        versions = table_versions(self.duckdb_connection, lake_alias, tables)
+        if set(versions) != tables:
+            # a view or another name without a ducklake table has no snapshot to invalidate its results with
+            return self.duckdb_connection.execute(sql, params).fetch_arrow_table(), "off"
+        self.query_cache.observe(versions)
+        key = self.query_cache.key(sql, params, versions)
+        result = self.query_cache.get(key)
+        if result is not None:
+            return result, "hit"
+        result = self.duckdb_connection.execute(sql, params).fetch_arrow_table()
+        self.query_cache.put(key, result, set(versions))
+        return result, "miss"
 
     def retrive_snapshot(self,commit_type:Literal['tables_inserted_into','tables_deleted_from'],table_name:str):
         """Use time travel to investigate what happened."""
@@ -0,0 +1,139 @@
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Literal, Optional, Union
+
+import pyarrow as pa
+import pyarrow.json as pa_json
+
+DecodeMode = Literal["pandas", "arrow"]
+
+
+@dataclass
+class DecodeStats:
+    """running totals of the decode stage for a single decode mode"""
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    def record(self, rows: int, seconds: float):
+        self.rows += rows
+        self.batches += 1
+        self.seconds += seconds
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class DecodeReport:
+    """decode throughput of every mode used by a connector (pandas vs arrow)"""
+    modes: dict = field(default_factory=lambda: {"pandas": DecodeStats(), "arrow": DecodeStats()})
+
+    def record(self, mode: DecodeMode, rows: int, seconds: float):
+        self.modes[mode].record(rows, seconds)
+
+    def summary(self) -> str:
+        return " | ".join(
+            f"{mode}: {stats.rows} rows in {stats.batches} batches ({stats.rows_per_sec:.0f} rows/sec)"
+            for mode, stats in self.modes.items() if stats.batches
+        )
+
+
+def flatten_table(table: pa.Table) -> pa.Table:
+    """flatten nested struct columns into `parent.child` columns (same naming as json_normalize(sep='.'))"""
+    while any(pa.types.is_struct(column.type) for column in table.schema):
+        table = table.flatten()
+    return table
+
+
+def decode_arrow(payloads: list[bytes]) -> pa.Table:
+    """
+    decode a batch of json payloads in a single call by joining them into one
+    newline delimited buffer and handing it to pyarrow's json reader.
+    raises pyarrow.ArrowInvalid when the buffer cannot be parsed as a whole.
+    """
+    # tombstones (None) carry no row
+    payloads = [payload for payload in payloads if payload is not None]
+    buffer = b"\n".join(payloads)
+    parse_options = pa_json.ParseOptions(
+        newlines_in_values=any(b"\n" in payload for payload in payloads)
+    )
+    table = pa_json.read_json(pa.BufferReader(buffer), parse_options=parse_options)
+    return flatten_table(table)
+
+
+def decode_pandas(payloads: list[bytes], logger=None, keys: Optional[list] = None, key_column: Optional[str] = None):
+    """decode every payload with json.loads and flatten the batch using pandas.json_normalize"""
+    import pandas as pd
+
+    valid_messages, valid_keys = [], []
+    for index, payload in enumerate(payloads):
+        try:
+            valid_messages.append(json.loads(payload))
+        except Exception as fail:
+            if logger:
+                # lazy arguments: nothing is rendered when the record is filtered out
+                logger.warning("failed to collect message bytes: %s %s", payload, fail)
+            continue
+        if key_column:
+            valid_keys.append(keys[index])
+    # Flatten nested JSON; use pd.DataFrame(valid_messages) if you don't want flattening
+    frame = pd.json_normalize(valid_messages, sep='.')
+    if key_column:
+        frame[key_column] = [_decode_key(key) for key in valid_keys]
+    return frame
+
+
+def _decode_key(key: Optional[bytes]) -> Optional[str]:
+    return key.decode("utf-8", errors="replace") if key is not None else None
+
+
+def with_key_column(table: pa.Table, key_column: str, keys: list) -> pa.Table:
+    """store the kafka message keys of the batch in `key_column` (replacing a payload field of that name)"""
+    column = pa.array([_decode_key(key) for key in keys], type=pa.string())
+    if key_column in table.column_names:
+        return table.set_column(table.column_names.index(key_column), key_column, column)
+    return table.append_column(key_column, column)
+
+
+def decode_batch(
+    payloads: list[bytes],
+    mode: DecodeMode = "pandas",
+    report: DecodeReport = None,
+    logger=None,
+    keys: Optional[list] = None,
+    key_column: Optional[str] = None,
+) -> Union[pa.Table, "pd.DataFrame"]:
+    """
+    decode raw kafka payloads into a flat frame (with the message keys in `key_column` when given).
+    the arrow mode falls back to the pandas path for batches it cannot parse
+    (e.g. a malformed message) so a single bad payload never stops the ingest.
+    """
+    started = time.perf_counter()
+    frame = None
+    if any(payload is None for payload in payloads):
+        # tombstones carry no row, their keys are dropped with them
+        kept = [index for index, payload in enumerate(payloads) if payload is not None]
+        payloads = [payloads[index] for index in kept]
+        keys = [keys[index] for index in kept] if keys else keys
+    if mode == "arrow":
+        try:
+            frame = decode_arrow(payloads)
+            if key_column:
+                frame = with_key_column(frame, key_column, keys)
+        except (pa.ArrowInvalid, TypeError) as fail:
+            if logger:
+                logger.warning(f"arrow decode failed for batch of {len(payloads)} messages ({fail}) falling back to pandas")
+            started = time.perf_counter()
+            mode = "pandas"
+    if frame is None:
+        frame = decode_pandas(payloads, logger=logger, keys=keys, key_column=key_column)
+    elapsed = time.perf_counter() - started
+    if report is not None:
+        report.record(mode, len(frame), elapsed)
+    if logger:
+        rate = len(frame) / elapsed if elapsed else 0.0
+        logger.info("decoded %d rows in %.4fs (%.0f rows/sec, mode=%s)", len(frame), elapsed, rate, mode)
+    return frame
@@ -0,0 +1,69 @@
+from typing import Optional
+
+import duckdb
+
+from lake.util.conf_loader import ExtensionsCnf, Lake
+from lake.util.logger import logger
+
+# config sections -> duckdb extension they need
+EXTENSION_NAMES = {
+    "ducklake": "ducklake",
+    "postgres": "postgres",
+    "storage": "httpfs",
+    "excel": "excel",
+    "avro": "avro",
+    "aws": "aws",
+}
+
+
+def connection_config(settings: ExtensionsCnf) -> dict:
+    """duckdb.connect config pointing extension installs and autoloads at the local cache/repository"""
+    config = {}
+    if settings.directory:
+        config["extension_directory"] = settings.directory
+    if settings.repository:
+        config["custom_extension_repository"] = settings.repository
+        config["autoinstall_extension_repository"] = settings.repository
+    return config
+
+
+def required_extensions(lake: Lake) -> list[str]:
+    """extensions of the ducklake catalog (kept in postgres), its s3 data path and every configured SRC"""
+    # the DEST catalog is always attached as ducklake:postgres:, also when no SRC postgres is configured
+    sections = ["ducklake", "postgres", "storage"] + [section for section, sources in lake.SRC.model_dump(exclude={"preattach"}).items() if sources]
+    return list(dict.fromkeys(EXTENSION_NAMES.get(section, section) for section in sections + lake.extensions.extra))
+
+
+def ensure_extensions(connection: duckdb.DuckDBPyConnection, extensions: list[str]) -> Optional[Exception]:
+    """
+    LOAD every extension, INSTALL only the ones missing from the extension directory
+    and skip the ones already loaded. returns the first failure (None when all are loaded).
+    """
+    state = {
+        name: (installed, loaded)
+        for name, installed, loaded in connection.execute(
+            "SELECT extension_name, installed, loaded FROM duckdb_extensions()"
+        ).fetchall()
+    }
+    for extension_name in extensions:
+        installed, loaded = state.get(extension_name, (False, False))
+        if loaded:
+            continue
+        try:
+            if not installed:
+                connection.execute(f"INSTALL {extension_name};")
+                logger.info(f"{extension_name} installed.")
+            connection.execute(f"LOAD {extension_name};")
+            logger.info(f"{extension_name} loaded.")
+        except (duckdb.HTTPException, duckdb.IOException) as e:
+            logger.error(
+                f"extension {extension_name} not found or you might have connectivity issues "
+                f"(fill Lake.extensions.directory ahead of time with `lake extensions` on air-gapped hosts):\n{e}"
+            )
+            return e
+        except Exception as e:
+            logger.error(
+                f"during installation of {extension_name} an unexpected error has occoured: {e}"
+            )
+            return e
+    return None
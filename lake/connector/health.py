@@ -0,0 +1,203 @@
+import random
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from lake.util.conf_loader import Configs, HealthCnf, PgCnn, StorageCnn
+from lake.util.logger import logger
+
+
+@dataclass
+class Probe:
+    """one endpoint to check, `check(timeout)` raises when the endpoint is not usable"""
+    name: str
+    kind: str
+    target: str
+    check: Callable[[float], None]
+    # a required endpoint that stays down fails the whole check (and stops waiting for the others)
+    required: bool = True
+
+
+@dataclass
+class ProbeResult:
+    name: str
+    kind: str
+    target: str
+    required: bool
+    status: str = "pending"  # ok | failed | aborted
+    attempts: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class HealthReport:
+    results: list[ProbeResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        """every required endpoint answered"""
+        return all(result.status == "ok" for result in self.results if result.required)
+
+    @property
+    def failed(self) -> list[ProbeResult]:
+        return [result for result in self.results if result.status != "ok"]
+
+    def to_dict(self) -> dict:
+        return {"healthy": self.healthy, "seconds": round(self.seconds, 3), "results": [asdict(result) for result in self.results]}
+
+    def summary(self) -> str:
+        lines = [f"{'healthy' if self.healthy else 'UNHEALTHY'} after {self.seconds:.2f}s"]
+        for result in self.results:
+            line = f"  [{result.status:>7}] {result.kind:<8} {result.name} ({result.target}) {result.attempts} attempts {result.seconds:.2f}s"
+            lines.append(line + (f" -> {result.error}" if result.error else ""))
+        return "\n".join(lines)
+
+
+class HealthChecker:
+    """
+    probes every endpoint at the same time: each probe gets `timeout_seconds` per attempt and is retried
+    with exponential backoff and full jitter, all of them share one overall deadline.
+    with `fail_fast` the check returns as soon as a required endpoint is given up on.
+    """
+    def __init__(self, settings: HealthCnf):
+        self.settings = settings
+
+    def _run(self, probe: Probe, result: ProbeResult, deadline: float, abort: threading.Event) -> ProbeResult:
+        started = time.monotonic()
+        backoff = self.settings.backoff_seconds
+        while True:
+            result.attempts += 1
+            timeout = max(min(self.settings.timeout_seconds, deadline - time.monotonic()), 0.1)
+            try:
+                probe.check(timeout)
+                result.status, result.error = "ok", None
+                break
+            except Exception as fail:
+                result.error = f"{type(fail).__name__}: {' '.join(str(fail).split())}"
+            # full jitter keeps probes of a flapping host from retrying in lockstep
+            delay = random.uniform(0, backoff)
+            if result.attempts >= self.settings.attempts or time.monotonic() + delay >= deadline:
+                result.status = "failed"
+                break
+            if abort.wait(delay):
+                result.status = "aborted"
+                break
+            backoff = min(backoff * 2, self.settings.max_backoff_seconds)
+        result.seconds = time.monotonic() - started
+        return result
+
+    def run(self, probes: list[Probe]) -> HealthReport:
+        started = time.monotonic()
+        deadline = started + self.settings.deadline_seconds
+        abort = threading.Event()
+        results = [ProbeResult(probe.name, probe.kind, probe.target, probe.required) for probe in probes]
+        executor = ThreadPoolExecutor(max_workers=max(len(probes), 1), thread_name_prefix="health")
+        pending = {
+            executor.submit(self._run, probe, result, deadline, abort)
+            for probe, result in zip(probes, results)
+        }
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                if self.settings.fail_fast and any(
+                    future.result().status == "failed" and future.result().required for future in done
+                ):
+                    break
+        finally:
+            abort.set()
+            # probes blocked in a connect are bounded by their own timeout, nobody waits for them
+            executor.shutdown(wait=False)
+        for result in results:
+            if result.status == "pending":
+                result.status, result.seconds = "aborted", time.monotonic() - started
+        report = HealthReport(results, time.monotonic() - started)
+        (logger.info if report.healthy else logger.error)(f"connectivity check {report.summary()}")
+        return report
+
+
+def s3_probe(name: str, cfg: StorageCnn, create_bucket: bool = False, required: bool = True) -> Probe:
+    """bucket of an s3 endpoint is reachable (and created when `create_bucket`)"""
+    def check(timeout: float) -> None:
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+
+        client = boto3.client(
+            "s3",
+            endpoint_url=cfg.http_url,
+            aws_access_key_id=cfg.access_key.get_secret_value(),
+            aws_secret_access_key=cfg.secret.get_secret_value(),
+            config=Config(connect_timeout=timeout, read_timeout=timeout, retries={"total_max_attempts": 1}),
+        )
+        try:
+            client.head_bucket(Bucket=cfg.scope)
+        except ClientError as fail:
+            if not create_bucket or fail.response.get("Error", {}).get("Code") not in ("404", "NoSuchBucket"):
+                raise
+            logger.warning(f"cannot find bucket with name {cfg.scope} (creating...)")
+            client.create_bucket(Bucket=cfg.scope)
+    return Probe(name, "s3", f"{cfg.http_url}/{cfg.scope}", check, required)
+
+
+def postgres_probe(name: str, cfg: PgCnn, create_database: bool = False, required: bool = True) -> Probe:
+    """postgres answers, with `create_database` the configured database is created when missing (catalog)"""
+    def check(timeout: float) -> None:
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        connection = psycopg2.connect(
+            host=cfg.host,
+            port=cfg.port,
+            user=cfg.username.get_secret_value(),
+            password=cfg.password.get_secret_value(),
+            # attach to postgres to get admin privileges when the database may have to be created
+            dbname="postgres" if create_database else cfg.database,
+            connect_timeout=max(int(timeout), 1),
+        )
+        try:
+            connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                if not create_database:
+                    cursor.execute("SELECT 1")
+                    return
+                cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (cfg.database,))
+                if cursor.fetchone() is None:
+                    logger.info(f"database '{cfg.database}' not found. Creating it now...")
+                    cursor.execute(f'CREATE DATABASE "{cfg.database}"')
+        finally:
+            connection.close()
+    return Probe(name, "postgres", f"{cfg.host}:{cfg.port}/{cfg.database}", check, required)
+
+
+def kafka_probe(name: str, bootstrap_servers: str, required: bool = False) -> Probe:
+    """broker answers a metadata request"""
+    def check(timeout: float) -> None:
+        from confluent_kafka.admin import AdminClient
+
+        AdminClient({"bootstrap.servers": bootstrap_servers}).list_topics(timeout=timeout)
+    return Probe(name, "kafka", bootstrap_servers, check, required)
+
+
+def check_lake(configs: Configs, sources: bool = True, broker: bool = True, create: bool = False) -> HealthReport:
+    """
+    probe the DEST bucket and catalog, every SRC postgres/storage and the kafka broker concurrently.
+    only DEST endpoints are required, with `create` the bucket and catalog database are created when missing.
+    """
+    lake = configs.Lake
+    probes = [
+        s3_probe("DEST.storage", lake.DEST.storage, create_bucket=create),
+        postgres_probe("DEST.catalog", lake.DEST.catalog, create_database=create),
+    ]
+    if sources:
+        probes += [s3_probe(f"SRC.storage.{alias}", cfg, required=False) for alias, cfg in lake.SRC.storage.items()]
+        probes += [postgres_probe(f"SRC.postgres.{alias}", cfg, required=False) for alias, cfg in lake.SRC.postgres.items()]
+    if broker and configs.BrokerCnn.topic_routes:
+        probes.append(kafka_probe("BrokerCnn", configs.BrokerCnn.url))
+    return HealthChecker(lake.health).run(probes)
@@ -1,19 +1,74 @@
 from lake.connector.core import DuckLakeManager
 from lake.util.logger import logger
-from duckdb import DuckDBPyConnection
-from confluent_kafka import Consumer,KafkaException,KafkaError
+from lake.util.metrics import metrics, start_metrics
+from duckdb import DuckDBPyConnection,IOException,HTTPException,ConnectionException,TransactionException,BinderException,CatalogException,ConversionException
+from confluent_kafka import Consumer,KafkaException,KafkaError,TopicPartition
 from collections.abc import Generator
+from lake.connector.decode import DecodeMode, DecodeReport, decode_batch
+from lake.connector.pipeline import IngestPipeline, MessageBatch
+from lake.connector.buffer import BatchBuffer
+from lake.connector.layout import TableLayout
+from lake.connector.maintenance import LakeMaintenance
+from lake.connector.schema import SchemaRegistry, registered
+from lake.connector.appender import RowAppender
+from lake.connector.checkpoint import OffsetCheckpoint, StartPosition
+from lake.connector.spill import SpillBuffer, merge_frames
+from lake.connector.routing import TopicRouter
 import json
-import pandas as pd
-from typing import Optional
+import os
+import re
+import threading
+import time
+import pyarrow as pa
+from typing import TYPE_CHECKING, Optional
 
+if TYPE_CHECKING:
+	import pandas as pd
+
+# failures of the lake storage/catalog that are worth spilling for (anything else is a bug in the batch)
+LAKE_UNAVAILABLE = (IOException, HTTPException, ConnectionException, TransactionException)
+# transaction errors that are an outage (commit conflicts, lost catalog connections), other ones are raised
+RETRYABLE_TRANSACTION = re.compile(r"conflict|connect|timed? ?out", re.IGNORECASE)
+# the table changed under a prepared appender statement (types, columns), preparing it again fixes the insert
+SCHEMA_MISMATCH = (BinderException, CatalogException, ConversionException)
+
+MESSAGES = metrics.counter("lake_ingest_messages_total", "kafka messages consumed", ("topic",))
+MESSAGE_BYTES = metrics.counter("lake_ingest_bytes_total", "kafka payload bytes consumed", ("topic",))
+TOMBSTONES = metrics.counter("lake_ingest_tombstones_total", "kafka messages without a value, skipped", ("topic",))
+POLL_SECONDS = metrics.histogram("lake_kafka_poll_seconds", "duration of a consumer poll (consume call)")
+DECODE_SECONDS = metrics.histogram("lake_decode_seconds", "decode of a batch into a frame", ("table",))
+DECODE_ROWS = metrics.counter("lake_decode_rows_total", "rows decoded", ("table",))
+INSERT_SECONDS = metrics.histogram("lake_insert_seconds", "lake transaction of a batch (inserts, checkpoint and commit)", ("table",))
+INSERT_ROWS = metrics.counter("lake_insert_rows_total", "rows committed into the lake", ("table",))
+INSERT_FAILURES = metrics.counter("lake_insert_failures_total", "lake transactions rolled back", ("table",))
+SNAPSHOT_COMMIT_SECONDS = metrics.histogram("lake_snapshot_commit_seconds", "COMMIT of an ingest transaction (the lake snapshot)", ("table",))
+KAFKA_COMMIT_SECONDS = metrics.histogram("lake_kafka_commit_seconds", "kafka offset commit call (asynchronous)")
+BATCH_LATENCY = metrics.histogram("lake_batch_latency_seconds", "first message of a batch consumed -> batch committed in the lake", ("table",))
+CONSUMER_LAG = metrics.gauge("lake_kafka_consumer_lag", "messages behind the partition high watermark (librdkafka statistics)", ("topic", "partition"))
 
 class Connector(DuckLakeManager):
 	bootstrap_servers: str = None
 	base_config: dict = None
 	consumer_config:dict = None
 	_consumers: list[Consumer] = []
-	def __init__(self,config_path):
+	decode_mode: DecodeMode = "pandas"
+	decode_report: DecodeReport = None
+	_stop_event: threading.Event = None
+	checkpoint: OffsetCheckpoint = None
+	start_position: StartPosition = None
+	_positioned: set = None
+	# rebalance fence: generation bumped by every revoke and the generation each partition was revoked at
+	_generation: int = 0
+	_revoked_at: dict = None
+	# generation the spill was last checked against revocations at
+	_spill_generation: int = 0
+	schema: SchemaRegistry = None
+	layout: TableLayout = None
+	spill: SpillBuffer = None
+	_spill_retry_at: float = 0.0
+	_spill_backoff: float = 0.0
+	router: TopicRouter = None
+	def __init__(self,config_path,decode_mode:Optional[DecodeMode]=None,start_position:Optional[StartPosition]=None):
 		super(Connector,self).__init__(config_path)
 		self.duckdb_connection.execute(f"use {self.Lake.DEST.catalog.lake_alias};")
 		"""Initialize the Kafka client."""
@@ -26,8 +81,52 @@ class Connector(DuckLakeManager):
 						   'auto.offset.reset': 'earliest',
 						   'heartbeat.interval.ms': 600000
 						   }
+		metrics_cfg = self.Lake.metrics
+		if metrics_cfg.enabled and metrics_cfg.statistics_interval_ms > 0:
+			# consumer lag per partition comes from the librdkafka statistics, no extra broker round trip
+			self.consumer_config.update({"statistics.interval.ms": metrics_cfg.statistics_interval_ms, "stats_cb": self.on_statistics})
 		self._consumers: list[Consumer] = []
-		logger.warning(f"initializing kafka client {self.BrokerCnn.url} topics={self.BrokerCnn.ingest_topics} group={self.BrokerCnn.group_id}")
+		self.decode_mode = decode_mode or self.BrokerCnn.decode
+		self.decode_report = DecodeReport()
+		self._stop_event = threading.Event()
+		# qualified, the checkpoint is also read through cursors which do not share the `use` above
+		self.checkpoint = OffsetCheckpoint(
+			self.duckdb_connection, f"{self.Lake.DEST.catalog.lake_alias}.{self.BrokerCnn.checkpoint_table}", self.BrokerCnn.group_id
+		)
+		self.start_position = start_position
+		self._positioned = set()
+		self._generation = 0
+		self._revoked_at = {}
+		self._spill_generation = 0
+		self.layout = TableLayout(self.duckdb_connection, self.Lake.DEST.catalog.lake_alias, self.Lake.layout)
+		self.schema = SchemaRegistry(self.duckdb_connection, on_create=self.layout.apply)
+		self.router = TopicRouter(self.BrokerCnn.topic_routes)
+		try:
+			# layout changes of the config take effect for the files written from now on
+			self.layout.apply_all(self.router.tables)
+		except Exception as fail:
+			logger.error(f"cannot apply the layout of {self.router.tables}: {fail}")
+		spill_cfg = self.BrokerCnn.spill
+		if spill_cfg.enabled:
+			# every worker of a supervisor owns a separate spill directory
+			directory = os.path.join(spill_cfg.directory, f"worker-{os.getenv('LAKE_WORKER_ID', '0')}")
+			self.spill = SpillBuffer(directory, spill_cfg.max_bytes)
+			self._spill_backoff = spill_cfg.retry_seconds
+		logger.warning(f"initializing kafka client {self.BrokerCnn.url} topics={self.router.subscriptions} tables={self.router.tables} group={self.BrokerCnn.group_id}")
+
+	@property
+	def stopped(self) -> bool:
+		"""True once stop() has been requested, consume loops exit after their current poll."""
+		return self._stop_event.is_set()
+
+	def stop(self) -> None:
+		"""Ask the consume loops to drain their current poll and return."""
+		logger.warning(f"stop requested for kafka client {self.BrokerCnn.url} group={self.BrokerCnn.group_id}")
+		self.request_stop()
+
+	def request_stop(self) -> None:
+		"""stop() without logging, the only part that is safe inside a signal handler."""
+		self._stop_event.set()
 
 	@property
 	def consumers(self) -> list[Consumer]:
@@ -39,24 +138,58 @@ class Connector(DuckLakeManager):
 		"""Set the list of Kafka consumers."""
 		logger.warning(f"Cannot set {consumers} for consumers attribute, as it's read-only")
 
-	def on_assign_seek_to_beginning(self,consumer, partitions):
+	def on_assign_resume(self,consumer, partitions):
 		"""
 		This function is called when partitions are assigned to the consumer.
-		It will seek to the beginning of each assigned partition.
+		Each partition resumes right after the offset checkpointed in the lake,
+		unless an explicit start position (backfill) has been requested for this run.
 		"""
-		print("Partitions assigned, seeking to the beginning...")
-		for partition in partitions:
-			# Set the offset to the beginning of the partition
-			partition.offset = 0
+		partitions = self.checkpoint.resolve(consumer, partitions, self.start_position, self._positioned)
 		# The consumer.assign() call is what actually applies the new assignments
 		consumer.assign(partitions)
+	def on_statistics(self, stats_json: str) -> None:
+		"""librdkafka statistics callback (called from poll/consume), records the lag of every assigned partition."""
+		try:
+			stats = json.loads(stats_json)
+		except ValueError as fail:
+			logger.debug(f"unreadable kafka statistics: {fail}")
+			return
+		for topic, topic_stats in stats.get("topics", {}).items():
+			for partition, partition_stats in topic_stats.get("partitions", {}).items():
+				lag = partition_stats.get("consumer_lag", -1)
+				# -1 is the internal UA partition or a partition without a committed/fetch position yet
+				if partition != "-1" and lag >= 0:
+					CONSUMER_LAG.set(lag, topic=topic, partition=partition)
+
+	def on_revoke(self, consumer, partitions):
+		"""
+		Called before partitions move to another consumer of the group, which resumes them from the lake checkpoint.
+		Whatever was polled from them and is not in the lake yet (poll buffers, pipeline queue, spill, appenders)
+		is discarded instead of being written later as duplicates.
+		The callback runs inside poll() and never waits for the writer (which may be blocked by a lake outage),
+		it only bumps the generation: the writer drops batches and spilled segments polled before it.
+		A write already past that check still lands, its messages may then be read twice (at-least-once).
+		With the (default) eager protocol every partition is revoked and resumed from its checkpoint on the next
+		assignment, so batches mixing revoked and kept partitions can be dropped whole.
+		"""
+		revoked = {(partition.topic, partition.partition) for partition in partitions}
+		generation = self._generation + 1
+		for key in revoked:
+			self._revoked_at[key] = generation
+		self._generation = generation
+		logger.warning(f"partitions revoked {sorted(revoked)}, their unwritten batches are discarded")
+
+	def stale(self, offsets: dict[tuple[str, int], int], generation: int) -> bool:
+		"""True when a partition of `offsets` was revoked after the messages were polled (at `generation`)"""
+		return any(self._revoked_at.get(key, -1) > generation for key in offsets)
+
 	def open_consumer(self, group: str, topics: list[str]) -> Consumer | None:
 		"""Open a Kafka consumer."""
 		try:
 			consumer = Consumer({**self.consumer_config, "group.id": group})
 			self._consumers.append(consumer)
 			if consumer:
-				consumer.subscribe(topics, on_assign=self.on_assign_seek_to_beginning)
+				consumer.subscribe(topics, on_assign=self.on_assign_resume, on_revoke=self.on_revoke)
 				# consumer.subscribe(topics)
 				logger.info(f"Opened Kafka consumer to broker at {self.bootstrap_servers} listening to {topics=}")
 		except KafkaException as e:
@@ -65,57 +198,52 @@ class Connector(DuckLakeManager):
 		else:
 			return consumer
 
-	def consume_messages(self, consumer: Consumer, timeout: float = 4.0) -> Generator[str] | None:
-		"""Continuously consume messages from Kafka."""
+	def poll_batches(
+		self,
+		consumer: Consumer,
+		timeout: float = 10.0,
+		batch_size: int = 10000
+	) -> Optional[Generator[MessageBatch, None, None]]:
+		"""
+		Consume messages and yield their raw payloads (undecoded) together with the
+		last offset consumed on each partition. Messages are routed to the buffer of their
+		lake table and every buffer is flushed as one batch once its max_rows, max_bytes or
+		max_latency_ms (route override or BrokerCnn default) is reached.
+		"""
 		if not consumer or len(self._consumers) == 0:
 			logger.error(f"Kafka consumer to broker at {self.bootstrap_servers} is not open")
 			return None
-		try:
-			while True:
-				msg = consumer.poll(timeout=timeout)
-				if msg is None:
-					continue
-				topic, partition, key, value, offset = (
-					msg.topic(),
-					msg.partition(),
-					msg.key(),
-					msg.value().decode("utf-8"),
-					msg.offset(),
+
+		buffers: dict[str, BatchBuffer] = {}
+		def buffer_for(route) -> BatchBuffer:
+			if route.table not in buffers:
+				buffers[route.table] = BatchBuffer(
+					route.max_rows or self.BrokerCnn.max_rows,
+					route.max_bytes or self.BrokerCnn.max_bytes,
+					route.max_latency_ms or self.BrokerCnn.max_latency_ms,
+					table=route.table,
+					key_column=route.key,
 				)
-				logger.warning(f"{topic}|  OFFSET:{offset}")
-				if msg.error():
-					if msg.error().code() == KafkaError._PARTITION_EOF:  # noqa: SLF001
-						logger.warning(f"Reached end of {partition=} in {topic=}")
-					else:
-						logger.error(f"Failed to consume message from {partition=}, {topic=}, {key=}: {msg.error()}")
-				else:
-					logger.info(
-						f"Consumed message with {key=}, {value=} from {topic=}, {partition=}, {offset=} successfully",
-					)
-					consumer.commit(msg)
-					yield value
-		except KafkaException as e:
-			logger.error(f"Failed to consume messages: {e}")
-		except KeyboardInterrupt:
-			logger.info("Consumer loop interrupted by user")
-	def consume_batch(
-    self,
-    consumer: Consumer,
-    timeout: float = 10.0,
-    batch_size: int = 10000
-	) -> Optional[Generator[pd.DataFrame, None, None]]:
-		if not consumer or len(self._consumers) == 0:
-			logger.error(f"Kafka consumer to broker at {self.bootstrap_servers} is not open")
-			return None
+			return buffers[route.table]
 
+		generation = self._generation
 		try:
-			while True:
-				message_batch = consumer.consume(num_messages=batch_size, timeout=timeout)
-				if message_batch is None:
-					continue
-
-				valid_messages = []
-				for msg in message_batch:
+			while not self.stopped:
+				# never wait longer than the latency budget of the oldest buffered message
+				remaining = [left for left in (buffer.remaining() for buffer in buffers.values()) if left is not None]
+				poll_timeout = min([timeout, *remaining])
+				free_rows = min([batch_size, *(buffer.free_rows for buffer in buffers.values())])
+				polled_at = time.perf_counter()
+				message_batch = consumer.consume(num_messages=max(free_rows, 1), timeout=poll_timeout)
+				POLL_SECONDS.observe(time.perf_counter() - polled_at)
+				if generation != self._generation:
+					# a rebalance ran inside consume(), buffers holding revoked partitions are dropped
+					for table in [table for table, buffer in buffers.items() if self.stale(buffer.batch.offsets, generation)]:
+						del buffers[table]
+					generation = self._generation
+				# counted per poll, not per message
+				consumed: dict[str, list[int]] = {}
+				for msg in message_batch or ():
 					if msg is None:
 						continue
 					if msg.error():
@@ -124,28 +252,60 @@ class Connector(DuckLakeManager):
 						else:
 							logger.error(f"Kafka error received: {msg.error()}")
 							continue
-
-					try:
-						loaded_msg = json.loads(msg.value())
-						valid_messages.append(loaded_msg)
-					except Exception as fail:
-						logger.critical(f"failed to collect message bytes: {msg.value()} {fail}")
+					topic, payload = msg.topic(), msg.value()
+					counts = consumed.setdefault(topic, [0, 0, 0])
+					counts[0] += 1
+					if payload is None:
+						# tombstone (deleted key), there is no row to ingest
+						counts[2] += 1
 						continue
-					# consumer.commit(msg)  # enable if you want manual commits
-
-				if not valid_messages or len(valid_messages) < 2:
-					logger.warning("not enough messages gathered in this poll session (continue collecting...)")
-					continue
+					counts[1] += len(payload)
+					route = self.router.route(topic)
+					if route is None:
+						continue
+					buffer_for(route).add(topic, msg.partition(), msg.offset(), payload, msg.key())
+				for topic, (count, nbytes, tombstones) in consumed.items():
+					MESSAGES.inc(count, topic=topic)
+					MESSAGE_BYTES.inc(nbytes, topic=topic)
+					if tombstones:
+						TOMBSTONES.inc(tombstones, topic=topic)
 
-				# Flatten nested JSON; use pd.DataFrame(valid_messages) if you don't want flattening
-				df = pd.json_normalize(valid_messages, sep='.')
-				yield df
+				for buffer in buffers.values():
+					if buffer.should_flush():
+						yield buffer.flush(generation)
+			# drain what has been gathered so far on a graceful stop
+			for buffer in buffers.values():
+				if len(buffer):
+					yield buffer.flush(generation)
 
 		except KafkaException as e:
 			logger.error(f"Failed to consume messages: {e}")
 		except KeyboardInterrupt:
 			logger.info("Consumer loop interrupted by user")
 
+	def decode(self, batch: MessageBatch) -> "pa.Table | pd.DataFrame":
+		"""Decode a raw batch into a flat frame using the configured decode mode."""
+		with DECODE_SECONDS.time(table=batch.table):
+			messages_frame = decode_batch(
+				batch.payloads, mode=self.decode_mode, report=self.decode_report, logger=logger,
+				keys=batch.keys, key_column=batch.key_column,
+			)
+		DECODE_ROWS.inc(len(messages_frame), table=batch.table)
+		return messages_frame
+
+	def consume_batch(
+    self,
+    consumer: Consumer,
+    timeout: float = 10.0,
+    batch_size: int = 10000
+	) -> Optional[Generator["pa.Table | pd.DataFrame", None, None]]:
+		"""
+		Consume messages in batches and yield them as flat frames,
+		decoded either per message (pandas) or as a single columnar buffer (arrow).
+		"""
+		for batch in self.poll_batches(consumer, timeout=timeout, batch_size=batch_size) or ():
+			yield self.decode(batch)
+
 	def close_consumer(self, consumer: Consumer) -> bool:
 		"""
 		Close the Kafka consumer.
@@ -158,66 +318,274 @@ class Connector(DuckLakeManager):
 			logger.info(f"Kafka consumer on broker at {self.bootstrap_servers} closed successfully.")
 		return consumer not in self._consumers
 	
-	def infer_type(self,value):
-		"""Infer PostgreSQL data type based on Python value"""
-		if isinstance(value, int):
-			return 'INTEGER'
-		elif isinstance(value, float):
-			return 'FLOAT'
-		elif isinstance(value, str):
-			return 'VARCHAR'  # or TEXT based on your requirements
-		elif isinstance(value, bool):
-			return 'BOOLEAN'
-		elif isinstance(value, list):
-			return 'JSONB'  # Handle arrays or lists as JSONB
-		elif isinstance(value, dict):
-			return 'JSONB'  # Handle objects as JSONB
-		else:
-			return 'TEXT'  # Fallback type
+	def insert_frames(self, table: str, frames: list[tuple[str, "pa.Table | pd.DataFrame"]], offsets: dict[tuple[str, int], int]) -> None:
+		"""
+		Insert decoded frames (with their select list) into a lake table and
+		checkpoint the offsets they cover, all in one lake transaction.
+		"""
+		checkpoint_statement, checkpoint_parameters = self.checkpoint.insert_statement(offsets)
+		started = time.perf_counter()
+		self.duckdb_connection.execute("BEGIN TRANSACTION;")
+		try:
+			for select_sql, messages_frame in frames:
+				columns = getattr(messages_frame, "column_names", None) or list(messages_frame.columns)
+				order_sql = self.layout.order_by(table, columns)
+				with registered(self.duckdb_connection, messages_frame):
+					self.duckdb_connection.execute(f"INSERT INTO {table} BY NAME (SELECT {select_sql} FROM messages_frame{order_sql})")
+			self.duckdb_connection.execute(checkpoint_statement, checkpoint_parameters)
+			committing = time.perf_counter()
+			self.duckdb_connection.execute("COMMIT;")
+			finished = time.perf_counter()
+			SNAPSHOT_COMMIT_SECONDS.observe(finished - committing, table=table)
+			INSERT_SECONDS.observe(finished - started, table=table)
+			INSERT_ROWS.inc(sum(len(messages_frame) for _, messages_frame in frames), table=table)
+		except Exception:
+			INSERT_FAILURES.inc(table=table)
+			try:
+				self.duckdb_connection.execute("ROLLBACK;")
+			except Exception as fail:
+				logger.error(f"rollback failed: {fail}")
+			raise
 
+	def commit_offsets(self, consumer: Optional[Consumer], offsets: dict[tuple[str, int], int]) -> None:
+		"""Commit kafka offsets once they are in the lake (informational only, the lake checkpoint is the resume point)."""
+		if consumer is None or not offsets:
+			return
+		try:
+			with KAFKA_COMMIT_SECONDS.time():
+				consumer.commit(
+					offsets=[TopicPartition(topic, partition, offset + 1) for (topic, partition), offset in offsets.items()],
+					asynchronous=True,
+				)
+		except KafkaException as e:
+			logger.warning(f"failed to commit kafka offsets {offsets}: {e}")
+
+	def _write(self, table: str, messages_frame: "pa.Table | pd.DataFrame", offsets: dict[tuple[str, int], int], consumer: Optional[Consumer] = None) -> None:
+		# new/widened fields are applied to the table before the insert, columns are matched by name
+		select_sql = self.schema.ensure(table, messages_frame)
+		# a batch of malformed messages only has no column to insert, its offsets still move past it
+		self.insert_frames(table, [(select_sql, messages_frame)] if select_sql is not None else [], offsets)
+		self.commit_offsets(consumer, offsets)
 
-	def template_adapter(self,consumer):
-		while True:
-			msg = consumer.poll(timeout=4.0)
-			if msg is None:
+	def _lake_unavailable(self, fail: Exception) -> None:
+		"""back off after a failed lake write, re-raises `fail` when it is not an outage of the lake"""
+		if isinstance(fail, TransactionException) and not RETRYABLE_TRANSACTION.search(str(fail)):
+			raise fail
+		spill_cfg = self.BrokerCnn.spill
+		logger.error(f"lake write failed ({fail}), retrying in {self._spill_backoff}s ({len(self.spill)} batches spilled)")
+		self._spill_retry_at = time.monotonic() + self._spill_backoff
+		self._spill_backoff = min(self._spill_backoff * 2, spill_cfg.max_retry_seconds)
+
+	def drain_spill(self, consumer: Optional[Consumer] = None, block: bool = False) -> bool:
+		"""
+		Write spilled batches back into the lake (oldest first, several segments per insert).
+		Returns True once the spill is empty, without `block` it gives up while the lake is in backoff.
+		"""
+		while len(self.spill):
+			if self._spill_generation != self._generation:
+				# segments of partitions revoked since the last check belong to their new owner now
+				generation = self._generation
+				dropped = self.spill.discard(self.stale)
+				self._spill_generation = generation
+				if dropped:
+					logger.warning(f"discarded {dropped} spilled batches of revoked partitions, {len(self.spill)} left")
 				continue
-			else:
-				sample_msg = json.loads(msg.value().decode('utf-8'))
-				logger.info(f"sample message value= ({sample_msg})")
-				columns = []
-				for key, value in sample_msg.items():
-					pg_type = self.infer_type(value)
-					columns.append(f"{key} {pg_type}")
-				columns_sql = ', '.join(columns)
-				create_statement = f"CREATE TABLE IF NOT EXISTS {self.BrokerCnn.ingest_table} ({columns_sql});"
-				table_generate_result = self.duckdb_connection.sql(create_statement)
-				print(self.duckdb_connection.table(self.BrokerCnn.ingest_table).show())
-				logger.info(f"{create_statement} Returned -> {table_generate_result}")
+			wait = self._spill_retry_at - time.monotonic()
+			if wait > 0:
+				if not block:
+					return False
+				time.sleep(wait)
+			segments, table, messages_frame, offsets = self.spill.peek(self.BrokerCnn.spill.drain_bytes)
+			try:
+				self._write(table, messages_frame, offsets, consumer)
+			except LAKE_UNAVAILABLE as fail:
+				self._lake_unavailable(fail)
+				continue
+			self.spill.pop(segments)
+			self._spill_backoff = self.BrokerCnn.spill.retry_seconds
+			logger.info(f"drained {len(segments)} spilled batches ({messages_frame.num_rows} rows) into {table}, {len(self.spill)} left")
+		return True
+
+	def _write_or_spill(
+		self, table: str, messages_frame: "pa.Table | pd.DataFrame", offsets: dict[tuple[str, int], int], consumer: Optional[Consumer] = None, generation: int = 0
+	) -> None:
+		# spilled batches go first to keep the order, while they are pending new batches queue up behind them
+		if self.drain_spill(consumer):
+			try:
+				self._write(table, messages_frame, offsets, consumer)
 				return
-	
-	def attach(self):
-		consumer = self.open_consumer(self.BrokerCnn.group_id,self.BrokerCnn.ingest_topics)
-		self.template_adapter(consumer)
+			except LAKE_UNAVAILABLE as fail:
+				self._lake_unavailable(fail)
+		while not self.spill.append(table, messages_frame, offsets, generation):
+			logger.error(f"spill directory {self.spill.directory} is full ({self.spill.nbytes} bytes), blocking until the lake recovers")
+			if len(self.spill):
+				self.drain_spill(consumer, block=True)
+				continue
+			# a single batch larger than the whole spill budget, wait for the lake instead
+			while True:
+				try:
+					self._write(table, messages_frame, offsets, consumer)
+					return
+				except LAKE_UNAVAILABLE as fail:
+					self._lake_unavailable(fail)
+					time.sleep(max(self._spill_retry_at - time.monotonic(), 0))
+		logger.warning(f"spilled batch of {len(messages_frame)} rows to {self.spill.directory} ({len(self.spill)} batches pending)")
+
+	def write_frame(self, batch: MessageBatch, messages_frame: "pa.Table | pd.DataFrame", consumer: Optional[Consumer] = None) -> None:
+		"""
+		Insert a decoded frame into the table it is routed to, checkpoint its offsets and commit them to kafka.
+		With BrokerCnn.spill enabled a frame the lake cannot take right now is staged on disk instead
+		and its offsets are only checkpointed/committed once it has been drained into the lake.
+		"""
+		if self.stale(batch.offsets, batch.generation):
+			logger.warning("discarding a batch of %d messages of revoked partitions (%s)", len(batch), batch.table)
+			return
+		logger.warning("inserting new frame (%s) into %s", messages_frame.shape, batch.table)
+		# rendered (and truncated) by the handlers, not here
+		logger.info("%s", messages_frame)
+		if self.spill is None:
+			self._write(batch.table, messages_frame, batch.offsets, consumer)
+		else:
+			self._write_or_spill(batch.table, messages_frame, batch.offsets, consumer, batch.generation)
+		if batch.started_at is not None:
+			BATCH_LATENCY.observe(time.monotonic() - batch.started_at, table=batch.table)
+
+	def start_inlined_flush(self) -> Optional[threading.Thread]:
+		"""
+		Flush the inlined rows of the ingest tables to parquet every Lake.inlining.flush_interval_seconds
+		on a separate cursor (only the first worker of a supervisor does, so flushes never race each other).
+		"""
+		settings = self.Lake.inlining
+		if settings.flush_interval_seconds <= 0 or os.getenv("LAKE_WORKER_ID", "0") != "0":
+			return None
+		maintenance = LakeMaintenance(self.duckdb_connection.cursor(), self.Lake.DEST.catalog.lake_alias, self.Lake.maintenance, self.Lake.layout)
+
+		def flush_loop() -> None:
+			while not self._stop_event.wait(settings.flush_interval_seconds):
+				try:
+					maintenance.flush_inlined(self.router.tables, min_rows=settings.flush_min_rows)
+				except Exception as fail:
+					logger.error(f"flushing inlined rows failed (retrying in {settings.flush_interval_seconds}s): {fail}")
+
+		thread = threading.Thread(target=flush_loop, name="inlined-flush", daemon=True)
+		thread.start()
+		return thread
+
+	def start_metrics(self) -> None:
+		"""Serve the metrics of this process (Lake.metrics), every worker of a supervisor on port + LAKE_WORKER_ID."""
+		start_metrics(self.Lake.metrics, port_offset=int(os.getenv("LAKE_WORKER_ID", "0")))
+
+	def attach(self, pipelined: Optional[bool] = None):
+		"""
+		Ingest the configured topics into the lake.
+		With `pipelined` (or BrokerCnn.pipeline.enabled) polling, decoding and inserting run
+		as overlapping stages (see IngestPipeline), otherwise they run one after the other.
+		"""
+		pipeline_cfg = self.BrokerCnn.pipeline
+		pipelined = pipeline_cfg.enabled if pipelined is None else pipelined
+		self.checkpoint.ensure_table()
+		self.start_metrics()
+		self.start_inlined_flush()
+		if self.spill is not None and len(self.spill):
+			# leftovers of a previous run precede anything the consumer will read, drain them before resuming
+			self.drain_spill(block=True)
+		consumer = self.open_consumer(self.BrokerCnn.group_id,self.router.subscriptions)
+		write = lambda batch, messages_frame: self.write_frame(batch, messages_frame, consumer)
 		try:
-			for messages_frame in self.consume_batch(consumer,batch_size=self.BrokerCnn.batch_size):
-				logger.warning(f"inserting new frame ({messages_frame.shape}) into {self.BrokerCnn.ingest_table}")
-				logger.info(messages_frame)
-				self.duckdb_connection.sql(f"INSERT INTO {self.BrokerCnn.ingest_table} (SELECT * FROM messages_frame)")
+			batches = self.poll_batches(consumer,batch_size=self.BrokerCnn.batch_size) or ()
+			if pipelined:
+				IngestPipeline(
+					batches,
+					decode=self.decode,
+					write=write,
+					decode_workers=pipeline_cfg.decode_workers,
+					queue_size=pipeline_cfg.queue_size,
+					on_stop=self.stop,
+				).run()
+			else:
+				for batch in batches:
+					write(batch, self.decode(batch))
 		finally:
+			logger.info(f"decode throughput -> {self.decode_report.summary()}")
 			self.close_consumer(consumer)
-	def single_message(self,batch_size:int):
-		consumer = self.open_consumer(self.BrokerCnn.group_id,self.BrokerCnn.ingest_topics)
-		self.template_adapter(consumer)
+	def flush_appender(self, table: str, appender: RowAppender, consumer: Optional[Consumer] = None) -> None:
+		"""
+		Insert every key set buffered in the appender in one transaction and commit the offsets it covers.
+		Rebalances run inside poll() on the same thread, so the rows belong to the current generation.
+		"""
+		frames, offsets = appender.drain()
+		if not frames:
+			return
+		prepare = lambda messages_frame: self.schema.ensure(table, messages_frame)
+		# key sets without any column (empty objects) have nothing to insert
+		statements = lambda: [
+			(select_sql, frame) for select_sql, frame in ((appender.statement(keys, frame, prepare), frame) for keys, frame in frames)
+			if select_sql is not None
+		]
+		if self.spill is not None and len(self.spill):
+			# spilled batches go first, the buffered rows queue up behind them
+			self._write_or_spill(table, merge_frames([frame for _, frame in frames]), offsets, consumer, self._generation)
+			return
+		try:
+			try:
+				self.insert_frames(table, statements(), offsets)
+			except SCHEMA_MISMATCH as fail:
+				# a key set may carry a type the cached statement was not prepared for, re-prepare once
+				logger.warning(f"flush of {len(frames)} key sets failed ({fail}), re-preparing statements")
+				appender.reset_statements()
+				self.insert_frames(table, statements(), offsets)
+		except LAKE_UNAVAILABLE as fail:
+			if self.spill is None:
+				raise
+			# same path as a batch, the key sets are staged as one segment until the lake recovers
+			self._lake_unavailable(fail)
+			self._write_or_spill(table, merge_frames([frame for _, frame in frames]), offsets, consumer, self._generation)
+			return
+		self.commit_offsets(consumer, offsets)
+
+	def single_message(self, batch_size: int = 1000, max_latency_ms: int = 50, timeout: float = 1.0):
+		"""
+		Low-latency ingest: messages are appended to the RowAppender of their lake table and
+		flushed every `batch_size` rows or `max_latency_ms`, kafka commits are grouped per flush.
+		"""
+		self.checkpoint.ensure_table()
+		self.start_metrics()
+		self.start_inlined_flush()
+		consumer = self.open_consumer(self.BrokerCnn.group_id,self.router.subscriptions)
+		appenders: dict[str, RowAppender] = {}
+		generation = self._generation
 		try:
-			for message in self.consume_messages(consumer):
-				data = json.loads(message)
-				keys = ', '.join(data.keys())
-				placeholders = ', '.join(['?'] * len(data)) 
-				values = tuple(data.values())
-				insert_statement = f"INSERT INTO {self.BrokerCnn.ingest_table} ({keys}) VALUES ({placeholders})"
-				insert_result = self.duckdb_connection.execute(insert_statement, values)
-				logger.info(f"{insert_statement} Results-> {insert_result.fetchall()}")
+			while not self.stopped:
+				remaining = [left for left in (appender.remaining() for appender in appenders.values()) if left is not None]
+				msg = consumer.poll(timeout=min([timeout, *remaining]))
+				if generation != self._generation:
+					# a rebalance ran inside poll(), rows of revoked partitions are left to their new owner
+					appenders = {table: appender for table, appender in appenders.items() if not self.stale(appender.offsets, generation)}
+					generation = self._generation
+				if msg is not None and msg.error():
+					if msg.error().code() != KafkaError._PARTITION_EOF:  # noqa: SLF001
+						logger.error(f"Failed to consume message from {msg.partition()=}, {msg.topic()=}: {msg.error()}")
+				elif msg is not None and (route := self.router.route(msg.topic())) is not None:
+					MESSAGES.inc(topic=msg.topic())
+					MESSAGE_BYTES.inc(len(msg.value() or b""), topic=msg.topic())
+					try:
+						row = json.loads(msg.value())
+						if route.key:
+							row[route.key] = msg.key().decode("utf-8", errors="replace") if msg.key() is not None else None
+						if route.table not in appenders:
+							appenders[route.table] = RowAppender(max_rows=batch_size, max_latency_ms=max_latency_ms)
+						appenders[route.table].append(row, msg.topic(), msg.partition(), msg.offset())
+					except Exception as fail:
+						logger.warning("failed to collect message bytes: %s %s", msg.value(), fail)
+				for table, appender in appenders.items():
+					if appender.should_flush():
+						self.flush_appender(table, appender, consumer)
+			for table, appender in appenders.items():
+				self.flush_appender(table, appender, consumer)
+		except KeyboardInterrupt:
+			logger.info("Consumer loop interrupted by user")
 		finally:
 			self.close_consumer(consumer)
+
 	def exec(self,cmd:str):
 		return self.duckdb_connection.execute(cmd)
\ No newline at end of file
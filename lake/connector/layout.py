@@ -0,0 +1,132 @@
+import re
+from typing import Dict, List, Optional
+
+import duckdb
+from duckdb import DuckDBPyConnection
+
+from lake.connector.schema import quote
+from lake.util.conf_loader import LayoutCnf
+from lake.util.logger import logger
+
+# LayoutCnf field -> ducklake option, set per table with set_option
+LAYOUT_OPTIONS = {
+    "target_file_size": "target_file_size",
+    "row_group_size": "parquet_row_group_size",
+    "compression": "parquet_compression",
+    "compression_level": "parquet_compression_level",
+    "inlining_row_limit": "data_inlining_row_limit",
+}
+_TRANSFORMS = {"year", "month", "day", "hour"}
+
+
+def partition_key(key: str) -> tuple[str, str]:
+    """'month(event_time)' -> ('month', 'event_time'), 'tenant' -> ('identity', 'tenant')"""
+    match = re.fullmatch(r"\s*(\w+)\s*\(\s*([^)]+?)\s*\)\s*", key)
+    if match is None:
+        return "identity", key.strip()
+    if match.group(1).lower() not in _TRANSFORMS:
+        raise ValueError(f"unsupported partition transform {key!r} (use one of {sorted(_TRANSFORMS)})")
+    return match.group(1).lower(), match.group(2)
+
+
+class TableLayout:
+    """
+    partitioning, sort order and parquet options of lake tables from Lake.layout.
+    partitioning and options are stored in the catalog and only touched when they differ from the config,
+    so `apply` is cheap to run on every startup and a config change takes effect for files written afterwards.
+    """
+    def __init__(self, connection: DuckDBPyConnection, lake_alias: str, settings: Dict[str, LayoutCnf]):
+        self.connection = connection
+        self.lake_alias = lake_alias
+        self.settings = settings
+        self.metadata = f"__ducklake_metadata_{lake_alias}"
+
+    def settings_for(self, table: str) -> Optional[LayoutCnf]:
+        return self.settings.get(table) or self.settings.get("*")
+
+    def order_by(self, table: str, columns: Optional[List[str]] = None) -> str:
+        """
+        ORDER BY clause writing a batch in the table's sort order, sorted files give tight row group min/max stats.
+        sort keys on columns missing from `columns` (a batch without them) are left out.
+        """
+        layout = self.settings_for(table)
+        if layout is None:
+            return ""
+        keys = [key for key in layout.sort_by if columns is None or key.split()[0].strip('"') in columns]
+        return f" ORDER BY {', '.join(keys)}" if keys else ""
+
+    def current_partitioning(self, table: str) -> Optional[List[tuple[str, str]]]:
+        """(transform, column) keys the catalog holds for the table, None when they cannot be read"""
+        try:
+            return [
+                (transform, column) for transform, column in self.connection.execute(f"""
+                    SELECT pc.transform, c.column_name
+                    FROM {self.metadata}.ducklake_partition_info p
+                    JOIN {self.metadata}.ducklake_partition_column pc ON pc.partition_id = p.partition_id AND pc.table_id = p.table_id
+                    JOIN {self.metadata}.ducklake_column c ON c.table_id = pc.table_id AND c.column_id = pc.column_id AND c.end_snapshot IS NULL
+                    JOIN {self.metadata}.ducklake_table t ON t.table_id = p.table_id AND t.end_snapshot IS NULL
+                    WHERE t.table_name = ? AND p.end_snapshot IS NULL
+                    ORDER BY pc.partition_key_index
+                """, [table]).fetchall()
+            ]
+        except duckdb.Error as fail:
+            logger.debug(f"cannot read the partitioning of {table}: {fail}")
+            return None
+
+    def current_options(self, table: str) -> Dict[str, str]:
+        try:
+            return dict(self.connection.execute(f"""
+                SELECT m.key, m.value FROM {self.metadata}.ducklake_metadata m
+                JOIN {self.metadata}.ducklake_table t ON t.table_id = m.scope_id AND t.end_snapshot IS NULL
+                WHERE m.scope = 'table' AND t.table_name = ?
+            """, [table]).fetchall())
+        except duckdb.Error as fail:
+            logger.debug(f"cannot read the options of {table}: {fail}")
+            return {}
+
+    def statements(self, table: str) -> List[str]:
+        """statements bringing the table to its configured layout (empty when it already has it)"""
+        layout = self.settings_for(table)
+        if layout is None:
+            return []
+        statements = []
+        options = self.current_options(table)
+        for field, option in LAYOUT_OPTIONS.items():
+            value = getattr(layout, field)
+            if value is not None and options.get(option) != str(value):
+                statements.append(f"CALL {self.lake_alias}.set_option('{option}', '{value}', table_name => '{table}');")
+        if layout.partition_by is not None:
+            keys = [partition_key(key) for key in layout.partition_by]
+            if self.current_partitioning(table) != keys:
+                if keys:
+                    columns = ", ".join(quote(column) if transform == "identity" else f"{transform}({quote(column)})" for transform, column in keys)
+                    statements.append(f"ALTER TABLE {self.lake_alias}.{table} SET PARTITIONED BY ({columns});")
+                else:
+                    statements.append(f"ALTER TABLE {self.lake_alias}.{table} RESET PARTITIONED BY;")
+        return statements
+
+    def apply(self, table: str) -> List[str]:
+        """bring one table to its layout, returns the statements that ran (failures are logged, not raised)"""
+        applied = []
+        try:
+            statements = self.statements(table)
+        except ValueError as fail:
+            logger.error(f"invalid layout of {table}: {fail}")
+            return applied
+        for statement in statements:
+            try:
+                self.connection.execute(statement)
+                applied.append(statement)
+                logger.info(f"layout of {table} -> {statement}")
+            except duckdb.Error as fail:
+                logger.error(f"layout of {table} not applied ({statement}): {fail}")
+        return applied
+
+    def apply_all(self, tables: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """apply the layout of `tables` (default: every lake table), tables that do not exist yet are skipped"""
+        existing = [
+            table for (table,) in self.connection.execute(
+                f"SELECT table_name FROM ducklake_table_info('{self.lake_alias}');"
+            ).fetchall()
+        ]
+        return {table: self.apply(table) for table in existing if tables is None or table in tables}
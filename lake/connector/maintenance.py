@@ -0,0 +1,293 @@
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from duckdb import CatalogException, DuckDBPyConnection
+
+from lake.util.conf_loader import LayoutCnf, MaintenanceCnf
+from lake.util.logger import logger
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1000, "MB": 1000**2, "GB": 1000**3, "KIB": 1024, "MIB": 1024**2, "GIB": 1024**3}
+
+
+def parse_size(value: str) -> int:
+    """'128MB' -> 128000000 (same units duckdb accepts for its size options)"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([a-zA-Z]*)\s*", value)
+    if not match or match.group(2).upper() not in _SIZE_UNITS:
+        raise ValueError(f"invalid size {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+@dataclass
+class TableFiles:
+    files: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class MaintenanceReport:
+    """file layout of every maintained table before/after, plus what the catalog wide steps removed"""
+    dry_run: bool
+    before: Dict[str, TableFiles] = field(default_factory=dict)
+    after: Dict[str, TableFiles] = field(default_factory=dict)
+    expired_snapshots: int = 0
+    cleaned_files: int = 0
+    orphaned_files: int = 0
+    # offset checkpoint rows superseded by a later checkpoint of their partition
+    pruned_checkpoints: int = 0
+    # inlined rows written to parquet per table (to be written on a dry-run)
+    flushed_rows: Dict[str, int] = field(default_factory=dict)
+    # tables holding files added by `lake register`, left alone without include_registered
+    skipped_registered: list = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        header = "maintenance dry-run (estimated)" if self.dry_run else "maintenance report"
+        lines = [header]
+        for table, before in self.before.items():
+            after = self.after.get(table, before)
+            lines.append(
+                f"  {table}: {before.files} files / {before.bytes} bytes -> {after.files} files / {after.bytes} bytes"
+            )
+        lines.append(f"  inlined rows flushed: {sum(self.flushed_rows.values())} ({len(self.flushed_rows)} tables)")
+        lines.append(f"  checkpoints pruned: {self.pruned_checkpoints}")
+        lines.append(f"  expired snapshots: {self.expired_snapshots}")
+        lines.append(f"  old files removed: {self.cleaned_files}")
+        lines.append(f"  orphaned files removed: {self.orphaned_files}")
+        if self.skipped_registered:
+            lines.append(f"  skipped (registered files, see --include-registered): {', '.join(self.skipped_registered)}")
+        for step, error in self.errors.items():
+            lines.append(f"  FAILED {step}: {error}")
+        return "\n".join(lines)
+
+
+class LakeMaintenance:
+    """
+    compaction, snapshot expiry and file cleanup of a ducklake catalog.
+    every step is a regular ducklake transaction so it can run next to `lake attach`,
+    files are only deleted once they are older than the configured retention so
+    readers on older snapshots keep working.
+    `checkpoint_table` (BrokerCnn.checkpoint_table, lake qualified) is pruned to the resume point of every partition.
+    files added by `lake register` stay where they were registered (outside the data path, e.g. a SRC bucket), their
+    tables are not merged and old files are not cleaned up while such files are due, unless `include_registered`.
+    """
+    def __init__(
+        self, connection: DuckDBPyConnection, lake_alias: str, settings: Dict[str, MaintenanceCnf],
+        layout: Optional[Dict[str, LayoutCnf]] = None, checkpoint_table: Optional[str] = None,
+        include_registered: bool = False,
+    ):
+        self.connection = connection
+        self.lake_alias = lake_alias
+        self.settings = settings
+        self.layout = layout or {}
+        self.checkpoint_table = checkpoint_table
+        self.include_registered = include_registered
+        self._last_runs: Dict[str, float] = {}
+
+    def settings_for(self, table: str) -> MaintenanceCnf:
+        return self.settings.get(table) or self.settings.get("*") or MaintenanceCnf()
+
+    def target_file_size(self, table: str) -> str:
+        """Lake.layout target_file_size of the table when set, so merges do not undo the configured layout"""
+        layout = self.layout.get(table) or self.layout.get("*")
+        if layout is not None and layout.target_file_size:
+            return layout.target_file_size
+        return self.settings_for(table).target_file_size
+
+    def table_files(self) -> Dict[str, TableFiles]:
+        rows = self.connection.execute(
+            f"SELECT table_name, file_count, file_size_bytes FROM ducklake_table_info('{self.lake_alias}');"
+        ).fetchall()
+        return {table: TableFiles(files or 0, size or 0) for table, files, size in rows}
+
+    def estimate_merge(self, table: str, current: TableFiles) -> TableFiles:
+        """files smaller than the target size are assumed to be packed into target sized files"""
+        target = parse_size(self.target_file_size(table))
+        sizes = [
+            size for (size,) in self.connection.execute(
+                f"SELECT data_file_size_bytes FROM ducklake_list_files('{self.lake_alias}', '{table}');"
+            ).fetchall()
+        ]
+        small = [size for size in sizes if size < target]
+        merged = math.ceil(sum(small) / target) if small else 0
+        return TableFiles(files=len(sizes) - len(small) + merged, bytes=current.bytes)
+
+    def inlined_rows(self) -> Dict[str, int]:
+        """rows per table that are inlined in the catalog and not written to parquet files yet"""
+        metadata = f"__ducklake_metadata_{self.lake_alias}"
+        inlined = self.connection.execute(f"""
+            SELECT t.table_name, i.table_name FROM {metadata}.ducklake_inlined_data_tables i
+            JOIN {metadata}.ducklake_table t ON t.table_id = i.table_id AND t.end_snapshot IS NULL
+        """).fetchall()
+        rows: Dict[str, int] = {}
+        for table, inlined_table in inlined:
+            count = self.connection.execute(
+                f"SELECT count(*) FROM {metadata}.{inlined_table} WHERE end_snapshot IS NULL;"
+            ).fetchone()[0]
+            rows[table] = rows.get(table, 0) + count
+        return rows
+
+    def flush_inlined(self, tables: Optional[list[str]] = None, min_rows: int = 0) -> Dict[str, int]:
+        """
+        write the inlined rows of `tables` (default: all) to parquet files, tables with fewer than `min_rows`
+        of them are left for later so trickle ingest ends up in a few larger files. returns the rows flushed per table.
+        """
+        flushed = {}
+        for table, rows in self.inlined_rows().items():
+            if (tables is not None and table not in tables) or rows == 0 or rows < min_rows:
+                continue
+            try:
+                self.connection.execute(f"CALL ducklake_flush_inlined_data('{self.lake_alias}', table_name => '{table}');")
+            except Exception as fail:
+                # e.g. a conflict with a concurrent writer, the rows stay inlined until the next flush
+                logger.error(f"flushing inlined rows of {table} failed: {fail}")
+                continue
+            flushed[table] = rows
+            logger.info(f"flushed {rows} inlined rows of {self.lake_alias}.{table} to parquet")
+        return flushed
+
+    def registered_tables(self) -> set[str]:
+        """tables with files added by `lake register` (stored with their absolute path, lake written files are relative)"""
+        metadata = f"__ducklake_metadata_{self.lake_alias}"
+        return {
+            table for (table,) in self.connection.execute(f"""
+                SELECT DISTINCT t.table_name FROM {metadata}.ducklake_data_file f
+                JOIN {metadata}.ducklake_table t ON t.table_id = f.table_id AND t.end_snapshot IS NULL
+                WHERE f.end_snapshot IS NULL AND NOT f.path_is_relative
+            """).fetchall()
+        }
+
+    def registered_files_due(self) -> int:
+        """registered files the next cleanup would delete from where they were registered"""
+        metadata = f"__ducklake_metadata_{self.lake_alias}"
+        return self.connection.execute(
+            f"SELECT count(*) FROM {metadata}.ducklake_files_scheduled_for_deletion WHERE NOT path_is_relative;"
+        ).fetchone()[0]
+
+    def _merge(self, table: str) -> None:
+        target_file_size = self.target_file_size(table)
+        self.connection.execute(
+            f"CALL {self.lake_alias}.set_option('target_file_size', '{target_file_size}', table_name => '{table}');"
+        )
+        self.connection.execute(f"CALL ducklake_merge_adjacent_files('{self.lake_alias}', '{table}');")
+
+    def _registered_tables(self, report: MaintenanceReport) -> set[str]:
+        try:
+            return self.registered_tables()
+        except Exception as fail:
+            # without knowing them no table is safe to merge
+            logger.error(f"maintenance step registered_tables failed, no table is merged: {fail}")
+            report.errors["registered_tables"] = str(fail)
+            return set(self.table_files())
+
+    def _prune_checkpoints(self, report: MaintenanceReport, dry_run: bool) -> None:
+        # imported here, checkpoint pulls in confluent_kafka which maintenance alone does not need
+        from lake.connector.checkpoint import prune_checkpoints
+        try:
+            report.pruned_checkpoints = prune_checkpoints(self.connection, self.checkpoint_table, dry_run=dry_run)
+        except CatalogException:
+            # nothing was ingested into this lake yet
+            return
+        except Exception as fail:
+            logger.error(f"maintenance step prune_checkpoints failed: {fail}")
+            report.errors["prune_checkpoints"] = str(fail)
+
+    def _catalog_steps(self, report: MaintenanceReport, dry_run: bool) -> None:
+        # before the snapshot expiry, so the files of the pruned rows are cleaned up by the same run
+        if self.checkpoint_table is not None:
+            self._prune_checkpoints(report, dry_run)
+        defaults = self.settings_for("*")
+        steps = {
+            "expire_snapshots": (
+                f"CALL ducklake_expire_snapshots('{self.lake_alias}', dry_run => {dry_run}, "
+                f"older_than => now() - INTERVAL '{defaults.snapshot_retention}');"
+            ),
+            "cleanup_old_files": (
+                f"CALL ducklake_cleanup_old_files('{self.lake_alias}', dry_run => {dry_run}, "
+                f"older_than => now() - INTERVAL '{defaults.file_retention}');"
+            ),
+            "delete_orphaned_files": (
+                f"CALL ducklake_delete_orphaned_files('{self.lake_alias}', dry_run => {dry_run}, "
+                f"older_than => now() - INTERVAL '{defaults.file_retention}');"
+            ),
+        }
+        for step, statement in steps.items():
+            try:
+                if step == "cleanup_old_files" and not self.include_registered and self.registered_files_due():
+                    raise RuntimeError(
+                        f"{self.registered_files_due()} registered files are scheduled for deletion, "
+                        "cleaning up would delete them where they were registered (pass --include-registered to allow it)"
+                    )
+                removed = len(self.connection.execute(statement).fetchall())
+            except Exception as fail:
+                logger.error(f"maintenance step {step} failed: {fail}")
+                report.errors[step] = str(fail)
+                continue
+            if step == "expire_snapshots":
+                report.expired_snapshots = removed
+            elif step == "cleanup_old_files":
+                report.cleaned_files = removed
+            else:
+                report.orphaned_files = removed
+
+    def run(self, tables: Optional[list[str]] = None, dry_run: bool = False, catalog_steps: bool = True) -> MaintenanceReport:
+        """merge small files of `tables` (default: all), then expire snapshots and remove unreferenced files."""
+        report = MaintenanceReport(dry_run=dry_run)
+        try:
+            # inlined rows first, so they are part of the files merged below
+            if dry_run:
+                report.flushed_rows = {table: rows for table, rows in self.inlined_rows().items() if rows and (tables is None or table in tables)}
+            else:
+                report.flushed_rows = self.flush_inlined(tables)
+        except Exception as fail:
+            logger.error(f"maintenance step flush_inlined_data failed: {fail}")
+            report.errors["flush_inlined_data"] = str(fail)
+        current = self.table_files()
+        registered = set() if self.include_registered else self._registered_tables(report)
+        for table in (list(current.keys()) if tables is None else tables):
+            if table not in current:
+                logger.warning(f"table {table} not found in {self.lake_alias} (skipping maintenance)")
+                continue
+            if table in registered:
+                # merging would schedule the registered originals for deletion
+                logger.warning(f"table {table} holds registered files, not merged (pass --include-registered to merge it)")
+                report.skipped_registered.append(table)
+                continue
+            report.before[table] = current[table]
+            try:
+                if dry_run:
+                    report.after[table] = self.estimate_merge(table, current[table])
+                else:
+                    logger.info(f"merging adjacent files of {self.lake_alias}.{table}")
+                    self._merge(table)
+            except Exception as fail:
+                # e.g. a conflict with a concurrent writer, the next run picks the table up again
+                logger.error(f"merging files of {table} failed: {fail}")
+                report.errors[f"merge {table}"] = str(fail)
+            self._last_runs[table] = time.monotonic()
+        if catalog_steps:
+            self._catalog_steps(report, dry_run)
+            self._last_runs["*"] = time.monotonic()
+        if not dry_run:
+            after = self.table_files()
+            report.after = {table: after.get(table, TableFiles()) for table in report.before}
+        logger.info(report.summary())
+        return report
+
+    def due_tables(self) -> list[str]:
+        now = time.monotonic()
+        return [
+            table for table in self.table_files()
+            if now - self._last_runs.get(table, -math.inf) >= self.settings_for(table).interval_minutes * 60
+        ]
+
+    def run_scheduled(self, poll_interval: float = 30.0) -> None:
+        """run forever, maintaining every table whenever its own interval_minutes has elapsed"""
+        while True:
+            tables = self.due_tables()
+            catalog_due = time.monotonic() - self._last_runs.get("*", -math.inf) >= self.settings_for("*").interval_minutes * 60
+            if tables or catalog_due:
+                self.run(tables=tables, catalog_steps=catalog_due)
+            time.sleep(poll_interval)
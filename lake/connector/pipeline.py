@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from lake.util.logger import logger
+
+_END = object()
+
+
+@dataclass
+class MessageBatch:
+    """
+    raw payloads gathered from one or more polls plus the last offset seen per (topic, partition),
+    `table` is the lake table the batch is routed to and `keys` holds the message keys when the
+    route stores them in `key_column`.
+    """
+    payloads: list[bytes] = field(default_factory=list)
+    offsets: dict[tuple[str, int], int] = field(default_factory=dict)
+    nbytes: int = 0
+    table: Optional[str] = None
+    key_column: Optional[str] = None
+    keys: list[Optional[bytes]] = field(default_factory=list)
+    started_at: Optional[float] = None # time.monotonic() of the first message, set when a buffer flushes
+    generation: int = 0 # rebalance generation the messages were polled in (see Connector.on_revoke)
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def add(self, topic: str, partition: int, offset: int, payload: bytes, key: Optional[bytes] = None) -> None:
+        self.payloads.append(payload)
+        self.offsets[(topic, partition)] = offset
+        # tombstones (None) are skipped by the poller, other producers of batches may still pass them
+        self.nbytes += len(payload or b"")
+        if self.key_column:
+            self.keys.append(key)
+
+
+@dataclass
+class StageStats:
+    """busy time and throughput of a single pipeline stage"""
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, seconds: float, items: int = 1) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+
+class IngestPipeline:
+    """
+    poll -> decode -> write engine with bounded hand-offs.
+    a poller thread feeds raw batches into a decode pool, decoded batches are handed to a
+    single writer thread in poll order. the hand-off queue is bounded so a slow lake
+    blocks the poller instead of buffering unbounded data in memory, while the decode
+    of the next batches overlaps with the insert of the current one.
+    """
+    def __init__(
+        self,
+        source: Iterable[MessageBatch],
+        decode: Callable[[MessageBatch], object],
+        write: Callable[[MessageBatch, object], None],
+        decode_workers: int = 2,
+        queue_size: int = 4,
+        report_interval: float = 30.0,
+        on_stop: Callable[[], None] = None,
+    ):
+        self.source = source
+        self.decode = decode
+        self.write = write
+        self.decode_workers = decode_workers
+        self.report_interval = report_interval
+        self.on_stop = on_stop
+        self.pending: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.poll_stats = StageStats("poll")
+        self.decode_stats = StageStats("decode")
+        self.write_stats = StageStats("write")
+        self._stop = threading.Event()
+        self._error: BaseException = None
+        self._pool: ThreadPoolExecutor = None
+
+    @property
+    def queue_depth(self) -> int:
+        """number of batches polled (decoding or decoded) that are waiting for the writer"""
+        return self.pending.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.pending.maxsize,
+            **{
+                stage.name: {"items": stage.items, "busy_seconds": round(stage.busy_seconds, 3)}
+                for stage in (self.poll_stats, self.decode_stats, self.write_stats)
+            },
+        }
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.on_stop:
+            self.on_stop()
+
+    def _fail(self, stage: str, fail: BaseException) -> None:
+        logger.error(f"ingest pipeline {stage} stage failed: {fail}")
+        if self._error is None:
+            self._error = fail
+        self.stop()
+
+    def _timed_decode(self, batch: MessageBatch):
+        started = time.perf_counter()
+        try:
+            return self.decode(batch)
+        finally:
+            self.decode_stats.record(time.perf_counter() - started)
+
+    def _put(self, item) -> bool:
+        """blocking put that still honours stop() so a dead writer cannot wedge the poller"""
+        while not self._stop.is_set():
+            try:
+                self.pending.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _poll_loop(self) -> None:
+        iterator = iter(self.source)
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                batch = next(iterator, _END)
+                if batch is _END:
+                    break
+                self.poll_stats.record(time.perf_counter() - started)
+                future = self._pool.submit(self._timed_decode, batch)
+                if not self._put((batch, future)):
+                    future.cancel()
+                    break
+        except Exception as fail:
+            self._fail("poll", fail)
+        finally:
+            # the writer drains whatever was already polled before it sees the end marker
+            self.pending.put(_END)
+
+    def _write_loop(self) -> None:
+        last_report = time.monotonic()
+        while True:
+            item = self.pending.get()
+            if item is _END:
+                return
+            batch, future = item
+            if self._error is not None:
+                future.cancel()
+                continue
+            try:
+                frame = future.result()
+                started = time.perf_counter()
+                self.write(batch, frame)
+                self.write_stats.record(time.perf_counter() - started)
+            except Exception as fail:
+                self._fail("write", fail)
+                continue
+            if time.monotonic() - last_report > self.report_interval:
+                logger.info(f"ingest pipeline stats {self.stats()}")
+                last_report = time.monotonic()
+
+    def run(self) -> None:
+        """run until the source is exhausted (or stop() is called) and re-raise the first stage failure."""
+        self._pool = ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="lake-decode")
+        poller = threading.Thread(target=self._poll_loop, name="lake-poller", daemon=True)
+        writer = threading.Thread(target=self._write_loop, name="lake-writer", daemon=True)
+        writer.start()
+        poller.start()
+        try:
+            while poller.is_alive() or writer.is_alive():
+                poller.join(timeout=0.5)
+                writer.join(timeout=0.5)
+        except KeyboardInterrupt:
+            logger.info("ingest pipeline interrupted by user (draining...)")
+            self.stop()
+            poller.join()
+            writer.join()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            logger.info(f"ingest pipeline finished {self.stats()}")
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import duckdb
+
+from lake.util.logger import logger
+
+if TYPE_CHECKING:
+    from lake.connector.core import DuckLakeManager
+
+
+def _fingerprint(config_path: str) -> tuple[int, int]:
+    stat = os.stat(config_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+@dataclass
+class _PoolEntry:
+    manager: "DuckLakeManager"
+    fingerprint: tuple[int, int]
+    generation: int
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ManagerPool:
+    """
+    process wide pool of attached DuckLakeManagers, one per config file.
+    the first checkout of a config creates its secrets and ATTACHes (SRC postgres, ducklake catalog) once,
+    every thread then gets its own duckdb cursor on that database so renders and tasks skip the setup.
+    a connection idle for `idle_check_seconds` is health checked before it is handed out again and
+    re-attached when the check fails or the config file changed.
+    """
+    def __init__(self, idle_check_seconds: float = 60.0):
+        self.idle_check_seconds = idle_check_seconds
+        self._entries: dict[str, _PoolEntry] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+
+    def _attach(self, config_path: str) -> _PoolEntry:
+        from lake.connector.core import DuckLakeManager
+
+        started = time.perf_counter()
+        manager = DuckLakeManager(config_path)
+        self._generation += 1
+        logger.info(f"pooled lake connection for {config_path} attached in {time.perf_counter() - started:.2f}s")
+        return _PoolEntry(manager=manager, fingerprint=_fingerprint(config_path), generation=self._generation)
+
+    def _healthy(self, entry: _PoolEntry) -> bool:
+        lake_alias = entry.manager.Lake.DEST.catalog.lake_alias
+        cursor = entry.manager.duckdb_connection.cursor()
+        try:
+            # goes through to the catalog database, a dropped postgres connection fails here
+            cursor.execute(f"SELECT snapshot_id FROM ducklake_snapshots('{lake_alias}') LIMIT 1").fetchall()
+            return True
+        except duckdb.Error as fail:
+            logger.warning(f"pooled lake connection failed its health check ({fail}), re-attaching")
+            return False
+        finally:
+            cursor.close()
+
+    def _entry(self, config_path: str) -> _PoolEntry:
+        with self._lock:
+            entry = self._entries.get(config_path)
+            if entry is None:
+                entry = self._entries[config_path] = self._attach(config_path)
+                return entry
+        with entry.lock:
+            if entry is not self._entries.get(config_path):
+                return self._entries[config_path]
+            if _fingerprint(config_path) != entry.fingerprint:
+                logger.warning(f"{config_path} changed, re-attaching the pooled lake connection")
+            elif time.monotonic() - entry.last_used < self.idle_check_seconds or self._healthy(entry):
+                entry.last_used = time.monotonic()
+                return entry
+            # cursors handed out before keep the old database alive until they are released
+            with self._lock:
+                entry = self._entries[config_path] = self._attach(config_path)
+            return entry
+
+    def cursor(self, config_path: str) -> duckdb.DuckDBPyConnection:
+        """duckdb cursor of the calling thread on the attached lake of `config_path`"""
+        config_path = str(Path(config_path).resolve())
+        entry = self._entry(config_path)
+        cursors = self._local.__dict__.setdefault("cursors", {})
+        generation, cursor = cursors.get(config_path, (None, None))
+        if generation != entry.generation:
+            cursor = entry.manager.duckdb_connection.cursor()
+            cursors[config_path] = (entry.generation, cursor)
+        return cursor
+
+    def query_cache(self, config_path: str):
+        """result cache shared by every thread using the pooled connection of `config_path`"""
+        entry = self._entry(str(Path(config_path).resolve()))
+        with entry.lock:
+            return entry.manager.result_cache()
+
+    def clear(self) -> None:
+        """drop every pooled connection, the next checkout attaches again"""
+        with self._lock:
+            self._entries.clear()
+
+
+manager_pool = ManagerPool()
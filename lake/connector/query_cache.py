@@ -0,0 +1,265 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from lake.util.logger import logger
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+# special values parsed as bare column references instead of function calls
+_CLOCK_KEYWORDS = {"current_date", "current_time", "current_timestamp", "localtime", "localtimestamp"}
+
+
+def normalize_sql(sql: str) -> str:
+    """collapse whitespace outside of string literals and drop the trailing semicolon"""
+    parts = _STRING_LITERAL.split(sql.strip().rstrip(";").strip())
+    return "".join(part if index % 2 else re.sub(r"\s+", " ", part) for index, part in enumerate(parts))
+
+
+@functools.lru_cache(maxsize=1)
+def _non_deterministic_functions() -> frozenset:
+    """functions whose result changes between queries (now(), random(), ...)"""
+    with duckdb.connect() as connection:
+        rows = connection.execute(
+            "SELECT DISTINCT function_name FROM duckdb_functions() WHERE stability IN ('VOLATILE', 'CONSISTENT_WITHIN_QUERY');"
+        ).fetchall()
+    return frozenset(name for (name,) in rows)
+
+
+def cacheable(parsed: str) -> bool:
+    """
+    whether the result of a statement (its json_serialize_sql parse tree, nothing is bound) only depends on the
+    tables it reads: single SELECTs without table functions (read_csv, read_parquet, ...), non-deterministic functions
+    or samples without a seed
+    """
+    tree = json.loads(parsed)
+    if tree.get("error") or len(tree["statements"]) != 1:
+        return False
+    non_deterministic = _non_deterministic_functions()
+    pending = [tree["statements"]]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        if node.get("type") == "TABLE_FUNCTION" or node.get("function_name") in non_deterministic:
+            return False
+        sample = node.get("sample")
+        if isinstance(sample, dict) and (sample.get("seed") is None or sample["seed"] < 0):
+            return False
+        if node.get("class") == "COLUMN_REF" and len(node["column_names"]) == 1 and node["column_names"][0].lower() in _CLOCK_KEYWORDS:
+            return False
+        pending.extend(node.values())
+    return True
+
+
+def referenced_tables(sql: str, lake_alias: str, current_database: str, current_schema: str) -> Optional[set[tuple[str, str]]]:
+    """
+    (schema, table) of every lake table read by `sql`, None when the query also reads tables outside the lake
+    (their changes cannot be tracked) or duckdb cannot resolve them (it binds the query, e.g. JOIN ... USING fails).
+    """
+    try:
+        names = duckdb.get_table_names(sql, qualified=True)
+    except duckdb.Error:
+        return None
+    tables = set()
+    for name in names:
+        parts = [part.strip('"') for part in name.split(" AS ")[0].split(".")]
+        if len(parts) == 3:
+            catalog, schema, table = parts
+        elif len(parts) == 2 and parts[0] == lake_alias:
+            catalog, schema, table = lake_alias, "main", parts[1]
+        elif len(parts) == 2:
+            catalog, schema, table = current_database, parts[0], parts[1]
+        else:
+            catalog, schema, table = current_database, current_schema, parts[0]
+        if catalog != lake_alias:
+            return None
+        tables.add((schema, table))
+    return tables
+
+
+def table_versions(connection, lake_alias: str, tables: set[tuple[str, str]]) -> dict[tuple[str, str], int]:
+    """
+    snapshot id of the last change of every table: the latest snapshot that created, ended or
+    altered one of its data files, delete files or columns. tables with inlined data (kept in the
+    catalog instead of files) fall back to the latest snapshot of the whole lake.
+    """
+    metadata = f"__ducklake_metadata_{lake_alias}"
+    changed = lambda source: (
+        f"(SELECT max(greatest(begin_snapshot, coalesce(end_snapshot, 0))) FROM {metadata}.{source} x WHERE x.table_id = t.table_id)"
+    )
+    rows = connection.execute(f"""
+        SELECT s.schema_name, t.table_name,
+            greatest(
+                t.begin_snapshot,
+                coalesce({changed('ducklake_data_file')}, 0),
+                coalesce({changed('ducklake_delete_file')}, 0),
+                coalesce({changed('ducklake_column')}, 0)
+            ),
+            EXISTS (SELECT 1 FROM {metadata}.ducklake_inlined_data_tables i WHERE i.table_id = t.table_id)
+        FROM {metadata}.ducklake_table t
+        JOIN {metadata}.ducklake_schema s ON s.schema_id = t.schema_id AND s.end_snapshot IS NULL
+        WHERE t.end_snapshot IS NULL AND t.table_name IN (SELECT unnest(?))
+    """, [sorted({table for _, table in tables})]).fetchall()
+    latest = None
+    versions = {}
+    for schema, table, version, inlined in rows:
+        if (schema, table) not in tables:
+            continue
+        if inlined:
+            if latest is None:
+                latest = connection.execute(f"SELECT max(snapshot_id) FROM {metadata}.ducklake_snapshot").fetchone()[0]
+            version = latest
+        versions[(schema, table)] = version
+    return versions
+
+
+@dataclass
+class _Entry:
+    table: Optional[pa.Table]
+    nbytes: int
+    depends_on: frozenset
+    path: Optional[Path] = None
+
+
+class QueryCache:
+    """
+    arrow results of lake queries keyed by the normalized sql and the snapshot id of every table it reads.
+    results live in memory (LRU, `max_bytes`), evicted entries move to an optional disk tier
+    (Arrow IPC files in `directory`, LRU, `disk_max_bytes`). a table seen at a new snapshot drops
+    every entry that depends on it, other entries stay valid.
+    """
+    def __init__(self, max_bytes: int, directory: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.directory = Path(directory) if directory else None
+        self.nbytes = 0
+        self.disk_nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, _Entry] = OrderedDict()
+        self._disk: OrderedDict[str, _Entry] = OrderedDict()
+        self._versions: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # spilled results of a previous run are still valid for their key, oldest first
+            for path in sorted(self.directory.glob("*.arrow"), key=os.path.getmtime):
+                self._disk[path.stem] = _Entry(None, path.stat().st_size, frozenset(), path)
+                self.disk_nbytes += path.stat().st_size
+
+    @staticmethod
+    def key(sql: str, params, versions: dict[tuple[str, str], int]) -> str:
+        payload = [normalize_sql(sql), repr(params), sorted([list(table), version] for table, version in versions.items())]
+        return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+    def observe(self, versions: dict[tuple[str, str], int]) -> None:
+        """record the current snapshot of the tables, entries of tables that moved on are dropped"""
+        with self._lock:
+            changed = {table for table, version in versions.items() if self._versions.get(table, version) != version}
+            self._versions.update(versions)
+            if not changed:
+                return
+            for tier in (self._memory, self._disk):
+                for key in [key for key, entry in tier.items() if entry.depends_on & changed]:
+                    self._drop(tier, key)
+            logger.info(f"query cache invalidated for {sorted('.'.join(table) for table in changed)}")
+
+    def get(self, key: str) -> Optional[pa.Table]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry.table
+            entry = self._disk.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with pa.memory_map(str(entry.path), "r") as source:
+                    table = ipc.open_file(source).read_all()
+            except (OSError, pa.ArrowInvalid) as fail:
+                logger.warning(f"dropping unreadable cached result {entry.path}: {fail}")
+                self._drop(self._disk, key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            if table.nbytes > self.max_bytes:
+                self._disk.move_to_end(key)
+                return table
+            self._drop(self._disk, key)
+            self._put(key, table, entry.depends_on)
+            return table
+
+    def put(self, key: str, table: pa.Table, depends_on: set[tuple[str, str]]) -> None:
+        with self._lock:
+            self._put(key, table, frozenset(depends_on))
+
+    def _put(self, key: str, table: pa.Table, depends_on: frozenset) -> None:
+        if key in self._memory:
+            self._drop(self._memory, key)
+        entry = _Entry(table, table.nbytes, depends_on)
+        if entry.nbytes > self.max_bytes:
+            self._spill(key, entry)
+            return
+        self._memory[key] = entry
+        self.nbytes += entry.nbytes
+        while self.nbytes > self.max_bytes:
+            evicted_key, evicted = self._memory.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self._spill(evicted_key, evicted)
+
+    def _spill(self, key: str, entry: _Entry) -> None:
+        if self.directory is None or entry.nbytes > self.disk_max_bytes:
+            return
+        path = self.directory / f"{key}.arrow"
+        staging = path.with_suffix(".tmp")
+        try:
+            with pa.OSFile(str(staging), "wb") as sink, ipc.new_file(sink, entry.table.schema) as writer:
+                writer.write_table(entry.table)
+            os.replace(staging, path)
+        except OSError as fail:
+            logger.warning(f"cannot spill cached result to {path}: {fail}")
+            return
+        self._disk[key] = _Entry(None, path.stat().st_size, entry.depends_on, path)
+        self.disk_nbytes += self._disk[key].nbytes
+        while self.disk_nbytes > self.disk_max_bytes:
+            self._drop(self._disk, next(iter(self._disk)))
+
+    def _drop(self, tier: OrderedDict, key: str) -> None:
+        entry = tier.pop(key)
+        if tier is self._memory:
+            self.nbytes -= entry.nbytes
+            return
+        self.disk_nbytes -= entry.nbytes
+        try:
+            entry.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            for tier in (self._memory, self._disk):
+                for key in list(tier):
+                    self._drop(tier, key)
+            self._versions.clear()
+
+    def summary(self) -> str:
+        return (
+            f"{len(self._memory)} results ({self.nbytes} bytes) in memory, {len(self._disk)} ({self.disk_nbytes} bytes) on disk, "
+            f"{self.hits} hits / {self.misses} misses"
+        )
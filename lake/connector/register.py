@@ -0,0 +1,208 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional
+
+import duckdb
+from duckdb import DuckDBPyConnection
+
+from lake.connector.layout import TableLayout
+from lake.util.conf_loader import RegisterCnf
+from lake.util.logger import logger
+
+RegisterMode = Literal["reference", "copy", "auto"]
+
+
+def _literal(value: str) -> str:
+    # paths are inlined (not bound) so the lazy SRC storage attach sees the s3://scope they are on
+    return "'" + value.replace("'", "''") + "'"
+
+
+@dataclass
+class RegisterReport:
+    table: str
+    mode: str
+    listed: int = 0
+    skipped: int = 0
+    registered: int = 0
+    copied: int = 0
+    seconds: float = 0.0
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        lines = [
+            f"register into {self.table} ({self.mode}): {self.listed} files listed, {self.skipped} already in the table, "
+            f"{self.registered} registered, {self.copied} copied in {self.seconds:.2f}s"
+        ]
+        for path, error in self.errors.items():
+            lines.append(f"  FAILED {path}: {error}")
+        return "\n".join(lines)
+
+
+class ParquetRegistrar:
+    """
+    adds existing parquet files to a lake table without rewriting them (ducklake_add_data_files), the lake
+    only stores their path and footer statistics. files are checked against the table schema and handled in
+    batches: footers of a batch are read and the batch is registered in one transaction (one snapshot),
+    batches run in parallel. `copy` rewrites the files into the lake instead, `auto` only copies the files
+    that cannot be referenced (schema mismatch or a failed registration).
+    registered files are left where they are, `lake maintain` skips their tables unless told otherwise.
+    """
+    def __init__(self, connection: DuckDBPyConnection, lake_alias: str, settings: RegisterCnf, layout: Optional[TableLayout] = None):
+        self.connection = connection
+        self.lake_alias = lake_alias
+        self.settings = settings
+        # partitioning/options of a table created here, referenced files keep their own layout
+        self.layout = layout
+
+    def list_files(self, patterns: List[str]) -> List[str]:
+        files = []
+        for pattern in patterns:
+            files += [path for (path,) in self.connection.execute(f"SELECT file FROM glob({_literal(pattern)});").fetchall()]
+        return list(dict.fromkeys(files))
+
+    def table_columns(self, cursor, table: str) -> Dict[str, str]:
+        return {name: column_type for name, column_type, *_ in cursor.execute(f"DESCRIBE {self.lake_alias}.{table};").fetchall()}
+
+    def file_columns(self, cursor, path: str) -> Dict[str, str]:
+        # only the footer is read
+        return {
+            name: column_type
+            for name, column_type, *_ in cursor.execute(f"DESCRIBE SELECT * FROM read_parquet({_literal(path)});").fetchall()
+        }
+
+    def registered_files(self, table: str) -> set:
+        return {
+            path for (path,) in self.connection.execute(
+                f"SELECT data_file FROM ducklake_list_files('{self.lake_alias}', '{table}');"
+            ).fetchall()
+        }
+
+    @staticmethod
+    def mismatch(table_columns: Dict[str, str], file_columns: Dict[str, str], allow_missing: bool, ignore_extra_columns: bool) -> Optional[str]:
+        """why a file cannot be referenced as a data file of the table (None when it can)"""
+        missing = [name for name in table_columns if name not in file_columns]
+        extra = [name for name in file_columns if name not in table_columns]
+        if missing and not allow_missing:
+            return f"missing columns {missing}"
+        if extra and not ignore_extra_columns:
+            return f"extra columns {extra}"
+        for name, column_type in file_columns.items():
+            if name in table_columns and table_columns[name] != column_type:
+                return f"column {name} is {column_type} in the file and {table_columns[name]} in the table"
+        return None
+
+    def _add(self, cursor, table: str, path: str, allow_missing: bool, ignore_extra_columns: bool) -> None:
+        cursor.execute(
+            f"CALL ducklake_add_data_files('{self.lake_alias}', '{table}', {_literal(path)}, "
+            f"allow_missing => {str(allow_missing).lower()}, ignore_extra_columns => {str(ignore_extra_columns).lower()});"
+        )
+
+    def _copy(self, cursor, table: str, path: str, columns: List[str]) -> None:
+        selected = ", ".join(f'"{name}"' for name in columns)
+        cursor.execute(f"INSERT INTO {self.lake_alias}.{table} BY NAME SELECT {selected} FROM read_parquet({_literal(path)});")
+
+    def _commit(self, cursor, table: str, reference: List[str], copy: Dict[str, List[str]], allow_missing: bool, ignore_extra_columns: bool) -> None:
+        for attempt in range(1, self.settings.attempts + 1):
+            cursor.execute("BEGIN TRANSACTION;")
+            try:
+                for path in reference:
+                    self._add(cursor, table, path, allow_missing, ignore_extra_columns)
+                for path, columns in copy.items():
+                    self._copy(cursor, table, path, columns)
+                cursor.execute("COMMIT;")
+                return
+            except duckdb.TransactionException as conflict:
+                cursor.execute("ROLLBACK;")
+                if attempt == self.settings.attempts:
+                    raise
+                logger.warning(f"batch of {table} conflicted (attempt {attempt}), retrying: {conflict}")
+                time.sleep(0.1 * attempt)
+            except Exception:
+                cursor.execute("ROLLBACK;")
+                raise
+
+    def _batch(self, table: str, paths: List[str], mode: RegisterMode, allow_missing: bool, ignore_extra_columns: bool) -> tuple[int, int, Dict[str, str]]:
+        """registered, copied and failed files of one batch"""
+        cursor = self.connection.cursor()
+        try:
+            columns = self.table_columns(cursor, table)
+            reference, copy, shared, errors = [], {}, {}, {}
+            for path in paths:
+                try:
+                    file_columns = self.file_columns(cursor, path)
+                except duckdb.Error as fail:
+                    errors[path] = " ".join(str(fail).split())
+                    continue
+                reason = self.mismatch(columns, file_columns, allow_missing, ignore_extra_columns)
+                # a copy only reads the columns the table has, missing ones are NULL
+                shared[path] = [name for name in file_columns if name in columns]
+                if mode == "copy" or (reason and mode == "auto"):
+                    copy[path] = shared[path]
+                elif reason:
+                    errors[path] = reason
+                else:
+                    reference.append(path)
+            try:
+                self._commit(cursor, table, reference, copy, allow_missing, ignore_extra_columns)
+                return len(reference), len(copy), errors
+            except duckdb.Error as fail:
+                logger.warning(f"batch of {len(paths)} files failed ({' '.join(str(fail).split())}), retrying file by file")
+            # one file per transaction so a bad file only fails itself
+            registered, copied = 0, 0
+            for path in reference:
+                try:
+                    self._commit(cursor, table, [path], {}, allow_missing, ignore_extra_columns)
+                    registered += 1
+                    continue
+                except duckdb.Error as fail:
+                    if mode != "auto":
+                        errors[path] = " ".join(str(fail).split())
+                        continue
+                copy[path] = shared[path]
+            for path, file_columns in copy.items():
+                try:
+                    self._commit(cursor, table, [], {path: file_columns}, allow_missing, ignore_extra_columns)
+                    copied += 1
+                except duckdb.Error as fail:
+                    errors[path] = " ".join(str(fail).split())
+            return registered, copied, errors
+        finally:
+            cursor.close()
+
+    def run(
+        self,
+        table: str,
+        patterns: List[str],
+        mode: RegisterMode = "reference",
+        allow_missing: bool = False,
+        ignore_extra_columns: bool = False,
+    ) -> RegisterReport:
+        """register (or copy) every parquet file matching `patterns` into `table`, created from the first file when missing"""
+        started = time.monotonic()
+        report = RegisterReport(f"{self.lake_alias}.{table}", mode)
+        files = self.list_files(patterns)
+        report.listed = len(files)
+        if not files:
+            logger.warning(f"no parquet file matches {patterns}")
+            return report
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.lake_alias}.{table} AS SELECT * FROM read_parquet({_literal(files[0])}) LIMIT 0;"
+        )
+        if self.layout is not None:
+            self.layout.apply(table)
+        registered = self.registered_files(table)
+        pending = [path for path in files if path not in registered]
+        report.skipped = len(files) - len(pending)
+        batches = [pending[start:start + self.settings.batch_files] for start in range(0, len(pending), self.settings.batch_files)]
+        logger.info(f"registering {len(pending)} files into {report.table} in {len(batches)} batches ({mode})")
+        with ThreadPoolExecutor(max_workers=max(min(self.settings.workers, len(batches)), 1), thread_name_prefix="register") as executor:
+            for batch_registered, batch_copied, errors in executor.map(
+                lambda batch: self._batch(table, batch, mode, allow_missing, ignore_extra_columns), batches
+            ):
+                report.registered += batch_registered
+                report.copied += batch_copied
+                report.errors.update(errors)
+        report.seconds = time.monotonic() - started
+        (logger.error if report.errors else logger.info)(report.summary())
+        return report
@@ -0,0 +1,37 @@
+import re
+from typing import Optional
+
+from lake.util.conf_loader import RouteCnf
+from lake.util.logger import logger
+
+
+class TopicRouter:
+    """
+    maps every consumed topic to the lake table it is ingested into.
+    routes are matched in config order, exact topic names win over regex routes (`^...`)
+    and the resolved route of a topic is cached so the hot path is a single dict lookup.
+    """
+    def __init__(self, routes: list[RouteCnf]):
+        self.routes = routes
+        self._exact = {route.topic: route for route in routes if not route.topic.startswith("^")}
+        self._patterns = [(re.compile(route.topic), route) for route in routes if route.topic.startswith("^")]
+        self._resolved: dict[str, Optional[RouteCnf]] = {}
+
+    @property
+    def subscriptions(self) -> list[str]:
+        """topics and topic regexes to subscribe to (librdkafka treats entries starting with ^ as regex)"""
+        return list(dict.fromkeys(route.topic for route in self.routes))
+
+    @property
+    def tables(self) -> list[str]:
+        return list(dict.fromkeys(route.table for route in self.routes))
+
+    def route(self, topic: str) -> Optional[RouteCnf]:
+        if topic not in self._resolved:
+            route = self._exact.get(topic)
+            if route is None:
+                route = next((route for pattern, route in self._patterns if pattern.match(topic)), None)
+            if route is None:
+                logger.error(f"no route matches topic {topic}, its messages are skipped")
+            self._resolved[topic] = route
+        return self._resolved[topic]
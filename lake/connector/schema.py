@@ -0,0 +1,162 @@
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import pyarrow as pa
+from duckdb import CatalogException, DuckDBPyConnection
+
+from lake.util.logger import logger
+
+# numeric widening order, a column only ever moves to the right
+_NUMERIC_ORDER = ["TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "FLOAT", "DOUBLE"]
+_NULL_TYPE = '"NULL"'
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def widen(current: str, incoming: str) -> str:
+    """smallest type able to hold values of both types (INTEGER -> BIGINT -> DOUBLE, anything else -> VARCHAR)"""
+    if current == incoming or incoming == _NULL_TYPE:
+        return current
+    if current == _NULL_TYPE:
+        return incoming
+    if current in _NUMERIC_ORDER and incoming in _NUMERIC_ORDER:
+        return max(current, incoming, key=_NUMERIC_ORDER.index)
+    if {current, incoming} <= {"DATE", "TIMESTAMP"}:
+        return "TIMESTAMP"
+    return "VARCHAR"
+
+
+def _null_columns(messages_frame) -> set:
+    """fields of a batch without a single value (arrow null type, or an object column of only None/NaN)"""
+    schema = getattr(messages_frame, "schema", None)
+    if schema is not None:
+        return {field.name for field in schema if pa.types.is_null(field.type)}
+    objects = messages_frame.columns[messages_frame.dtypes == object]
+    return set(objects[messages_frame[objects].isna().all().to_numpy()]) if len(objects) else set()
+
+
+@contextmanager
+def registered(connection, messages_frame, name: str = "messages_frame"):
+    """
+    expose a frame to the statements of `connection` as `name`, explicitly instead of a replacement scan
+    (the connection wrapper adds python frames between the caller and duckdb)
+    """
+    connection.register(name, messages_frame)
+    try:
+        yield
+    finally:
+        connection.unregister(name)
+
+
+class SchemaRegistry:
+    """
+    batch wide schema inference and online schema evolution of ingest tables.
+    the schema of every table is cached after its first lookup, new fields of a batch are
+    added with ALTER TABLE ADD COLUMN and widened fields are promoted in place when the lake
+    allows it, otherwise the batch values are cast to the column type on insert.
+    """
+    def __init__(self, connection: DuckDBPyConnection, on_create: Optional[Callable[[str], object]] = None):
+        self.connection = connection
+        # called with the name of every table created here (e.g. to apply its layout)
+        self.on_create = on_create
+        self._tables: Dict[str, Dict[str, str]] = {}
+        # columns the lake refused to promote, batches are cast to the stored type instead
+        self._pinned: Dict[str, set] = {}
+
+    def infer(self, messages_frame) -> Dict[str, str]:
+        """column -> duckdb type of a whole decoded batch (arrow table or DataFrame), in one vectorized pass"""
+        with registered(self.connection, messages_frame):
+            rows = self.connection.execute("DESCRIBE SELECT * FROM messages_frame;").fetchall()
+        # DESCRIBE reports fields without any value as INTEGER, they must not widen (or create) a column
+        nulls = _null_columns(messages_frame)
+        return {row[0]: _NULL_TYPE if row[0] in nulls else row[1] for row in rows}
+
+    def lookup(self, table: str) -> Optional[Dict[str, str]]:
+        if table not in self._tables:
+            try:
+                rows = self.connection.execute(f"DESCRIBE {table};").fetchall()
+            except CatalogException:
+                return None
+            self._tables[table] = {row[0]: row[1] for row in rows}
+            self._pinned.setdefault(table, set())
+        return self._tables[table]
+
+    def _create(self, table: str, inferred: Dict[str, str]) -> None:
+        columns = {column: ("VARCHAR" if kind == _NULL_TYPE else kind) for column, kind in inferred.items()}
+        columns_sql = ", ".join(f"{quote(column)} {kind}" for column, kind in columns.items())
+        create_statement = f"CREATE TABLE IF NOT EXISTS {table} ({columns_sql});"
+        self.connection.execute(create_statement)
+        logger.info(f"created ingest table -> {create_statement}")
+        if self.on_create is not None:
+            self.on_create(table)
+        self._tables.pop(table, None)
+        self.lookup(table)
+
+    def _evolve(self, table: str, column: str, current: Optional[str], incoming: str) -> None:
+        schema = self._tables[table]
+        if current is None:
+            statement = f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {quote(column)} {incoming};"
+            self.connection.execute(statement)
+            logger.warning(f"new field in {table} -> {statement}")
+            # another writer may have added it first with a different type
+            self._tables.pop(table)
+            schema.update(self.lookup(table))
+            self._tables[table] = schema
+            return
+        target = widen(current, incoming)
+        if target == current or column in self._pinned[table]:
+            return
+        statement = f"ALTER TABLE {table} ALTER COLUMN {quote(column)} SET DATA TYPE {target};"
+        try:
+            self.connection.execute(statement)
+            logger.warning(f"widened field in {table} -> {statement}")
+            schema[column] = target
+        except Exception as fail:
+            logger.warning(f"cannot promote {table}.{column} from {current} to {target} ({fail}), casting batches to {current}")
+            self._pinned[table].add(column)
+
+    def _count_nulled(self, table: str, messages_frame, casts: Dict[str, str]) -> None:
+        """log how many values of the batch the casts to the stored types turn into NULL"""
+        with registered(self.connection, messages_frame):
+            counts = self.connection.execute(
+                "SELECT " + ", ".join(
+                    f"count(*) FILTER (WHERE {quote(column)} IS NOT NULL AND TRY_CAST({quote(column)} AS {kind}) IS NULL)"
+                    for column, kind in casts.items()
+                ) + " FROM messages_frame;"
+            ).fetchone()
+        nulled = {column: count for column, count in zip(casts, counts) if count}
+        if nulled:
+            logger.warning(f"values of {table} that do not fit the stored column types were stored as NULL: {nulled}")
+
+    def ensure(self, table: str, messages_frame) -> Optional[str]:
+        """
+        make `table` able to receive the batch and return the select list that inserts it by name
+        (values of pinned columns are cast to the stored type, unparsable ones become NULL and are logged).
+        None for a batch without any column (only malformed messages), there is nothing to insert.
+        """
+        if messages_frame.shape[1] == 0:
+            return None
+        inferred = self.infer(messages_frame)
+        schema = self.lookup(table)
+        if schema is None:
+            self._create(table, inferred)
+            schema = self._tables[table]
+        for column, kind in inferred.items():
+            if kind == _NULL_TYPE and column in schema:
+                continue
+            self._evolve(table, column, schema.get(column), "VARCHAR" if kind == _NULL_TYPE else kind)
+        # casts that cannot lose values (to VARCHAR or to a wider number) are not checked
+        lossy = {
+            column: schema[column] for column, kind in inferred.items()
+            if schema[column] != kind and kind != _NULL_TYPE and schema[column] != "VARCHAR"
+            and not (kind in _NUMERIC_ORDER and schema[column] in _NUMERIC_ORDER and widen(schema[column], kind) == schema[column])
+        }
+        if lossy:
+            self._count_nulled(table, messages_frame, lossy)
+        return ", ".join(
+            f"TRY_CAST({quote(column)} AS {schema[column]}) AS {quote(column)}"
+            if schema[column] != kind and kind != _NULL_TYPE else quote(column)
+            for column, kind in inferred.items()
+        )
@@ -0,0 +1,173 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import duckdb
+
+from lake.util.logger import logger
+
+_USE = re.compile(r"\s*use\b", re.IGNORECASE)
+# connection methods taking a statement or a (qualified) table name, and the ones reading file paths
+_STATEMENT_METHODS = frozenset({"executemany", "from_query", "table", "view"})
+_FILE_METHODS = frozenset({"read_csv", "read_json", "read_parquet", "from_csv_auto", "from_parquet"})
+# keyword names of their first argument
+_TARGET_KEYWORDS = ("query", "table_name", "view_name", "path_or_buffer", "file_glob", "file_globs")
+
+
+def referenced_catalogs(query: str) -> Optional[set[str]]:
+    """catalogs of the qualified tables `query` uses (lower case), None when duckdb cannot tell (parse or bind errors)"""
+    try:
+        names = duckdb.get_table_names(query, qualified=True)
+    except duckdb.Error:
+        return None
+    return {name.split(".")[0].strip('"').lower() for name in names if "." in name}
+
+
+@dataclass
+class Source:
+    """a SRC postgres/storage entry, attached by running `statements` (secret, ATTACH) once"""
+    alias: str
+    kind: str
+    statements: list[str]
+    # a statement matching this pattern needs the source
+    reference: re.Pattern
+    attached: bool = False
+    failed_at: float = 0.0
+    error: Optional[str] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class SourceRegistry:
+    """
+    SRC sources of a lake, each attached the first time a statement references it
+    (`alias.` / `USE alias` for postgres, `s3://scope` for storage) or when pre-attached.
+    a source that fails to attach only fails the statements using it, it is retried after `retry_seconds`.
+    postgres references found by the pattern are confirmed with the catalogs duckdb parses from the statement,
+    so an alias inside a string literal or comment does not attach it.
+    """
+    def __init__(self, retry_seconds: float = 30.0):
+        self.retry_seconds = retry_seconds
+        self._sources: dict[str, Source] = {}
+        self._pending: list[Source] = []
+
+    def add_postgres(self, alias: str, secret_sql: str, attach_sql: str) -> None:
+        reference = re.compile(rf"(?<![\w.]){re.escape(alias)}\s*\.|\buse\s+{re.escape(alias)}\b", re.IGNORECASE)
+        self._add(Source(alias, "postgres", [secret_sql, attach_sql], reference))
+
+    def add_storage(self, alias: str, scope: str, secret_sql: str) -> None:
+        self._add(Source(alias, "storage", [secret_sql], re.compile(rf"s3://{re.escape(scope)}\b", re.IGNORECASE)))
+
+    def _add(self, source: Source) -> None:
+        self._sources[source.alias] = source
+        self._pending.append(source)
+
+    def _attach(self, connection, source: Source) -> None:
+        with source.lock:
+            if source.attached:
+                return
+            if source.error and time.monotonic() - source.failed_at < self.retry_seconds:
+                raise duckdb.ConnectionException(f"source {source.alias} is unavailable: {source.error}")
+            started = time.perf_counter()
+            try:
+                for statement in source.statements:
+                    connection.execute(statement)
+            except duckdb.Error as fail:
+                source.failed_at, source.error = time.monotonic(), str(fail)
+                logger.error(f"failed to attach {source.kind} source {source.alias}: {fail}")
+                raise
+            source.attached, source.error = True, None
+            self._pending = [pending for pending in self._pending if pending is not source]
+            logger.info(f"attached {source.kind} source {source.alias} in {time.perf_counter() - started:.2f}s")
+
+    def ensure(self, connection, query, files: bool = False) -> None:
+        """attach the sources `query` (a statement, or file paths with `files`) references and that are not attached yet"""
+        if not self._pending:
+            return
+        if files:
+            paths = [query] if isinstance(query, str) else [path for path in query or () if isinstance(path, str)]
+            for source in self._pending:
+                if source.kind == "storage" and any(source.reference.search(path) for path in paths):
+                    self._attach(connection, source)
+            return
+        if not isinstance(query, str):
+            return
+        catalogs, parsed = None, False
+        for source in self._pending:
+            if not source.reference.search(query):
+                continue
+            if source.kind == "postgres" and not _USE.match(query):
+                if not parsed:
+                    catalogs, parsed = referenced_catalogs(query), True
+                # the pattern alone decides when the statement cannot be parsed
+                if catalogs is not None and source.alias.lower() not in catalogs:
+                    continue
+            self._attach(connection, source)
+
+    def attach(self, connection, aliases: list[str]) -> dict[str, Optional[str]]:
+        """attach the given sources in parallel (one cursor each), returns the error of every alias (None when attached)"""
+        sources = [self._sources[alias] for alias in aliases if alias in self._sources]
+        unknown = [alias for alias in aliases if alias not in self._sources]
+        if unknown:
+            logger.warning(f"cannot pre-attach unknown sources {unknown}")
+
+        def attach_one(source: Source) -> Optional[str]:
+            cursor = connection.cursor()
+            try:
+                self._attach(cursor, source)
+                return None
+            except duckdb.Error as fail:
+                return str(fail)
+            finally:
+                cursor.close()
+
+        if not sources:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="attach") as executor:
+            return dict(zip([source.alias for source in sources], executor.map(attach_one, sources)))
+
+
+class SourceConnection:
+    """
+    duckdb connection (or cursor) that attaches the SRC sources a statement, table name or file path references
+    before duckdb resolves it, everything else is passed through to the wrapped connection.
+    """
+    def __init__(self, connection: duckdb.DuckDBPyConnection, sources: SourceRegistry):
+        self._connection = connection
+        self.sources = sources
+
+    def execute(self, query, *args, **kwargs):
+        self.sources.ensure(self._connection, query)
+        return self._connection.execute(query, *args, **kwargs)
+
+    def sql(self, query, *args, **kwargs):
+        self.sources.ensure(self._connection, query)
+        return self._connection.sql(query, *args, **kwargs)
+
+    def query(self, query, *args, **kwargs):
+        self.sources.ensure(self._connection, query)
+        return self._connection.query(query, *args, **kwargs)
+
+    def table_function(self, name: str, parameters=None):
+        self.sources.ensure(self._connection, parameters, files=True)
+        return self._connection.table_function(name, parameters)
+
+    def cursor(self) -> "SourceConnection":
+        return SourceConnection(self._connection.cursor(), self.sources)
+
+    def attach_sources(self, aliases: list[str]) -> dict[str, Optional[str]]:
+        return self.sources.attach(self._connection, aliases)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._connection, name)
+        if name not in _STATEMENT_METHODS and name not in _FILE_METHODS:
+            return attribute
+        files = name in _FILE_METHODS
+
+        def ensured(*args, **kwargs):
+            target = args[0] if args else next((kwargs[key] for key in _TARGET_KEYWORDS if key in kwargs), None)
+            self.sources.ensure(self._connection, target, files=files)
+            return attribute(*args, **kwargs)
+        return ensured
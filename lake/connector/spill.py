@@ -0,0 +1,157 @@
+import json
+import math
+import os
+from pathlib import Path
+from collections.abc import Callable
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from lake.util.logger import logger
+
+_OFFSETS_KEY = b"lake.offsets"
+_TABLE_KEY = b"lake.table"
+
+
+def _encode_offsets(offsets: dict[tuple[str, int], int]) -> bytes:
+    return json.dumps([[topic, partition, offset] for (topic, partition), offset in offsets.items()]).encode()
+
+
+def _decode_offsets(raw: bytes) -> dict[tuple[str, int], int]:
+    return {(topic, partition): offset for topic, partition, offset in json.loads(raw)}
+
+
+def _stringify(value):
+    if isinstance(value, str):
+        return value
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return json.dumps(value, default=str)
+
+
+def _to_arrow(messages_frame) -> pa.Table:
+    """arrow table of a decoded batch, object columns arrow cannot type (mixed values) are stored as strings"""
+    if isinstance(messages_frame, pa.Table):
+        return messages_frame
+    try:
+        return pa.Table.from_pandas(messages_frame, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        frame = messages_frame.copy()
+    for column in frame.columns[frame.dtypes == object]:
+        try:
+            pa.array(frame[column], from_pandas=True)
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            frame[column] = frame[column].map(_stringify)
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def merge_frames(messages_frames: list) -> pa.Table:
+    """
+    one arrow table of frames with different columns (the key sets of a RowAppender), missing columns are NULL.
+    a column typed differently by two frames (a string and a number) is stored as strings
+    """
+    tables = [_to_arrow(messages_frame) for messages_frame in messages_frames]
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        pass
+    types: dict[str, set] = {}
+    for table in tables:
+        for field in table.schema:
+            if field.type != pa.null():
+                types.setdefault(field.name, set()).add(field.type)
+    for name in [name for name, column_types in types.items() if len(column_types) > 1]:
+        for index, table in enumerate(tables):
+            if name in table.column_names:
+                values = pa.array([_stringify(value) for value in table.column(name).to_pylist()], pa.string())
+                tables[index] = table.set_column(table.column_names.index(name), name, values)
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+class SpillBuffer:
+    """
+    local staging area for decoded batches while the lake (storage or catalog) is unavailable.
+    every batch becomes one Arrow IPC segment carrying its table and offsets in the schema metadata,
+    segments are numbered so they are drained in the order they were written, also after a restart.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._segments: list[Path] = sorted(self.directory.glob("*.arrow"))
+        # rebalance generation each batch was polled in (segments of a previous run are 0)
+        self._generations: dict[Path, int] = {}
+        self.nbytes = sum(segment.stat().st_size for segment in self._segments)
+        self._sequence = int(self._segments[-1].stem) + 1 if self._segments else 0
+        if self._segments:
+            logger.warning(f"found {len(self._segments)} spilled segments ({self.nbytes} bytes) in {self.directory} waiting to be drained")
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def append(self, target_table: str, messages_frame, offsets: dict[tuple[str, int], int], generation: int = 0) -> bool:
+        """stage a batch (polled in rebalance `generation`) on disk, returns False when it does not fit in max_bytes"""
+        table = _to_arrow(messages_frame)
+        if self.nbytes + table.nbytes > self.max_bytes:
+            return False
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            _OFFSETS_KEY: _encode_offsets(offsets),
+            _TABLE_KEY: target_table.encode(),
+        })
+        segment = self.directory / f"{self._sequence:012d}.arrow"
+        staging = segment.with_suffix(".tmp")
+        with pa.OSFile(str(staging), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        # rename is atomic, a crash never leaves a half written segment behind
+        os.replace(staging, segment)
+        self._sequence += 1
+        self._segments.append(segment)
+        self._generations[segment] = generation
+        self.nbytes += segment.stat().st_size
+        return True
+
+    def peek(self, max_bytes: int) -> Optional[tuple[list[Path], str, pa.Table, dict[tuple[str, int], int]]]:
+        """
+        oldest segments of the same lake table (up to max_bytes, at least one)
+        merged into one arrow table for a bulk insert
+        """
+        if not self._segments:
+            return None
+        segments, tables, offsets, size, target_table = [], [], {}, 0, None
+        for segment in self._segments:
+            segment_size = segment.stat().st_size
+            if segments and size + segment_size > max_bytes:
+                break
+            with pa.memory_map(str(segment), "r") as source:
+                table = ipc.open_file(source).read_all()
+            segment_table = table.schema.metadata[_TABLE_KEY].decode()
+            if target_table is not None and segment_table != target_table:
+                break
+            target_table = segment_table
+            offsets.update(_decode_offsets(table.schema.metadata[_OFFSETS_KEY]))
+            tables.append(table.replace_schema_metadata(None))
+            segments.append(segment)
+            size += segment_size
+        return segments, target_table, pa.concat_tables(tables, promote_options="permissive"), offsets
+
+    def discard(self, stale: Callable[[dict[tuple[str, int], int], int], bool]) -> int:
+        """remove the segments holding messages of partitions revoked from this consumer (`stale(offsets, generation)`), returns how many"""
+        dropped = []
+        for segment in self._segments:
+            # only the schema (with the metadata) is read
+            with pa.memory_map(str(segment), "r") as source:
+                offsets = _decode_offsets(ipc.open_file(source).schema.metadata[_OFFSETS_KEY])
+            if stale(offsets, self._generations.get(segment, 0)):
+                dropped.append(segment)
+        self.pop(dropped)
+        return len(dropped)
+
+    def pop(self, segments: list[Path]) -> None:
+        """remove drained segments (call only after their lake write committed)"""
+        for segment in segments:
+            self.nbytes -= segment.stat().st_size
+            segment.unlink()
+            self._segments.remove(segment)
+            self._generations.pop(segment, None)
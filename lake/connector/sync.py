@@ -0,0 +1,228 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import duckdb
+from duckdb import DuckDBPyConnection
+
+from lake.connector.layout import TableLayout
+from lake.util.conf_loader import PgCnn, SyncCnf, SyncTableCnf
+from lake.util.logger import logger
+
+_INTEGER_TYPES = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT"}
+
+
+@dataclass
+class Chunk:
+    """rows of a sync run with `column` in [low, high] (the whole run when low/high are None)"""
+    column: str
+    low: Optional[int] = None
+    high: Optional[int] = None
+
+
+@dataclass
+class TableSync:
+    """what one run copied of a table, `watermark` only moves once every chunk is committed"""
+    source: str
+    target: str
+    previous_watermark: Optional[str] = None
+    watermark: Optional[str] = None
+    chunks: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class SyncReport:
+    tables: List[TableSync] = field(default_factory=list)
+
+    @property
+    def failed(self) -> List[TableSync]:
+        return [table for table in self.tables if table.error]
+
+    def summary(self) -> str:
+        lines = ["sync report"]
+        for table in self.tables:
+            line = (
+                f"  {table.source} -> {table.target}: {table.rows} rows in {table.chunks} chunks {table.seconds:.2f}s"
+                f" (watermark {table.previous_watermark} -> {table.watermark})"
+            )
+            lines.append(line + (f" FAILED: {table.error}" if table.error else ""))
+        return "\n".join(lines)
+
+
+class PostgresSync:
+    """
+    incremental copy of SRC postgres tables into the lake.
+    every run reads the rows whose watermark column is past the one stored in the lake (`state_table`, append-only
+    like the ingest checkpoints) up to the max value seen when the run starts, splits them into key ranges and
+    copies the ranges in parallel, each one replacing its rows in a single lake transaction. a chunk is idempotent
+    (its rows are deleted before they are inserted) so a failed run is simply repeated, the watermark only moves
+    once every chunk of a table is committed.
+    """
+    def __init__(self, connection: DuckDBPyConnection, lake_alias: str, sources: Dict[str, PgCnn], settings: SyncCnf, layout: Optional[TableLayout] = None):
+        self.connection = connection
+        self.lake_alias = lake_alias
+        self.sources = sources
+        self.settings = settings
+        self.layout = layout
+        self.state_table = f"{lake_alias}.{settings.state_table}"
+
+    def ensure_state(self) -> None:
+        self.connection.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.state_table} (
+                source VARCHAR,
+                target VARCHAR,
+                watermark_column VARCHAR,
+                watermark VARCHAR,
+                rows BIGINT,
+                synced_at TIMESTAMP WITH TIME ZONE
+            );"""
+        )
+
+    def last_watermark(self, source: str, target: str) -> Optional[str]:
+        row = self.connection.execute(
+            # arg_max_null: the NULL watermark written by a --full run means "start over", arg_max would skip it
+            f"SELECT arg_max_null(watermark, synced_at) FROM {self.state_table} WHERE source = ? AND target = ?;",
+            [source, target],
+        ).fetchone()
+        return row[0] if row else None
+
+    def source_name(self, cfg: SyncTableCnf) -> str:
+        if cfg.source not in self.sources:
+            raise KeyError(f"{cfg.source} is not a SRC.postgres alias")
+        return f"{cfg.source}.{self.sources[cfg.source].schema}.{cfg.table}"
+
+    def _filter(self, cfg: SyncTableCnf, watermark_type: str, previous: Any, high: Any, chunk: Chunk) -> tuple[str, list]:
+        conditions, parameters = [f"{cfg.watermark} <= CAST(? AS {watermark_type})"], [high]
+        if previous is not None:
+            conditions.append(f"{cfg.watermark} > CAST(? AS {watermark_type})")
+            parameters.append(previous)
+        if chunk.low is not None:
+            conditions.append(f"{chunk.column} BETWEEN ? AND ?")
+            parameters += [chunk.low, chunk.high]
+        return " AND ".join(conditions), parameters
+
+    def plan(self, cfg: SyncTableCnf, source: str, previous: Optional[str]) -> tuple[list[Chunk], str, Any, int]:
+        """chunks of the rows changed since `previous`, the watermark column type, its max value and the row count"""
+        column = cfg.key or cfg.watermark
+        types = {
+            name: column_type
+            for name, column_type, *_ in self.connection.execute(
+                f"DESCRIBE SELECT {cfg.watermark}, {column} FROM {source};"
+            ).fetchall()
+        }
+        watermark_type = types[cfg.watermark]
+        condition = f"WHERE {cfg.watermark} > CAST(? AS {watermark_type})" if previous is not None else ""
+        count, low, high, watermark = self.connection.execute(
+            f"SELECT count(*), min({column}), max({column}), max({cfg.watermark}) FROM {source} {condition};",
+            [previous] if previous is not None else [],
+        ).fetchone()
+        if not count:
+            return [], watermark_type, None, 0
+        chunks = max(math.ceil(count / cfg.chunk_rows), 1)
+        if chunks == 1 or types[column] not in _INTEGER_TYPES:
+            # only integer ranges can be split without reading the keys, anything else is copied in one chunk
+            return [Chunk(column)], watermark_type, watermark, count
+        step = math.ceil((high - low + 1) / chunks)
+        ranges = [Chunk(column, start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+        return ranges, watermark_type, watermark, count
+
+    def _copy(self, cfg: SyncTableCnf, source: str, target: str, replace: bool, filter_sql: str, parameters: list) -> int:
+        cursor = self.connection.cursor()
+        try:
+            rows = cursor.execute(f"SELECT * FROM {source} WHERE {filter_sql};", parameters).fetch_arrow_table()
+            if rows.num_rows == 0:
+                return 0
+            cursor.register("sync_chunk", rows)
+            for attempt in range(1, self.settings.attempts + 1):
+                cursor.execute("BEGIN TRANSACTION;")
+                try:
+                    if replace and cfg.key:
+                        cursor.execute(f"DELETE FROM {target} WHERE {cfg.key} IN (SELECT {cfg.key} FROM sync_chunk);")
+                    elif replace:
+                        # append-only tables: the watermark range of the chunk identifies its rows
+                        cursor.execute(f"DELETE FROM {target} WHERE {filter_sql};", parameters)
+                    order_sql = self.layout.order_by(cfg.target or cfg.table, rows.column_names) if self.layout else ""
+                    cursor.execute(f"INSERT INTO {target} SELECT * FROM sync_chunk{order_sql};")
+                    cursor.execute("COMMIT;")
+                    return rows.num_rows
+                except duckdb.TransactionException as conflict:
+                    cursor.execute("ROLLBACK;")
+                    if attempt == self.settings.attempts:
+                        raise
+                    logger.warning(f"chunk of {target} conflicted (attempt {attempt}), retrying: {conflict}")
+                    time.sleep(0.1 * attempt)
+                except Exception:
+                    cursor.execute("ROLLBACK;")
+                    raise
+        finally:
+            cursor.close()
+
+    def sync_table(self, cfg: SyncTableCnf, full: bool = False) -> TableSync:
+        started = time.monotonic()
+        target = f"{self.lake_alias}.{cfg.target or cfg.table}"
+        result = TableSync(f"{cfg.source}.{cfg.table}", target)
+        try:
+            source = self.source_name(cfg)
+            if full:
+                self.connection.execute(f"DROP TABLE IF EXISTS {target};")
+                # an empty watermark makes the next run start over too when this one fails halfway
+                self.connection.execute(
+                    f"INSERT INTO {self.state_table} VALUES (?, ?, ?, NULL, 0, now());", [result.source, target, cfg.watermark]
+                )
+            else:
+                result.previous_watermark = self.last_watermark(result.source, target)
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS {target} AS SELECT * FROM {source} LIMIT 0;")
+            if self.layout is not None:
+                self.layout.apply(cfg.target or cfg.table)
+            chunks, watermark_type, high, count = self.plan(cfg, source, result.previous_watermark)
+            result.chunks = len(chunks)
+            if not chunks:
+                result.watermark = result.previous_watermark
+                logger.info(f"{target} is up to date (watermark {result.watermark})")
+                return result
+            logger.info(f"syncing {count} rows of {source} into {target} in {len(chunks)} chunks")
+            # chunks of an empty target (first copy) only append
+            replace = self.connection.execute(f"SELECT EXISTS (SELECT 1 FROM {target});").fetchone()[0]
+            with ThreadPoolExecutor(max_workers=self.settings.workers, thread_name_prefix="sync") as executor:
+                futures = [
+                    executor.submit(
+                        self._copy, cfg, source, target, replace,
+                        *self._filter(cfg, watermark_type, result.previous_watermark, high, chunk),
+                    )
+                    for chunk in chunks
+                ]
+                rows, errors = 0, []
+                for future in futures:
+                    try:
+                        rows += future.result()
+                    except Exception as fail:
+                        errors.append(fail)
+            result.rows = rows
+            if errors:
+                raise errors[0]
+            self.connection.execute(
+                f"INSERT INTO {self.state_table} VALUES (?, ?, ?, CAST(? AS VARCHAR), ?, now());",
+                [result.source, target, cfg.watermark, high, rows],
+            )
+            result.watermark = self.last_watermark(result.source, target)
+        except Exception as fail:
+            result.error = " ".join(str(fail).split())
+            logger.error(f"sync of {result.source} into {target} failed, its watermark stays at {result.previous_watermark}: {fail}")
+        finally:
+            result.seconds = time.monotonic() - started
+        return result
+
+    def run(self, tables: Optional[List[str]] = None, full: bool = False) -> SyncReport:
+        """sync every configured table (or the ones whose target/table is in `tables`)"""
+        self.ensure_state()
+        report = SyncReport()
+        for cfg in self.settings.tables:
+            if tables and (cfg.target or cfg.table) not in tables:
+                continue
+            report.tables.append(self.sync_table(cfg, full=full))
+        return report
@@ -0,0 +1,145 @@
+import multiprocessing as mp
+import os
+import signal
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from lake.connector.checkpoint import StartPosition
+from lake.util.logger import logger
+
+
+def _run_worker(
+    config_path: str,
+    worker_id: int,
+    decode_mode: Optional[str],
+    pipelined: Optional[bool],
+    start_position: Optional[StartPosition],
+) -> None:
+    """
+    entrypoint of a single ingest worker process.
+    every worker builds its own Connector (own DuckLakeManager connection and insert loop)
+    and joins the shared consumer group, so kafka spreads the topic partitions over the workers.
+    """
+    from lake.connector import load_lake
+
+    os.environ["LAKE_WORKER_ID"] = str(worker_id)
+    # the supervisor owns ctrl+c, workers are only stopped through SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cnn = load_lake("kafka", config_path, decode_mode=decode_mode, start_position=start_position)
+    # only flags the stop: logging (or anything taking a lock) inside the handler can deadlock
+    # when the signal interrupts the main thread while it holds that lock
+    signal.signal(signal.SIGTERM, lambda signum, frame: cnn.request_stop())
+    logger.info(f"ingest worker #{worker_id} started")
+    cnn.attach(pipelined=pipelined)
+    if cnn.stopped:
+        logger.info(f"ingest worker #{worker_id} stopped by SIGTERM")
+    logger.info(f"ingest worker #{worker_id} drained and exited")
+
+
+@dataclass
+class WorkerSlot:
+    worker_id: int
+    process: mp.Process = None
+    restarts: int = 0
+    started_at: float = 0.0
+    restart_at: float = 0.0
+    # exited on its own with code 0, it is not restarted
+    done: bool = False
+
+
+class IngestSupervisor:
+    """
+    runs N `lake attach` workers inside one consumer group, restarts the ones that crash
+    and drains all of them (SIGTERM -> consumer close) when the supervisor is stopped.
+    """
+    def __init__(
+        self,
+        config_path: str,
+        workers: int,
+        decode_mode: Optional[str] = None,
+        pipelined: Optional[bool] = None,
+        start_position: Optional[StartPosition] = None,
+        drain_timeout: float = 60.0,
+        max_backoff: float = 30.0,
+    ):
+        self.config_path = config_path
+        self.decode_mode = decode_mode
+        self.pipelined = pipelined
+        # shared by every worker (and restart) so a backfill is applied once per partition for the whole run
+        self.start_position = start_position
+        self.drain_timeout = drain_timeout
+        self.max_backoff = max_backoff
+        # spawn keeps duckdb/librdkafka state of the parent out of the workers
+        self._ctx = mp.get_context("spawn")
+        self._slots = [WorkerSlot(worker_id=i) for i in range(workers)]
+        self._stopping = False
+
+    def _start(self, slot: WorkerSlot) -> None:
+        slot.process = self._ctx.Process(
+            target=_run_worker,
+            args=(self.config_path, slot.worker_id, self.decode_mode, self.pipelined, self.start_position),
+            name=f"lake-attach-{slot.worker_id}",
+        )
+        slot.process.start()
+        slot.started_at = time.monotonic()
+        logger.info(f"started ingest worker #{slot.worker_id} (pid={slot.process.pid})")
+
+    def _handle_signal(self, signum, frame) -> None:
+        # logged by run() once the loop exits, never inside the handler
+        self._stopping = True
+
+    def _supervise(self, slot: WorkerSlot) -> None:
+        now = time.monotonic()
+        if slot.done or self._stopping:
+            return
+        if slot.restart_at:
+            if now >= slot.restart_at:
+                slot.restart_at = 0.0
+                self._start(slot)
+            return
+        if slot.process.is_alive():
+            return
+        if slot.process.exitcode == 0:
+            logger.info(f"ingest worker #{slot.worker_id} finished")
+            slot.done = True
+            return
+        # a worker that stayed up for a while is considered healthy again
+        if now - slot.started_at > self.max_backoff * 2:
+            slot.restarts = 0
+        backoff = min(self.max_backoff, 2 ** slot.restarts)
+        logger.error(f"ingest worker #{slot.worker_id} exited with code {slot.process.exitcode} (restarting in {backoff}s)")
+        slot.restarts += 1
+        slot.restart_at = now + backoff
+
+    def drain(self) -> None:
+        """stop every worker gracefully and force-kill the ones that exceed drain_timeout."""
+        for slot in self._slots:
+            if slot.process and slot.process.is_alive():
+                slot.process.terminate()
+        deadline = time.monotonic() + self.drain_timeout
+        for slot in self._slots:
+            if slot.process is None:
+                continue
+            slot.process.join(max(0.0, deadline - time.monotonic()))
+            if slot.process.is_alive():
+                logger.error(f"ingest worker #{slot.worker_id} did not drain in {self.drain_timeout}s (killing)")
+                slot.process.kill()
+                slot.process.join()
+        logger.info("all ingest workers stopped")
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        logger.warning(f"starting {len(self._slots)} ingest workers with config {self.config_path}")
+        for slot in self._slots:
+            self._start(slot)
+        try:
+            while not self._stopping and not all(slot.done for slot in self._slots):
+                for slot in self._slots:
+                    self._supervise(slot)
+                time.sleep(0.5)
+        finally:
+            if self._stopping:
+                logger.warning(f"supervisor received a stop signal, draining {len(self._slots)} workers...")
+            self.drain()
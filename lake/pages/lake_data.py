@@ -6,7 +6,7 @@ import numpy as np
 
 class Connector(DuckLakeManager):
     def __init__(self,config_path):
-        super(Connector,self).__init__(config_path)
+        super(Connector,self).__init__(config_path,shared=True)
         
     def deploy(self):
         # connect to your ducklake
@@ -18,7 +18,8 @@ class Connector(DuckLakeManager):
         # result = self.duckdb_connection.execute(read_from_src_pg)
         # print(result.df())
         read_from_ducklake = f"select * from lake.awesome_table;" 
-        result = self.duckdb_connection.execute(read_from_ducklake).fetch_df()
+        # served from the query cache until awesome_table gets a new snapshot
+        result = self.query(read_from_ducklake).to_pandas()
         print(result.shape)
         result.sort_values('region',inplace=True)
 
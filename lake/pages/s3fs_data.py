@@ -6,7 +6,7 @@ import numpy as np
 
 class Connector(DuckLakeManager):
     def __init__(self,config_path):
-        super(Connector,self).__init__(config_path)
+        super(Connector,self).__init__(config_path,shared=True)
         
     def deploy(self):
         # connect to your ducklake
@@ -1,7 +1,16 @@
+import importlib
+import io
+import json
 import os
+import threading
+import time
+from concurrent.futures import CancelledError
 from pathlib import Path
 import panel as pn
-from lake.pages import load_page
+from lake.render_pool import RenderPool
+from lake.util.conf_loader import Configs
+from lake.util.logger import logger
+from lake.util.metrics import start_metrics
 
 # Ensure Panel extensions are loaded; sizing_mode will make things responsive
 pn.extension('ipywidgets', sizing_mode='stretch_both')
@@ -13,6 +22,20 @@ pn.extension('ipywidgets', sizing_mode='stretch_both')
 # Directory containing page modules
 PAGES_DIR = Path('.') / 'lake' / 'pages'
 IGNORE_FILES = {'__pycache__', '__init__.py'}
+# seconds a rendered page is served from cache, a page module can override it with CACHE_TTL = <seconds>
+DEFAULT_TTL = float(os.getenv("LAKE_PAGE_TTL", "300"))
+CONFIG_PATH = os.getenv("LAKE_CONFIG","./resources/config.local.yml")
+_render_pool = None
+def get_render_pool():
+    """Pool rendering the pages in worker processes (own pyplot state and warm lake connection each), started on first use."""
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = RenderPool(
+            CONFIG_PATH,
+            processes=int(os.getenv("LAKE_RENDER_PROCESSES", "2")),
+            timeout=float(os.getenv("LAKE_RENDER_TIMEOUT", "60")),
+        )
+    return _render_pool
 def discover_modules():
     """Return list of available page module names (without .py)."""
     if not PAGES_DIR.exists():
@@ -23,18 +46,19 @@ def discover_modules():
         if fname.is_file() and fname.suffix == '.py' and fname.name not in IGNORE_FILES
     )
 
-def render_dashboard(module_name):
-    """Render a dashboard page by name. Expects instance.deploy() -> Matplotlib Figure."""
+def to_card(module_name, future):
+    """Card of a finished render. Expects a RenderedPage (PNG of a Matplotlib Figure or Bokeh json)."""
     try:
-
-        config_path = os.getenv("LAKE_CONFIG","./resources/config.local.yml")
-        print(f"LOADING MODULE {module_name} {config_path}")
-
-        instance = load_page(module_name, config_path)
-        fig = instance.deploy()
-        pane = pn.pane.Matplotlib(fig, tight=True, sizing_mode='stretch_both')
-        card = pn.Card(pane, title=f"{module_name}", sizing_mode='stretch_both')
-        return card
+        page = future.result()
+        if page.kind == 'png':
+            pane = pn.pane.PNG(io.BytesIO(page.payload), sizing_mode='stretch_both')
+        else:
+            from bokeh.document import Document
+            item = json.loads(page.payload)
+            pane = pn.pane.Bokeh(Document.from_json(item['doc']).get_model_by_id(item['root_id']), sizing_mode='stretch_both')
+        return pn.Card(pane, title=f"{module_name}", sizing_mode='stretch_both')
+    except CancelledError:
+        raise
     except Exception as exc:
         # Return a friendly error pane if a page fails to render
         return pn.Card(
@@ -43,9 +67,91 @@ def render_dashboard(module_name):
             sizing_mode='stretch_both'
         )
 
-# Discover and pre-render dashboards (keeps original behavior of pre-loading)
+def render_dashboard(module_name):
+    """Render a dashboard page by name (blocking). Expects instance.deploy() -> Matplotlib Figure or Bokeh model."""
+    logger.debug(f"loading module {module_name} ({CONFIG_PATH})")
+    return to_card(module_name, get_render_pool().submit(module_name))
+
+def placeholder(module_name):
+    """Card shown while a page renders for the first time."""
+    return pn.Card(
+        pn.Column(
+            pn.indicators.LoadingSpinner(value=True, size=40),
+            pn.pane.Markdown(f"rendering `{module_name}` ..."),
+        ),
+        title=f"{module_name}",
+        sizing_mode='stretch_both'
+    )
+
+class PageCache:
+    """
+    renders pages lazily (on first selection) through the render pool and keeps each card for its TTL.
+    """
+    def __init__(self, default_ttl=DEFAULT_TTL):
+        self.default_ttl = default_ttl
+        self._cards = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def ttl(self, module_name):
+        try:
+            return float(getattr(importlib.import_module(f"lake.pages.{module_name}"), "CACHE_TTL", self.default_ttl))
+        except Exception:
+            return self.default_ttl
+
+    def _rendered(self, module_name, future, on_ready):
+        try:
+            card = to_card(module_name, future)
+        except CancelledError:
+            return
+        with self._lock:
+            if self._pending.get(module_name) is not future:
+                return
+            del self._pending[module_name]
+            self._cards[module_name] = (card, time.monotonic() + self.ttl(module_name))
+        if on_ready is not None:
+            on_ready(module_name)
+
+    def get(self, module_name, on_ready=None):
+        """
+        cached card of a page (possibly stale) or None, a missing or expired page is (re)rendered
+        in the background and `on_ready(module_name)` is called once it is done.
+        """
+        future = None
+        with self._lock:
+            card, expires_at = self._cards.get(module_name, (None, 0.0))
+            if time.monotonic() >= expires_at and module_name not in self._pending:
+                logger.debug(f"loading module {module_name} ({CONFIG_PATH})")
+                future = self._pending[module_name] = get_render_pool().submit(module_name)
+        if future is not None:
+            future.add_done_callback(lambda done: self._rendered(module_name, done, on_ready))
+        return card
+
+    def cached(self, module_name):
+        """cached card of a page (possibly stale) without scheduling a render"""
+        with self._lock:
+            return self._cards.get(module_name, (None, 0.0))[0]
+
+    def invalidate(self, module_name=None):
+        """expire one page (or every page) and cancel its running render, the next get renders it again"""
+        with self._lock:
+            names = [module_name] if module_name else list(set(self._cards) | set(self._pending))
+            for name in names:
+                if name in self._cards:
+                    self._cards[name] = (self._cards[name][0], 0.0)
+            pending = [self._pending.pop(name) for name in names if name in self._pending]
+        for future in pending:
+            get_render_pool().cancel(future)
+
+    def forget(self, keep):
+        """drop the cards of pages that no longer exist"""
+        with self._lock:
+            for name in set(self._cards) - set(keep):
+                del self._cards[name]
+
+# pages are only discovered here, nothing is rendered until a page is selected
 available_modules = discover_modules()
-dashboards = {name: render_dashboard(name) for name in available_modules}
+page_cache = PageCache()
 
 # Sidebar widgets
 sidebar_select = pn.widgets.Select(
@@ -62,32 +168,39 @@ sidebar_header = pn.Column(
     sizing_mode='stretch_width'
 )
 
-# Refresh button to re-discover and re-render modules (useful for dev)
+# Refresh button to re-discover the page modules (useful for dev)
 refresh_button = pn.widgets.Button(name='Refresh Pages', button_type='primary', sizing_mode='stretch_width')
+# Re-render only the selected page
+refresh_page_button = pn.widgets.Button(name='Refresh Page', button_type='default', sizing_mode='stretch_width')
 
 def refresh_pages(event=None):
-    global available_modules, dashboards
+    global available_modules
     available_modules = discover_modules()
+    page_cache.forget(available_modules)
     sidebar_select.options = available_modules
-    dashboards = {name: render_dashboard(name) for name in available_modules}
-    if sidebar_select.value and sidebar_select.value in dashboards:
+    if sidebar_select.value and sidebar_select.value in available_modules:
         view_dashboard(type('Event', (), {'new': sidebar_select.value})())
     elif available_modules:
         sidebar_select.value = available_modules[0]
 
+def refresh_page(event=None):
+    if sidebar_select.value:
+        page_cache.invalidate(sidebar_select.value)
+        view_dashboard(type('Event', (), {'new': sidebar_select.value})())
+
 refresh_button.on_click(refresh_pages)
+refresh_page_button.on_click(refresh_page)
 
 # Assemble sidebar into a card
 sidebar_card = pn.Card(
-    pn.Column(sidebar_header, sidebar_select, refresh_button),
+    pn.Column(sidebar_header, sidebar_select, refresh_page_button, refresh_button),
     title="Navigation",
     sizing_mode='stretch_width',
     collapsible=False
 )
 
-# Main dashboard panel with initial content
-initial = dashboards.get(sidebar_select.value) if sidebar_select.value else pn.pane.Markdown("No dashboards found.")
-dashboard_panel = pn.Column(initial, sizing_mode='stretch_both')
+# Main dashboard panel, filled by view_dashboard once the template is served
+dashboard_panel = pn.Column(pn.pane.Markdown("No dashboards found."), sizing_mode='stretch_both')
 
 # Status footer
 status = pn.Row(
@@ -97,14 +210,34 @@ status = pn.Row(
 )
 
 # Watcher to update the main panel
+def show_dashboard(selected):
+    """put the cached card of `selected` (or a placeholder while it renders) into the main panel"""
+    if selected != sidebar_select.value:
+        return
+    card = page_cache.cached(selected)
+    dashboard_panel[:] = [card if card is not None else placeholder(selected)]
+
 def view_dashboard(event):
     selected = event.new
-    if selected in dashboards:
-        dashboard_panel[:] = [dashboards[selected]]
-    else:
+    if selected not in available_modules:
         dashboard_panel[:] = [pn.pane.Markdown("Dashboard not found.", style={'color': '#FFCDD2'})]
+        return
+    doc = pn.state.curdoc
+
+    def on_ready(module_name):
+        # called from the render thread, hand the update back to the session's event loop
+        if doc is not None:
+            doc.add_next_tick_callback(lambda: show_dashboard(module_name))
+        else:
+            show_dashboard(module_name)
+
+    card = page_cache.get(selected, on_ready=on_ready)
+    dashboard_panel[:] = [card if card is not None else placeholder(selected)]
 
 sidebar_select.param.watch(view_dashboard, 'value')
+# start the first render in the background, the server comes up without waiting for it
+if sidebar_select.value:
+    view_dashboard(type('Event', (), {'new': sidebar_select.value})())
 
 
 template = pn.template.MaterialTemplate(
@@ -115,6 +248,11 @@ template = pn.template.MaterialTemplate(
 )
 
 def serve():
+    # metrics of the server process (page renders), the render workers serve their own ones
+    try:
+        start_metrics(Configs(CONFIG_PATH).Lake.metrics)
+    except Exception as fail:
+        logger.error(f"cannot start the metrics endpoint: {fail}")
     # Expose the template as servable and run the server
     template.servable(title='BI as Code panel')
     pn.serve(template, title='BI as Code panel',address='0.0.0.0',port=5480, show=False)
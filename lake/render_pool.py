@@ -0,0 +1,183 @@
+import io
+import json
+import multiprocessing as mp
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+from lake.util.logger import logger
+from lake.util.metrics import metrics, start_metrics
+
+RENDER_SECONDS = metrics.histogram("lake_page_render_seconds", "page render through the pool, queueing excluded", ("page", "outcome"))
+
+
+@dataclass
+class RenderedPage:
+    """output of a page render, a PNG image or a Bokeh json_item document"""
+    module_name: str
+    kind: Literal["png", "bokeh"]
+    payload: bytes | str
+
+
+def render_page(module_name: str, config_path: str) -> RenderedPage:
+    """run `deploy()` of a page and serialize the figure it returns"""
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+
+    from lake.pages import load_page
+
+    try:
+        figure = load_page(module_name, config_path).deploy()
+        if isinstance(figure, Figure):
+            image = io.BytesIO()
+            figure.savefig(image, format="png", bbox_inches="tight")
+            return RenderedPage(module_name, "png", image.getvalue())
+        from bokeh.embed import json_item
+        return RenderedPage(module_name, "bokeh", json.dumps(json_item(figure)))
+    finally:
+        # the next page of this worker starts from a clean pyplot state
+        plt.close("all")
+
+
+def _serve(config_path: str, connection, slot_id: int = 0) -> None:
+    """entrypoint of a render worker process, renders one page per request received on `connection`"""
+    import matplotlib
+    matplotlib.use("Agg")
+
+    # the pool owns ctrl+c, workers are stopped by terminating them
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        # attach once per worker, pages use the pooled connection (DuckLakeManager(shared=True))
+        from lake.connector.pool import manager_pool
+        manager_pool.cursor(config_path)
+    except (Exception, SystemExit) as fail:
+        logger.error(f"render worker could not warm up the lake connection: {fail}")
+    try:
+        # the queries of the pages run here, worker N serves them on Lake.metrics.port + 1 + N
+        from lake.util.conf_loader import Configs
+        start_metrics(Configs(config_path).Lake.metrics, port_offset=1 + slot_id)
+    except Exception as fail:
+        logger.error(f"render worker could not start its metrics endpoint: {fail}")
+    while True:
+        try:
+            module_name = connection.recv()
+        except EOFError:
+            return
+        try:
+            connection.send(("ok", render_page(module_name, config_path)))
+        except (Exception, SystemExit) as fail:
+            connection.send(("error", f"{type(fail).__name__}: {fail}"))
+
+
+@dataclass
+class _RenderSlot:
+    slot_id: int
+    process: mp.Process = None
+    connection: object = None
+    running: Optional[Future] = None
+    cancelled: bool = False
+
+
+class RenderPool:
+    """
+    renders dashboard pages in worker processes instead of the server thread.
+    every worker keeps a warm lake connection and its own pyplot state, so pages render in parallel
+    without sharing matplotlib globals. a render running past `timeout` (or cancelled) kills its worker,
+    which is replaced by a fresh one.
+    """
+    def __init__(self, config_path: str, processes: int = 2, timeout: float = 60.0):
+        self.config_path = config_path
+        self.timeout = timeout
+        self._ctx = mp.get_context("spawn")
+        self._tasks: queue.Queue = queue.Queue()
+        self._slots = [_RenderSlot(slot_id=i) for i in range(processes)]
+        self._lock = threading.Lock()
+        self._closed = False
+        for slot in self._slots:
+            threading.Thread(target=self._dispatch, args=(slot,), name=f"page-render-{slot.slot_id}", daemon=True).start()
+
+    def _start(self, slot: _RenderSlot) -> None:
+        parent, child = self._ctx.Pipe()
+        slot.process = self._ctx.Process(target=_serve, args=(self.config_path, child, slot.slot_id), name=f"lake-render-{slot.slot_id}", daemon=True)
+        slot.process.start()
+        child.close()
+        slot.connection = parent
+        logger.info(f"started render worker #{slot.slot_id} (pid={slot.process.pid})")
+
+    def _kill(self, slot: _RenderSlot) -> None:
+        if slot.process is not None and slot.process.is_alive():
+            slot.process.kill()
+            slot.process.join()
+        if slot.connection is not None:
+            slot.connection.close()
+        slot.process, slot.connection = None, None
+
+    def _dispatch(self, slot: _RenderSlot) -> None:
+        # workers start (and attach) in the background, the server does not wait for them
+        self._start(slot)
+        while not self._closed:
+            task = self._tasks.get()
+            if task is None:
+                break
+            module_name, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                slot.running, slot.cancelled = future, False
+            started, outcome = time.perf_counter(), "error"
+            try:
+                if slot.process is None or not slot.process.is_alive():
+                    self._kill(slot)
+                    self._start(slot)
+                slot.connection.send(module_name)
+                if not slot.connection.poll(self.timeout):
+                    raise TimeoutError(f"rendering {module_name} took longer than {self.timeout}s")
+                status, payload = slot.connection.recv()
+            except TimeoutError as fail:
+                logger.error(f"{fail}, restarting render worker #{slot.slot_id}")
+                self._kill(slot)
+                future.set_exception(fail)
+            except (EOFError, OSError) as fail:
+                self._kill(slot)
+                if slot.cancelled:
+                    logger.info(f"render of {module_name} cancelled")
+                    future.set_exception(CancelledError(module_name))
+                else:
+                    logger.error(f"render worker #{slot.slot_id} died while rendering {module_name}: {fail}")
+                    future.set_exception(RuntimeError(f"render worker died while rendering {module_name}"))
+            else:
+                if status == "ok":
+                    outcome = "ok"
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RuntimeError(payload))
+            finally:
+                RENDER_SECONDS.observe(time.perf_counter() - started, page=module_name, outcome=outcome)
+                with self._lock:
+                    slot.running = None
+
+    def submit(self, module_name: str) -> Future:
+        """queue a page render, the future resolves to a RenderedPage"""
+        future = Future()
+        self._tasks.put((module_name, future))
+        return future
+
+    def cancel(self, future: Future) -> None:
+        """cancel a queued render or kill the worker running it"""
+        if future.cancel():
+            return
+        with self._lock:
+            for slot in self._slots:
+                if slot.running is future and slot.process is not None:
+                    slot.cancelled = True
+                    slot.process.kill()
+
+    def close(self) -> None:
+        self._closed = True
+        for slot in self._slots:
+            self._tasks.put(None)
+            self._kill(slot)
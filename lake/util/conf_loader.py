@@ -1,6 +1,6 @@
 import yaml
 from pydantic import BaseModel, ConfigDict, computed_field,SecretStr,Field
-from typing import Literal,Union,Dict
+from typing import Literal,Union,Dict,List,Optional
 from lake.util.logger import logger
 import os
 class PgCnn(BaseModel):
@@ -88,27 +88,143 @@ class BrokerCnn(BaseModel):
 class SRC(BaseModel):
     storage: Dict[str, StorageCnn] = {}
     postgres: Dict[str, PgCnn] = {}
+    # sources are attached when a query first references them, these ones are attached (in parallel) upfront
+    preattach: List[str] = []
     
 class DEST(BaseModel):
     catalog: PgCnn
     storage: StorageCnn
 
+class MaintenanceCnf(BaseModel):
+    interval_minutes: int = 60
+    target_file_size: str = "128MB"
+    snapshot_retention: str = "7 days"
+    file_retention: str = "1 day"
+
+class LayoutCnf(BaseModel):
+    # partition keys, plain columns or year(col) / month(col) / day(col) / hour(col), [] removes the partitioning
+    partition_by: Optional[List[str]] = None
+    sort_by: List[str] = [] # ingested batches are written in this order (e.g. ["tenant", "event_time DESC"])
+    target_file_size: Optional[str] = None # also used by `lake maintain` when merging files of the table
+    row_group_size: Optional[int] = None # rows per parquet row group
+    compression: Optional[Literal["zstd", "snappy", "gzip", "lz4", "brotli", "uncompressed"]] = None
+    compression_level: Optional[int] = None
+    inlining_row_limit: Optional[int] = None # inserts of at most this many rows are kept in the catalog (0 disables inlining)
+
+class InliningCnf(BaseModel):
+    row_limit: Optional[int] = None # catalog wide inlining threshold (ATTACH DATA_INLINING_ROW_LIMIT), see layout for per table ones
+    flush_interval_seconds: float = 300 # `lake attach` flushes inlined rows to parquet this often (0 disables)
+    flush_min_rows: int = 10000 # tables with fewer inlined rows wait for the next interval (explicit flushes take every row)
+
+class QueryCacheCnf(BaseModel):
+    enabled: bool = True
+    max_bytes: int = 256 * 1024 * 1024
+    directory: Optional[str] = None # optional disk tier for results evicted from memory
+    disk_max_bytes: int = 2 * 1024 * 1024 * 1024
+
+class HealthCnf(BaseModel):
+    timeout_seconds: float = 5.0 # per attempt of a probe
+    attempts: int = 3
+    backoff_seconds: float = 0.5 # first retry delay (full jitter), doubled up to max_backoff_seconds
+    max_backoff_seconds: float = 5.0
+    deadline_seconds: float = 30.0 # overall bound of the whole check
+    fail_fast: bool = True # stop as soon as a required (DEST) endpoint is given up on
+
+class ExtensionsCnf(BaseModel):
+    directory: Optional[str] = None # local extension cache (duckdb extension_directory), fill it with `lake extensions`
+    repository: Optional[str] = None # extension repository url or local path used for INSTALL/autoinstall
+    extra: List[str] = [] # extensions needed beside the ones of the configured sections (e.g. excel, avro)
+
+class SyncTableCnf(BaseModel):
+    source: str # SRC.postgres alias
+    table: str # table in the source's schema
+    target: Optional[str] = None # lake table, defaults to `table`
+    watermark: str = "updated_at" # only rows with a greater value than the last sync are copied (updated_at, id, ...)
+    key: Optional[str] = None # primary key, synced rows replace their previous version (rows are appended without it)
+    chunk_rows: int = 250_000 # rows per chunk, chunks are key (or watermark) ranges copied in parallel
+
+class SyncCnf(BaseModel):
+    tables: List[SyncTableCnf] = []
+    workers: int = 4 # chunks copied at the same time
+    attempts: int = 3 # a chunk whose lake commit conflicts is retried
+    state_table: str = "sync_watermarks"
+
+class RegisterCnf(BaseModel):
+    batch_files: int = 256 # files registered per lake transaction (one snapshot each)
+    workers: int = 8 # batches whose footers are read and registered at the same time
+    attempts: int = 3 # a batch whose lake commit conflicts is retried
+
+class MetricsCnf(BaseModel):
+    enabled: bool = False
+    address: str = "127.0.0.1"
+    port: Optional[int] = 9464 # prometheus endpoint (/metrics) of `lake attach` and `serve`, worker N listens on port + N
+    exporters: List[str] = [] # "package.module:function" hooks called with every sample each export interval
+    export_interval_seconds: float = 15.0
+    statistics_interval_ms: int = 10000 # librdkafka statistics (consumer lag per partition), 0 disables them
+
 class Lake(BaseModel):
     DEST: DEST
     SRC: SRC
+    # per table maintenance settings, the "*" entry applies to every other table and to the catalog wide steps
+    maintenance: Dict[str, MaintenanceCnf] = {}
+    # per table file layout, the "*" entry applies to every other table
+    layout: Dict[str, LayoutCnf] = {}
+    inlining: InliningCnf = InliningCnf()
+    query_cache: QueryCacheCnf = QueryCacheCnf()
+    extensions: ExtensionsCnf = ExtensionsCnf()
+    health: HealthCnf = HealthCnf()
+    sync: SyncCnf = SyncCnf()
+    # `lake register` settings (not `register`, which would shadow BaseModel.register)
+    registration: RegisterCnf = RegisterCnf()
+    metrics: MetricsCnf = MetricsCnf()
+
+
+class PipelineCnf(BaseModel):
+    enabled: bool = False
+    decode_workers: int = 2
+    queue_size: int = 4
+
+class SpillCnf(BaseModel):
+    enabled: bool = False
+    directory: str = "resources/spill"
+    max_bytes: int = 1024 * 1024 * 1024
+    drain_bytes: int = 256 * 1024 * 1024
+    retry_seconds: float = 5.0
+    max_retry_seconds: float = 60.0
+
+class RouteCnf(BaseModel):
+    topic: str # exact topic name or a regex starting with ^
+    table: str
+    key: Optional[str] = None # column receiving the kafka message key
+    max_rows: Optional[int] = None
+    max_bytes: Optional[int] = None
+    max_latency_ms: Optional[int] = None
 
-    
 class BrokerCnn(BaseModel):
     host: str = "127.0.0.1"
     port: int = 5432
     ingest_topics: list = []
-    ingest_table: str
+    ingest_table: Optional[str] = None
+    routes: List[RouteCnf] = []
     group_id: str = ""
     batch_size: int = 1000
+    max_rows: int = 100000
+    max_bytes: int = 64 * 1024 * 1024
+    max_latency_ms: int = 5000
+    decode: Literal["pandas","arrow"] = "pandas"
+    pipeline: PipelineCnf = PipelineCnf()
+    checkpoint_table: str = "ingest_offsets"
+    spill: SpillCnf = SpillCnf()
     @computed_field
     @property
     def url(self) -> str:
         return f"{self.host}:{self.port}"
+    @property
+    def topic_routes(self) -> List[RouteCnf]:
+        """configured routes, or every ingest_topic into ingest_table when there are none"""
+        if self.routes:
+            return self.routes
+        return [RouteCnf(topic=topic, table=self.ingest_table) for topic in self.ingest_topics]
     
 class Configs(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -0,0 +1,148 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from lake.util.metrics import metrics
+
+DROPPED = metrics.counter("lake_log_records_dropped_total", "log records not written", ("reason",))
+
+
+class _Site:
+	__slots__ = ("sample_every", "rate", "burst", "tokens", "updated", "seen", "dropped")
+
+	def __init__(self, sample_every: int, rate: Optional[float], burst: float) -> None:
+		self.sample_every = max(sample_every, 1)
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self.updated = time.monotonic()
+		self.seen = 0
+		self.dropped = 0
+
+
+class SamplingFilter(logging.Filter):
+	"""
+	per call site (file:line) sampling and rate limit, for the filters of a logger in log_config.yml.
+	a site keeps 1 record in `sample_every` and at most `rate_per_second` of those (token bucket of `burst`),
+	records above `max_level` always pass. the next record a site writes carries how many were dropped
+	(`record.dropped`, appended to the message by TruncateFilter).
+	`overrides` maps "file.py" or "file.py:line" to its own sample_every / rate_per_second / burst.
+	"""
+	def __init__(
+		self,
+		sample_every: int = 1,
+		rate_per_second: Optional[float] = None,
+		burst: Optional[float] = None,
+		max_level: str = "WARNING",
+		overrides: Optional[dict] = None,
+	) -> None:
+		super().__init__()
+		self.sample_every = sample_every
+		self.rate_per_second = rate_per_second
+		self.burst = burst
+		self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+		self.overrides = overrides or {}
+		self._sites: dict[tuple[str, int], _Site] = {}
+		self._lock = threading.Lock()
+
+	def _site(self, record: logging.LogRecord) -> _Site:
+		settings = self.overrides.get(f"{record.filename}:{record.lineno}") or self.overrides.get(record.filename) or {}
+		rate = settings.get("rate_per_second", self.rate_per_second)
+		burst = settings.get("burst", self.burst)
+		return _Site(settings.get("sample_every", self.sample_every), rate, burst if burst is not None else max(rate or 1.0, 1.0))
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		if record.levelno > self.max_level:
+			return True
+		key = (record.pathname, record.lineno)
+		with self._lock:
+			site = self._sites.get(key)
+			if site is None:
+				site = self._sites[key] = self._site(record)
+			site.seen += 1
+			if (site.seen - 1) % site.sample_every:
+				site.dropped += 1
+				reason = "sampled"
+			else:
+				if site.rate is not None:
+					now = time.monotonic()
+					site.tokens = min(site.tokens + (now - site.updated) * site.rate, site.burst)
+					site.updated = now
+				if site.rate is None or site.tokens >= 1.0:
+					if site.rate is not None:
+						site.tokens -= 1.0
+					if site.dropped:
+						record.dropped, site.dropped = site.dropped, 0
+					return True
+				site.dropped += 1
+				reason = "rate_limited"
+		DROPPED.inc(reason=reason)
+		return False
+
+
+class TruncateFilter(logging.Filter):
+	"""
+	handler filter rendering the message once and cutting it at `max_length` characters (payloads, whole frames).
+	attached to the handlers, so with the queue enabled it runs on the handler thread instead of the caller.
+	"""
+	def __init__(self, max_length: int = 2000) -> None:
+		super().__init__()
+		self.max_length = max_length
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		# a record goes through every handler, it is only rendered by the first one
+		if getattr(record, "truncated", False):
+			return True
+		try:
+			message = record.getMessage()
+		except Exception:
+			# arguments not matching the format, the handler shows the raw message instead of an error
+			message = str(record.msg)
+		if len(message) > self.max_length:
+			message = f"{message[:self.max_length]}... ({len(message) - self.max_length} more chars)"
+		dropped = getattr(record, "dropped", 0)
+		if dropped:
+			message = f"{message} (+{dropped} similar records dropped)"
+		record.msg, record.args, record.truncated = message, None, True
+		return True
+
+
+class DroppingQueueHandler(QueueHandler):
+	"""
+	hands records to the QueueListener thread without formatting them, a full queue drops the record
+	(counted in lake_log_records_dropped_total) instead of blocking the caller.
+	note: the arguments of a record are rendered later on, they should not be mutated after the call.
+	"""
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		return record
+
+	def enqueue(self, record: logging.LogRecord) -> None:
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			DROPPED.inc(reason="queue_full")
+
+
+class _Listener(QueueListener):
+	def enqueue_sentinel(self) -> None:
+		# blocks until the thread makes room, a full queue still gets flushed at exit
+		self.queue.put(self._sentinel)
+
+
+def start_queue(target: logging.Logger, size: int = 10000) -> Optional[QueueListener]:
+	"""move the handlers of `target` behind a queue drained by a background thread (stopped and flushed at exit)"""
+	handlers = list(target.handlers)
+	if not handlers:
+		return None
+	records: queue.Queue = queue.Queue(maxsize=size)
+	listener = _Listener(records, *handlers, respect_handler_level=True)
+	for handler in handlers:
+		target.removeHandler(handler)
+	target.addHandler(DroppingQueueHandler(records))
+	listener.start()
+	atexit.register(listener.stop)
+	return listener
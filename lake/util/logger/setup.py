@@ -1,21 +1,50 @@
-import logging.config as logconf
 import os
 from logging import Logger, getLogger
 
-import yaml
-
 
 def setup_logging() -> Logger:
 	"""
 	Set up logging config.
 	Returns logger object.
 	"""
+	import logging.config as logconf
+
+	import yaml
+
 	config_path = os.getenv(key="LOG_CONFIG_FILE", default="resources/log_config.yml")
 	logger_name = os.getenv(key="LOGGER_NAME", default="development")
 	with open(file=config_path) as f:
 		config = yaml.safe_load(f)
+	# not a dictConfig key: hand the records of the logger to a background handler thread
+	queue_config = config.pop("queue", None) or {}
+	# file handlers do not create their directory (resources/logs is not part of the repository)
+	for handler in config.get("handlers", {}).values():
+		if handler.get("filename"):
+			os.makedirs(os.path.dirname(handler["filename"]) or ".", exist_ok=True)
 	logconf.dictConfig(config)
-	return getLogger(logger_name)
+	configured = getLogger(logger_name)
+	if queue_config.get("enabled", False):
+		from lake.util.logger.hot_path import start_queue
+		start_queue(configured, queue_config.get("size", 10000))
+	return configured
+
+
+class LazyLogger:
+	"""
+	stand-in for the configured logger, the log config is read on its first use
+	so importing a module that logs does not pay for it.
+	"""
+	def __init__(self) -> None:
+		self._logger = None
+
+	def __getattr__(self, name: str):
+		if self._logger is None:
+			self._logger = setup_logging()
+		attribute = getattr(self._logger, name)
+		if callable(attribute):
+			# later calls find the bound method on the instance and skip this lookup
+			setattr(self, name, attribute)
+		return attribute
 
 
-logger = setup_logging()
+logger = LazyLogger()
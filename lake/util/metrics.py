@@ -0,0 +1,259 @@
+import bisect
+import importlib
+import math
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from lake.util.logger import logger
+
+# seconds, from a fast in-memory insert to a slow snapshot commit on a remote catalog
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+@dataclass(frozen=True)
+class Sample:
+    """one exported value, `name` includes the _bucket/_sum/_count suffix of histogram series"""
+    name: str
+    labels: tuple[tuple[str, str], ...]
+    value: float
+
+
+def _labels_text(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        key + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _value_text(value: float) -> str:
+    """integral values as ints (counters keep every digit), others with full float precision"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[tuple[str, str], ...]:
+        return tuple((name, str(labels.get(name, ""))) for name in self.labelnames)
+
+    def samples(self) -> list[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> list[Sample]:
+        with self._lock:
+            return [Sample(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> list[Sample]:
+        with self._lock:
+            return [Sample(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """cumulative buckets like prometheus histograms, an observation costs one bisect under a lock"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last), sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][index] += 1
+            counts[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list[Sample]:
+        samples = []
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                samples.append(Sample(f"{self.name}_bucket", key + (("le", "+Inf" if bound == math.inf else repr(bound)),), cumulative))
+            samples.append(Sample(f"{self.name}_sum", key, total))
+            samples.append(Sample(f"{self.name}_count", key, cumulative))
+        return samples
+
+
+Exporter = Callable[[list[Sample]], None]
+
+
+class MetricsRegistry:
+    """
+    counters, gauges and histograms of one process, rendered in the prometheus text format by `render`
+    (served by `serve`) and pushed to custom exporters (`add_exporter`) every export interval.
+    """
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._exporters: list[Exporter] = []
+        self._export_thread: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"metric {metric.name} is already registered as a different {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def collect(self) -> list[Sample]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [sample for metric in metrics for sample in metric.samples()]
+
+    def render(self) -> str:
+        """every metric in the prometheus text exposition format (0.0.4)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample.name}{_labels_text(sample.labels)} {_value_text(sample.value)}" for sample in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def add_exporter(self, exporter: Exporter, interval_seconds: float = 15.0) -> None:
+        """call `exporter(samples)` every `interval_seconds` (one background thread for all exporters)"""
+        with self._lock:
+            self._exporters.append(exporter)
+            if self._export_thread is not None:
+                return
+            self._export_thread = threading.Thread(target=self._export_loop, args=(interval_seconds,), name="metrics-export", daemon=True)
+        self._export_thread.start()
+
+    def _export_loop(self, interval_seconds: float) -> None:
+        while True:
+            time.sleep(interval_seconds)
+            samples = self.collect()
+            for exporter in list(self._exporters):
+                try:
+                    exporter(samples)
+                except Exception as fail:
+                    logger.error(f"metrics exporter {getattr(exporter, '__name__', exporter)} failed: {fail}")
+
+    def serve(self, port: int, address: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+        """serve `render()` on http://address:port/metrics from a daemon thread (once per process)"""
+        if self._server is not None:
+            return self._server
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((address, port), Handler)
+        except OSError as fail:
+            logger.error(f"cannot serve metrics on {address}:{port}: {fail}")
+            return None
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"serving metrics on http://{address}:{port}/metrics")
+        return self._server
+
+
+def load_exporter(path: str) -> Exporter:
+    """'package.module:function' -> the exporter function"""
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "export")
+
+
+def start_metrics(settings, port_offset: int = 0) -> None:
+    """start the http endpoint and the configured exporters of Lake.metrics (no-op when disabled)"""
+    if not settings.enabled:
+        return
+    if settings.port:
+        metrics.serve(settings.port + port_offset, settings.address)
+    for path in settings.exporters:
+        try:
+            metrics.add_exporter(load_exporter(path), settings.export_interval_seconds)
+        except (ImportError, AttributeError) as fail:
+            logger.error(f"cannot load metrics exporter {path}: {fail}")
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def import_times(modules: list[str]) -> list[tuple[str, int, int]]:
+    """
+    (module, self_us, cumulative_us) of every module imported by a fresh interpreter importing `modules`,
+    measured with `python -X importtime` so nothing already imported by the caller is hidden.
+    """
+    code = "; ".join(f"import {module}" for module in modules) or "pass"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line.removeprefix("import time:").split("|", 2)
+        # drop the space after the separator, the remaining indentation is the nesting level
+        times.append((module[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def profile_startup(modules: list[str], top: int = 15) -> float:
+    """print the import time of `modules` per top level package, returns the total in seconds"""
+    times = import_times(modules)
+    per_package = defaultdict(int)
+    for module, self_us, _ in times:
+        per_package[module.strip().split(".")[0]] += self_us
+    # top level imports are the ones printed without indentation, their cumulative time adds up to the total
+    total_us = sum(cumulative_us for module, _, cumulative_us in times if not module.startswith(" "))
+    print(f"imports of {', '.join(modules)}: {total_us / 1000:.1f} ms ({len(times)} modules)")
+    for package, self_us in sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:<32} {self_us / 1000:>8.1f} ms  {100 * self_us / max(total_us, 1):5.1f}%")
+    return total_us / 1_000_000
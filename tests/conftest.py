@@ -0,0 +1,46 @@
+import pytest
+
+from lake.connector.kafka import Connector
+from lake.connector.spill import SpillBuffer
+from lake.util.conf_loader import BrokerCnn, SpillCnf
+
+
+class FakeConnector(Connector):
+    """the write path of the connector against a scripted lake, the first inserts raise `failures` in order"""
+    def insert_frames(self, table, frames, offsets):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.inserted.append((table, [frame for _, frame in frames], offsets))
+
+    def commit_offsets(self, consumer, offsets):
+        self.committed.append(offsets)
+
+
+class FakeSchema:
+    def __init__(self):
+        self.prepared = 0
+
+    def ensure(self, table, messages_frame):
+        self.prepared += 1
+        return "*"
+
+
+def fake_connector(failures=(), spill_directory=None) -> FakeConnector:
+    spill_cfg = SpillCnf(enabled=spill_directory is not None, retry_seconds=0.0)
+    connector = FakeConnector.model_construct(
+        BrokerCnn=BrokerCnn(spill=spill_cfg),
+        schema=FakeSchema(),
+        spill=SpillBuffer(str(spill_directory), spill_cfg.max_bytes) if spill_directory is not None else None,
+        _spill_backoff=spill_cfg.retry_seconds,
+        _revoked_at={},
+    )
+    object.__setattr__(connector, "failures", list(failures))
+    object.__setattr__(connector, "inserted", [])
+    object.__setattr__(connector, "committed", [])
+    return connector
+
+
+@pytest.fixture
+def connector():
+    """factory of FakeConnector (kafka and the lake are not available offline)"""
+    return fake_connector
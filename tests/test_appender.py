@@ -0,0 +1,81 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from lake.connector.appender import RowAppender
+from lake.connector.spill import merge_frames
+
+
+def appender() -> RowAppender:
+    appender = RowAppender(max_rows=3)
+    appender.append({"id": 1, "name": "a"}, "topic", 0, 10)
+    appender.append({"id": 2}, "topic", 0, 11)
+    appender.append({"id": "3", "name": "c"}, "topic", 1, 5)
+    return appender
+
+
+def test_appender_groups_key_sets_and_flushes_at_max_rows():
+    buffer = RowAppender(max_rows=3, max_latency_ms=60000)
+    buffer.append({"id": 1}, "topic", 0, 1)
+    buffer.append({"id": 2, "name": "b"}, "topic", 0, 2)
+    assert not buffer.should_flush()
+    buffer.append({"id": 3}, "topic", 1, 7)
+    assert buffer.should_flush()
+    frames, offsets = buffer.drain()
+    assert [keys for keys, _ in frames] == [("id",), ("id", "name")]
+    assert offsets == {("topic", 0): 2, ("topic", 1): 7}
+    assert len(buffer) == 0 and buffer.remaining() is None
+
+
+def test_appender_flushes_after_max_latency():
+    buffer = RowAppender(max_rows=100, max_latency_ms=0)
+    buffer.append({"id": 1}, "topic", 0, 1)
+    assert buffer.should_flush()
+
+
+def test_statement_prepared_once_per_key_set_and_schema():
+    buffer, prepared = RowAppender(), []
+    for frame in (pa.table({"id": [1]}), pa.table({"id": [2]}), pa.table({"id": [1.5]})):
+        buffer.statement(("id",), frame, lambda messages_frame: prepared.append(messages_frame.schema) or "*")
+    assert len(prepared) == 2
+
+
+def test_flush_re_prepares_on_schema_mismatch(connector):
+    lake = connector([duckdb.BinderException("column changed")])
+    lake.flush_appender("t", appender())
+    assert len(lake.inserted) == 1
+    assert lake.committed == [{("topic", 0): 11, ("topic", 1): 5}]
+
+
+def test_flush_raises_other_errors(connector):
+    lake = connector([ValueError("bug")])
+    with pytest.raises(ValueError):
+        lake.flush_appender("t", appender())
+    assert lake.committed == []
+
+
+def test_flush_raises_outage_without_spill(connector):
+    lake = connector([duckdb.IOException("s3 unreachable")])
+    with pytest.raises(duckdb.IOException):
+        lake.flush_appender("t", appender())
+
+
+def test_flush_spills_outage_and_drains_in_order(connector, tmp_path):
+    lake = connector([duckdb.IOException("s3 unreachable"), duckdb.IOException("s3 unreachable")], tmp_path)
+    lake.flush_appender("t", appender())
+    assert lake.inserted == [] and lake.committed == []
+    assert len(lake.spill) == 1
+    # the next flush waits behind the spilled one
+    later = RowAppender()
+    later.append({"id": 4}, "topic", 0, 12)
+    lake.flush_appender("t", later)
+    assert len(lake.spill) == 0
+    assert [offsets for _, _, offsets in lake.inserted] == [{("topic", 0): 11, ("topic", 1): 5}, {("topic", 0): 12}]
+    assert lake.inserted[0][1][0].num_rows == 3
+
+
+def test_merge_frames_fills_missing_columns_and_stringifies_conflicts():
+    merged = merge_frames([pa.table({"id": [1], "name": ["a"]}), pa.table({"id": ["x"]}), pa.table({"other": [None]})])
+    assert merged.num_rows == 3
+    assert merged.column("id").to_pylist() == ["1", "x", None]
+    assert merged.column("name").to_pylist() == ["a", None, None]
@@ -0,0 +1,40 @@
+import time
+
+from lake.connector.buffer import BatchBuffer
+
+
+def test_flushes_at_max_rows():
+    buffer = BatchBuffer(max_rows=2, max_bytes=1000, max_latency_ms=60000, table="events")
+    buffer.add("topic", 0, 1, b"{}")
+    assert not buffer.should_flush() and buffer.free_rows == 1
+    buffer.add("topic", 0, 2, b"{}")
+    assert buffer.should_flush() and buffer.free_rows == 0
+
+
+def test_flushes_at_max_bytes():
+    buffer = BatchBuffer(max_rows=100, max_bytes=10, max_latency_ms=60000)
+    buffer.add("topic", 0, 1, b"12345")
+    assert not buffer.should_flush()
+    buffer.add("topic", 0, 2, b"67890")
+    assert buffer.should_flush()
+
+
+def test_flushes_after_max_latency():
+    buffer = BatchBuffer(max_rows=100, max_bytes=1000, max_latency_ms=20)
+    assert buffer.remaining() is None and not buffer.should_flush()
+    buffer.add("topic", 0, 1, b"{}")
+    assert 0 < buffer.remaining() <= 0.02
+    time.sleep(0.03)
+    assert buffer.remaining() == 0.0 and buffer.should_flush()
+
+
+def test_flush_hands_over_the_batch_and_starts_a_new_one():
+    buffer = BatchBuffer(max_rows=100, max_bytes=1000, max_latency_ms=60000, table="events", key_column="key")
+    buffer.add("topic", 0, 1, b"{}", key=b"a")
+    buffer.add("topic", 1, 7, b"{}", key=None)
+    buffer.add("topic", 0, 2, b"{}", key=b"b")
+    batch = buffer.flush(generation=3)
+    assert (batch.table, batch.generation, batch.keys) == ("events", 3, [b"a", None, b"b"])
+    assert batch.offsets == {("topic", 0): 2, ("topic", 1): 7}
+    assert batch.started_at is not None
+    assert len(buffer) == 0 and buffer.remaining() is None and buffer.batch.table == "events"
@@ -0,0 +1,74 @@
+import duckdb
+import pytest
+from confluent_kafka import OFFSET_BEGINNING, OFFSET_STORED, TopicPartition
+
+from lake.connector.checkpoint import OffsetCheckpoint, StartPosition, prune_checkpoints
+
+
+@pytest.fixture
+def checkpoint():
+    checkpoint = OffsetCheckpoint(duckdb.connect(), "ingest_offsets", "group")
+    checkpoint.ensure_table()
+    return checkpoint
+
+
+def record(checkpoint, offset, committed_at, partition=0, group="group"):
+    checkpoint.connection.execute(
+        "INSERT INTO ingest_offsets VALUES (?, 'topic', ?, ?, ?::TIMESTAMPTZ);", [group, partition, offset, committed_at]
+    )
+
+
+def test_resume_after_latest_checkpoint(checkpoint):
+    record(checkpoint, 10, "2026-01-01 00:00:00+00")
+    record(checkpoint, 20, "2026-01-01 00:01:00+00")
+    [partition] = checkpoint.resolve(None, [TopicPartition("topic", 0)], None, set())
+    assert partition.offset == 21
+
+
+def test_rewound_backfill_resumes_from_its_own_checkpoint(checkpoint):
+    # a backfill rewound the partition, its checkpoint is lower than the one written before
+    record(checkpoint, 1000, "2026-01-01 00:00:00+00")
+    record(checkpoint, 500, "2026-01-01 00:05:00+00")
+    [partition] = checkpoint.resolve(None, [TopicPartition("topic", 0)], None, set())
+    assert partition.offset == 501
+
+
+def test_partition_without_checkpoint_uses_committed_offset(checkpoint):
+    record(checkpoint, 5, "2026-01-01 00:00:00+00", group="other")
+    [partition] = checkpoint.resolve(None, [TopicPartition("topic", 0)], None, set())
+    assert partition.offset == OFFSET_STORED
+
+
+def test_start_position_applies_once_per_partition(checkpoint):
+    record(checkpoint, 10, "2026-01-01 00:00:00+00")
+    start, positioned = StartPosition(beginning=True), set()
+    [first] = checkpoint.resolve(None, [TopicPartition("topic", 0)], start, positioned)
+    [again] = checkpoint.resolve(None, [TopicPartition("topic", 0)], start, positioned)
+    assert first.offset == OFFSET_BEGINNING
+    assert again.offset == 11
+
+
+def test_start_position_yields_to_checkpoints_written_after_it(checkpoint):
+    start = StartPosition(offsets={("topic", 0): 3}, issued_at=0.0)
+    record(checkpoint, 40, "2026-01-01 00:00:00+00")
+    [partition] = checkpoint.resolve(None, [TopicPartition("topic", 0)], start, set())
+    assert partition.offset == 41
+
+
+def test_prune_keeps_the_latest_checkpoint_of_every_partition(checkpoint):
+    record(checkpoint, 1000, "2026-01-01 00:00:00+00")
+    record(checkpoint, 500, "2026-01-01 00:05:00+00")
+    record(checkpoint, 7, "2026-01-01 00:00:00+00", partition=1)
+    record(checkpoint, 9, "2026-01-01 00:00:00+00", group="other")
+    assert prune_checkpoints(checkpoint.connection, "ingest_offsets", dry_run=True) == 1
+    assert prune_checkpoints(checkpoint.connection, "ingest_offsets") == 1
+    rows = checkpoint.connection.execute(
+        'SELECT group_id, "partition", "offset" FROM ingest_offsets ORDER BY ALL;'
+    ).fetchall()
+    assert rows == [("group", 0, 500), ("group", 1, 7), ("other", 0, 9)]
+
+
+def test_parse_start_positions():
+    assert StartPosition.parse_offsets("a:0:5, b.c:1:7") == {("a", 0): 5, ("b.c", 1): 7}
+    assert StartPosition.parse_timestamp("2026-01-01T00:00:00") == 1767225600000
+    assert StartPosition.parse_timestamp("1767225600000") == 1767225600000
@@ -0,0 +1,50 @@
+import json
+
+import pyarrow as pa
+import pytest
+
+from lake.connector.decode import DecodeReport, decode_batch
+
+PAYLOADS = [
+    json.dumps({"id": 1, "user": {"name": "a", "age": 30}, "tags": "x"}).encode(),
+    None,
+    json.dumps({"id": 2, "user": {"name": "b", "age": 31}}).encode(),
+    json.dumps({"id": 3, "note": "line\nbreak"}).encode(),
+]
+KEYS = [b"k1", b"tombstone", None, b"k3"]
+
+
+def rows(frame) -> list[dict]:
+    """rows of a decoded frame with the columns in a fixed order and NaN/NA as None"""
+    table = frame if isinstance(frame, pa.Table) else pa.Table.from_pandas(frame, preserve_index=False)
+    columns = sorted(table.column_names)
+    return [{column: row[column] for column in columns} for row in table.select(columns).to_pylist()]
+
+
+def test_arrow_and_pandas_decode_the_same_rows():
+    arrow, pandas = decode_batch(PAYLOADS, mode="arrow"), decode_batch(PAYLOADS, mode="pandas")
+    assert isinstance(arrow, pa.Table)
+    assert rows(arrow) == rows(pandas)
+    assert {"user.name", "user.age", "note"} <= set(arrow.column_names)
+
+
+def test_tombstones_are_skipped_with_their_keys():
+    for mode in ("arrow", "pandas"):
+        frame = decode_batch(PAYLOADS, mode=mode, keys=KEYS, key_column="key")
+        assert len(frame) == 3
+        assert [row["key"] for row in rows(frame)] == ["k1", None, "k3"]
+
+
+def test_malformed_payload_falls_back_to_pandas():
+    report = DecodeReport()
+    frame = decode_batch([b'{"id": 1}', b"{not json", b'{"id": 2}'], mode="arrow", report=report)
+    assert [row["id"] for row in rows(frame)] == [1, 2]
+    assert report.modes["pandas"].batches == 1 and report.modes["arrow"].batches == 0
+
+
+@pytest.mark.parametrize("mode", ["arrow", "pandas"])
+def test_report_counts_rows_per_mode(mode):
+    report = DecodeReport()
+    decode_batch(PAYLOADS, mode=mode, report=report)
+    assert report.modes[mode].rows == 3
+    assert f"{mode}: 3 rows in 1 batches" in report.summary()
@@ -0,0 +1,61 @@
+import logging
+import queue
+
+from lake.util.logger.hot_path import DroppingQueueHandler, SamplingFilter, TruncateFilter
+
+
+def record(lineno: int = 10, level: int = logging.INFO, msg: str = "message %s", args=("payload",), filename: str = "kafka.py"):
+    return logging.LogRecord("development", level, f"/lake/connector/{filename}", lineno, msg, args, None)
+
+
+def test_keeps_one_record_in_sample_every_per_site():
+    sampling = SamplingFilter(sample_every=3)
+    assert [sampling.filter(record()) for _ in range(7)] == [True, False, False, True, False, False, True]
+    # another call site has its own count
+    assert sampling.filter(record(lineno=11))
+
+
+def test_records_above_max_level_always_pass():
+    sampling = SamplingFilter(sample_every=100, max_level="INFO")
+    assert sampling.filter(record())
+    assert not sampling.filter(record())
+    assert all(sampling.filter(record(level=logging.WARNING)) for _ in range(5))
+
+
+def test_rate_limit_uses_a_token_bucket_per_site():
+    sampling = SamplingFilter(rate_per_second=0.001, burst=2)
+    assert [sampling.filter(record()) for _ in range(4)] == [True, True, False, False]
+
+
+def test_overrides_per_file_and_line():
+    sampling = SamplingFilter(sample_every=1, overrides={"kafka.py": {"sample_every": 2}, "kafka.py:20": {"sample_every": 1}})
+    assert [sampling.filter(record()) for _ in range(4)] == [True, False, True, False]
+    assert all(sampling.filter(record(lineno=20)) for _ in range(4))
+    assert all(sampling.filter(record(filename="pipeline.py")) for _ in range(4))
+
+
+def test_next_kept_record_reports_the_dropped_ones():
+    sampling, truncate = SamplingFilter(sample_every=3), TruncateFilter()
+    records = [record() for _ in range(4)]
+    kept = [each for each in records if sampling.filter(each)]
+    assert not hasattr(kept[0], "dropped") and kept[1].dropped == 2
+    truncate.filter(kept[1])
+    assert kept[1].getMessage() == "message payload (+2 similar records dropped)"
+
+
+def test_truncate_renders_once_and_cuts_long_messages():
+    truncate = TruncateFilter(max_length=10)
+    long = record(msg="%s", args=("x" * 25,))
+    assert truncate.filter(long) and long.getMessage() == "xxxxxxxxxx... (15 more chars)"
+    assert truncate.filter(long) and long.getMessage() == "xxxxxxxxxx... (15 more chars)"
+    broken = record(msg="%s %s", args=("only one",))
+    truncate.filter(broken)
+    assert broken.getMessage() == "%s %s"
+
+
+def test_full_queue_drops_instead_of_blocking():
+    records: queue.Queue = queue.Queue(maxsize=1)
+    handler = DroppingQueueHandler(records)
+    handler.handle(record())
+    handler.handle(record())
+    assert records.qsize() == 1
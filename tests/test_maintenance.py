@@ -0,0 +1,68 @@
+import duckdb
+import pytest
+
+from lake.connector.maintenance import LakeMaintenance, TableFiles, parse_size
+
+
+class FakeMaintenance(LakeMaintenance):
+    """ducklake table functions are not available offline, only the catalog metadata tables are"""
+    merged: list
+
+    def table_files(self):
+        return {"ingested": TableFiles(10, 100), "registered": TableFiles(3, 300)}
+
+    def flush_inlined(self, tables=None, min_rows=0):
+        return {}
+
+    def _merge(self, table):
+        self.merged.append(table)
+
+
+@pytest.fixture
+def connection():
+    connection = duckdb.connect()
+    connection.execute("ATTACH ':memory:' AS __ducklake_metadata_lake;")
+    connection.execute("""
+        CREATE TABLE __ducklake_metadata_lake.ducklake_table (table_id BIGINT, table_name VARCHAR, end_snapshot BIGINT);
+        CREATE TABLE __ducklake_metadata_lake.ducklake_data_file (table_id BIGINT, end_snapshot BIGINT, path VARCHAR, path_is_relative BOOLEAN);
+        CREATE TABLE __ducklake_metadata_lake.ducklake_files_scheduled_for_deletion (path VARCHAR, path_is_relative BOOLEAN);
+        INSERT INTO __ducklake_metadata_lake.ducklake_table VALUES (1, 'ingested', NULL), (2, 'registered', NULL);
+        INSERT INTO __ducklake_metadata_lake.ducklake_data_file VALUES
+            (1, NULL, 'main/ingested/a.parquet', true), (2, NULL, 's3://src/logs/a.parquet', false), (2, NULL, 'main/registered/b.parquet', true);
+    """)
+    return connection
+
+
+def maintenance(connection, include_registered=False) -> FakeMaintenance:
+    maintenance = FakeMaintenance(connection, "lake", {}, include_registered=include_registered)
+    maintenance.merged = []
+    return maintenance
+
+
+def test_registered_tables_are_not_merged_by_default(connection):
+    lake = maintenance(connection)
+    report = lake.run(catalog_steps=False)
+    assert lake.merged == ["ingested"]
+    assert report.skipped_registered == ["registered"]
+
+
+def test_registered_tables_are_merged_on_request(connection):
+    lake = maintenance(connection, include_registered=True)
+    report = lake.run(catalog_steps=False)
+    assert lake.merged == ["ingested", "registered"]
+    assert report.skipped_registered == []
+
+
+def test_cleanup_refuses_to_delete_registered_files(connection):
+    connection.execute("INSERT INTO __ducklake_metadata_lake.ducklake_files_scheduled_for_deletion VALUES ('s3://src/logs/a.parquet', false);")
+    report = maintenance(connection).run(catalog_steps=True)
+    assert "registered files are scheduled for deletion" in report.errors["cleanup_old_files"]
+    report = maintenance(connection, include_registered=True).run(catalog_steps=True)
+    assert "registered files" not in report.errors.get("cleanup_old_files", "")
+
+
+def test_parse_size():
+    assert parse_size("128MB") == 128_000_000
+    assert parse_size("1 GiB") == 1024**3
+    with pytest.raises(ValueError):
+        parse_size("big")
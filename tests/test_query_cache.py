@@ -0,0 +1,80 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from lake.connector.query_cache import QueryCache, cacheable, normalize_sql, referenced_tables
+
+
+def parse(sql: str) -> str:
+    return duckdb.connect().execute("SELECT json_serialize_sql(?);", [sql]).fetchone()[0]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM lake.events WHERE id IN (SELECT id FROM lake.users)",
+    "SELECT tenant, count(*) FROM lake.events GROUP BY tenant",
+    "SELECT * FROM lake.events USING SAMPLE 10% (bernoulli, 42)",
+])
+def test_cacheable(sql):
+    assert cacheable(parse(sql))
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM lake.events JOIN read_csv('x.csv') r ON true",
+    "SELECT * FROM lake.events WHERE at < now()",
+    "SELECT random() FROM lake.events",
+    "SELECT current_timestamp, id FROM lake.events",
+    "SELECT * FROM lake.events USING SAMPLE 10%",
+    "INSERT INTO lake.events VALUES (1)",
+    "SELECT 1; SELECT 2",
+])
+def test_not_cacheable(sql):
+    assert not cacheable(parse(sql))
+
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("SELECT  *\n FROM t WHERE a = 'x   y' ;") == "SELECT * FROM t WHERE a = 'x   y'"
+
+
+def test_referenced_tables():
+    assert referenced_tables("SELECT * FROM lake.events e JOIN lake.ops.users u ON e.id = u.id", "lake", "memory", "main") == {
+        ("main", "events"), ("ops", "users"),
+    }
+    assert referenced_tables("SELECT * FROM events", "lake", "lake", "main") == {("main", "events")}
+    assert referenced_tables("SELECT * FROM lake.events JOIN pg.public.users ON true", "lake", "memory", "main") is None
+
+
+def test_referenced_tables_of_unbindable_queries():
+    # get_table_names binds the query, USING needs the (unknown) columns
+    assert referenced_tables("SELECT * FROM lake.a JOIN lake.b USING (id)", "lake", "memory", "main") is None
+
+
+def table(rows: int) -> pa.Table:
+    return pa.table({"value": list(range(rows))})
+
+
+def test_new_snapshot_invalidates_dependent_entries():
+    cache = QueryCache(max_bytes=1 << 20)
+    cache.observe({("main", "a"): 1, ("main", "b"): 1})
+    cache.put("on_a", table(3), {("main", "a")})
+    cache.put("on_b", table(3), {("main", "b")})
+    cache.observe({("main", "a"): 2})
+    assert cache.get("on_a") is None
+    assert cache.get("on_b").num_rows == 3
+
+
+def test_key_depends_on_versions_and_params():
+    key = QueryCache.key("SELECT * FROM t", None, {("main", "t"): 1})
+    assert key == QueryCache.key("SELECT *  FROM t;", None, {("main", "t"): 1})
+    assert key != QueryCache.key("SELECT * FROM t", None, {("main", "t"): 2})
+    assert key != QueryCache.key("SELECT * FROM t", [1], {("main", "t"): 1})
+
+
+def test_evicted_entries_move_to_disk(tmp_path):
+    entry = table(1000)
+    cache = QueryCache(max_bytes=entry.nbytes, directory=str(tmp_path), disk_max_bytes=1 << 20)
+    cache.put("first", entry, set())
+    cache.put("second", entry, set())
+    assert len(list(tmp_path.glob("*.arrow"))) == 1
+    assert cache.get("first").equals(entry)
+    # a spilled result of a previous run is found again
+    assert QueryCache(max_bytes=entry.nbytes, directory=str(tmp_path), disk_max_bytes=1 << 20).get("second").equals(entry)
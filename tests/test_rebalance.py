@@ -0,0 +1,44 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import duckdb
+import pyarrow as pa
+
+from lake.connector.pipeline import MessageBatch
+
+
+def revoke(lake, *partitions):
+    lake.on_revoke(None, [SimpleNamespace(topic=topic, partition=partition) for topic, partition in partitions])
+
+
+def test_revoke_fences_batches_polled_before_it(connector):
+    lake = connector()
+    before = MessageBatch(table="t", offsets={("topic", 0): 5}, generation=lake._generation)
+    revoke(lake, ("topic", 0))
+    assert lake.stale(before.offsets, before.generation)
+    assert not lake.stale({("topic", 1): 3}, before.generation)
+    assert not lake.stale(before.offsets, lake._generation)
+    lake.write_frame(before, pa.table({"id": [1]}))
+    assert lake.inserted == [] and lake.committed == []
+
+
+def test_revoke_does_not_wait_for_a_writer_blocked_by_an_outage(connector, tmp_path):
+    lake = connector([duckdb.IOException("s3 unreachable")] * 1000, tmp_path)
+    lake.BrokerCnn.spill.retry_seconds = lake.BrokerCnn.spill.max_retry_seconds = lake._spill_backoff = 0.01
+    lake.write_frame(MessageBatch(table="t", offsets={("topic", 0): 5}), pa.table({"id": [1]}))
+    lake.write_frame(MessageBatch(table="t", offsets={("topic", 1): 7}), pa.table({"id": [2]}))
+    assert len(lake.spill) == 2
+    writer = threading.Thread(target=lake.drain_spill, kwargs={"block": True}, daemon=True)
+    writer.start()
+    started = time.monotonic()
+    revoke(lake, ("topic", 0))
+    assert time.monotonic() - started < 0.5
+    # the blocked writer drops the revoked segment on its own, the other one waits for the lake
+    deadline = time.monotonic() + 5
+    while len(lake.spill) != 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(lake.spill) == 1
+    lake.failures.clear()
+    writer.join(timeout=5)
+    assert [offsets for _, _, offsets in lake.inserted] == [{("topic", 1): 7}]
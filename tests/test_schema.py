@@ -0,0 +1,80 @@
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from lake.connector.schema import SchemaRegistry, registered, widen
+
+
+@pytest.mark.parametrize("current, incoming, widened", [
+    ("INTEGER", "INTEGER", "INTEGER"),
+    ("INTEGER", "BIGINT", "BIGINT"),
+    ("BIGINT", "INTEGER", "BIGINT"),
+    ("BIGINT", "DOUBLE", "DOUBLE"),
+    ("DATE", "TIMESTAMP", "TIMESTAMP"),
+    ("BIGINT", "VARCHAR", "VARCHAR"),
+    ("BOOLEAN", "BIGINT", "VARCHAR"),
+    ("BIGINT", '"NULL"', "BIGINT"),
+    ('"NULL"', "DOUBLE", "DOUBLE"),
+])
+def test_widen(current, incoming, widened):
+    assert widen(current, incoming) == widened
+
+
+@pytest.fixture
+def schema():
+    return SchemaRegistry(duckdb.connect())
+
+
+def insert(schema, table, messages_frame):
+    select_sql = schema.ensure(table, messages_frame)
+    with registered(schema.connection, messages_frame):
+        schema.connection.execute(f"INSERT INTO {table} BY NAME (SELECT {select_sql} FROM messages_frame)")
+
+
+def columns(schema, table) -> dict:
+    return {row[0]: row[1] for row in schema.connection.execute(f"DESCRIBE {table};").fetchall()}
+
+
+def test_first_batch_creates_the_table(schema):
+    created = []
+    schema.on_create = created.append
+    insert(schema, "events", pa.table({"id": [1], "name": ["a"], "empty": pa.nulls(1)}))
+    assert created == ["events"]
+    assert columns(schema, "events") == {"id": "BIGINT", "name": "VARCHAR", "empty": "VARCHAR"}
+
+
+def test_new_and_widened_fields_evolve_the_table(schema):
+    insert(schema, "events", pa.table({"id": pa.array([1], pa.int32())}))
+    insert(schema, "events", pa.table({"id": [2**40], "extra": [True]}))
+    insert(schema, "events", pa.table({"id": [1.5]}))
+    assert columns(schema, "events") == {"id": "DOUBLE", "extra": "BOOLEAN"}
+    assert schema.connection.execute("SELECT id FROM events ORDER BY id").fetchall() == [(1.0,), (1.5,), (2.0 ** 40,)]
+
+
+def test_narrower_batches_keep_the_stored_type(schema):
+    insert(schema, "events", pa.table({"id": [1.5], "name": ["a"]}))
+    assert schema.ensure("events", pa.table({"id": pa.array([2], pa.int32()), "name": pa.nulls(1)})) == 'TRY_CAST("id" AS DOUBLE) AS "id", "name"'
+    assert columns(schema, "events") == {"id": "DOUBLE", "name": "VARCHAR"}
+
+
+@pytest.mark.parametrize("nulls", [pa.table({"flag": pa.nulls(2)}), pd.DataFrame({"flag": [None, None]})])
+def test_fields_without_values_never_widen_a_column(schema, nulls):
+    insert(schema, "events", pa.table({"flag": [True]}))
+    insert(schema, "events", nulls)
+    assert columns(schema, "events") == {"flag": "BOOLEAN"}
+    assert schema.connection.execute("SELECT count(*) FROM events WHERE flag IS NULL").fetchone() == (2,)
+
+
+def test_pinned_column_casts_batches_and_counts_nulled_values(schema, monkeypatch):
+    insert(schema, "events", pa.table({"flag": [True]}))
+    # a column the lake refuses to promote is cast to the stored type instead
+    schema._pinned["events"].add("flag")
+    nulled = []
+    monkeypatch.setattr(SchemaRegistry, "_count_nulled", lambda self, table, frame, casts: nulled.append(casts))
+    assert schema.ensure("events", pa.table({"flag": ["yes"]})) == 'TRY_CAST("flag" AS BOOLEAN) AS "flag"'
+    assert nulled == [{"flag": "BOOLEAN"}]
+
+
+def test_batch_without_columns_has_nothing_to_insert(schema):
+    assert schema.ensure("events", pa.table({})) is None
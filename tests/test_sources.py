@@ -0,0 +1,68 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from lake.connector.schema import SchemaRegistry
+from lake.connector.sources import SourceConnection, SourceRegistry
+
+
+@pytest.fixture
+def connection():
+    sources = SourceRegistry()
+    sources.add_postgres("pg", "SELECT 1;", "ATTACH ':memory:' AS pg; CREATE TABLE pg.events AS SELECT 1 AS id;")
+    # the storage secret is replaced by a marker table, s3 is not reachable offline
+    sources.add_storage("store", "bucket", "CREATE TABLE store_attached AS SELECT 1 AS id;")
+    return SourceConnection(duckdb.connect(), sources)
+
+
+def attached(connection) -> set:
+    return {source.alias for source in connection.sources._sources.values() if source.attached}
+
+
+def test_statement_attaches_referenced_postgres_source(connection):
+    assert connection.execute("SELECT 'pg.events' AS literal;").fetchone() == ("pg.events",)
+    assert attached(connection) == set()
+    assert connection.sql("SELECT id FROM pg.events").fetchone() == (1,)
+    assert attached(connection) == {"pg"}
+
+
+@pytest.mark.parametrize("call", [
+    lambda connection: connection.table("pg.events"),
+    lambda connection: connection.from_query("SELECT * FROM pg.events"),
+    lambda connection: connection.view("pg.events"),
+])
+def test_relation_entry_points_attach_sources(connection, call):
+    try:
+        call(connection)
+    except duckdb.Error:
+        pass
+    assert attached(connection) == {"pg"}
+
+
+@pytest.mark.parametrize("call", [
+    lambda connection: connection.read_parquet("s3://bucket/data/*.parquet"),
+    lambda connection: connection.read_csv(path_or_buffer="s3://bucket/data.csv"),
+    lambda connection: connection.read_json(["s3://bucket/a.json", "s3://other/b.json"]),
+    lambda connection: connection.table_function("read_parquet", ["s3://bucket/data.parquet"]),
+])
+def test_file_readers_attach_storage_sources(connection, call):
+    try:
+        call(connection)
+    except duckdb.Error:
+        pass
+    assert attached(connection) == {"store"}
+
+
+def test_file_paths_never_attach_postgres(connection):
+    try:
+        connection.read_parquet("/tmp/pg.parquet")
+    except duckdb.Error:
+        pass
+    assert attached(connection) == set()
+
+
+def test_frames_are_registered_without_scanning_python_frames(connection):
+    schema = SchemaRegistry(connection)
+    assert schema.infer(pa.table({"id": [1], "name": ["a"]})) == {"id": "BIGINT", "name": "VARCHAR"}
+    with pytest.raises(duckdb.CatalogException):
+        connection.execute("SELECT * FROM messages_frame;")
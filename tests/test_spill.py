@@ -0,0 +1,66 @@
+import pandas as pd
+import pyarrow as pa
+
+from lake.connector.spill import SpillBuffer, _to_arrow
+
+
+def spill_batches(spill, *batches):
+    for table, ids, offsets in batches:
+        assert spill.append(table, pa.table({"id": ids}), offsets)
+
+
+def test_segments_drain_oldest_first_grouped_per_table(tmp_path):
+    spill = SpillBuffer(str(tmp_path), max_bytes=1 << 20)
+    spill_batches(
+        spill,
+        ("a", [1], {("topic", 0): 1}),
+        ("a", [2, 3], {("topic", 0): 3}),
+        ("b", [4], {("other", 0): 9}),
+        ("a", [5], {("topic", 0): 4}),
+    )
+    segments, table, frame, offsets = spill.peek(max_bytes=1 << 20)
+    assert (table, frame.column("id").to_pylist(), offsets) == ("a", [1, 2, 3], {("topic", 0): 3})
+    spill.pop(segments)
+    segments, table, frame, _ = spill.peek(max_bytes=1 << 20)
+    assert (table, frame.column("id").to_pylist()) == ("b", [4])
+    spill.pop(segments)
+    assert spill.peek(max_bytes=1 << 20)[1] == "a" and len(spill) == 1
+
+
+def test_peek_takes_at_least_one_segment_up_to_max_bytes(tmp_path):
+    spill = SpillBuffer(str(tmp_path), max_bytes=1 << 20)
+    spill_batches(spill, ("a", [1], {("topic", 0): 1}), ("a", [2], {("topic", 0): 2}))
+    segments, _, frame, offsets = spill.peek(max_bytes=1)
+    assert len(segments) == 1 and frame.num_rows == 1 and offsets == {("topic", 0): 1}
+
+
+def test_segments_survive_a_restart_in_order(tmp_path):
+    spill = SpillBuffer(str(tmp_path), max_bytes=1 << 20)
+    spill_batches(spill, *[("a", [index], {("topic", 0): index}) for index in range(12)])
+    reopened = SpillBuffer(str(tmp_path), max_bytes=1 << 20)
+    assert len(reopened) == 12 and reopened.nbytes == spill.nbytes
+    assert reopened.peek(max_bytes=1 << 20)[2].column("id").to_pylist() == list(range(12))
+    spill_batches(reopened, ("a", [12], {("topic", 0): 12}))
+    assert reopened.peek(max_bytes=1 << 20)[2].column("id").to_pylist()[-1] == 12
+
+
+def test_full_spill_refuses_batches(tmp_path):
+    spill = SpillBuffer(str(tmp_path), max_bytes=10)
+    assert not spill.append("a", pa.table({"id": list(range(100))}), {("topic", 0): 1})
+    assert len(spill) == 0 and spill.nbytes == 0
+
+
+def test_discard_removes_segments_of_revoked_partitions(tmp_path):
+    spill = SpillBuffer(str(tmp_path), max_bytes=1 << 20)
+    spill.append("a", pa.table({"id": [1]}), {("topic", 0): 1}, generation=0)
+    spill.append("a", pa.table({"id": [2]}), {("topic", 1): 1}, generation=0)
+    spill.append("a", pa.table({"id": [3]}), {("topic", 0): 2}, generation=2)
+    # partition 0 revoked at generation 1: only what was polled before it is stale
+    assert spill.discard(lambda offsets, generation: ("topic", 0) in offsets and generation < 1) == 1
+    assert spill.peek(max_bytes=1 << 20)[2].column("id").to_pylist() == [2, 3]
+
+
+def test_mixed_object_columns_are_stored_as_strings():
+    table = _to_arrow(pd.DataFrame({"value": [1, "a", {"b": 2}, None], "id": [1, 2, 3, 4]}))
+    assert table.column("value").to_pylist() == ["1", "a", '{"b": 2}', None]
+    assert table.column("id").to_pylist() == [1, 2, 3, 4]
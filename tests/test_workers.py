@@ -0,0 +1,29 @@
+import signal
+import threading
+
+import pytest
+
+from lake.connector import workers
+from lake.connector.workers import IngestSupervisor
+
+
+@pytest.fixture
+def no_logging(monkeypatch):
+    """a handler interrupting the main thread inside a logging call deadlocks on the handler lock"""
+    def fail(*args, **kwargs):
+        raise AssertionError("logged inside a signal handler")
+    for level in ("debug", "info", "warning", "error"):
+        monkeypatch.setattr(workers.logger, level, fail)
+
+
+def test_worker_stop_request_does_not_log(connector, no_logging):
+    lake = connector()
+    object.__setattr__(lake, "_stop_event", threading.Event())
+    lake.request_stop()
+    assert lake.stopped
+
+
+def test_supervisor_signal_handler_does_not_log(no_logging):
+    supervisor = IngestSupervisor("resources/config.yml", workers=2)
+    supervisor._handle_signal(signal.SIGTERM, None)
+    assert supervisor._stopping